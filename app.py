@@ -2,7 +2,7 @@ import streamlit as st
 import uuid
 from datetime import datetime, timezone
 from core.therapy_engine_groq import TherapyEngine
-from core.chat_memory import load_user_conversation
+from core.chat_memory import HISTORY_PAGE_SIZE, load_conversation_page
 from dotenv import load_dotenv
 load_dotenv()  # Make sure this is at the top of your app.py
 import os
@@ -211,12 +211,25 @@ def init_session_state():
         st.session_state['engine'] = TherapyEngine(st.session_state['user_id'])
     if 'loading' not in st.session_state:
         st.session_state['loading'] = False
+    if 'history_cursor' not in st.session_state:
+        st.session_state['history_cursor'] = None
 
 def load_conversation_history():
+    # Only the latest page at startup; older pages load on demand
     try:
         if not st.session_state['messages']:
-            history = load_user_conversation(st.session_state['user_id'])
+            history, cursor = load_conversation_page(st.session_state['user_id'], HISTORY_PAGE_SIZE)
             st.session_state['messages'] = history if history else []
+            st.session_state['history_cursor'] = cursor
+    except Exception as e:
+        st.error(f"Error loading conversation: {str(e)}")
+
+def load_earlier_messages():
+    try:
+        older, cursor = load_conversation_page(st.session_state['user_id'], HISTORY_PAGE_SIZE,
+                                               st.session_state['history_cursor'])
+        st.session_state['messages'][:0] = older
+        st.session_state['history_cursor'] = cursor
     except Exception as e:
         st.error(f"Error loading conversation: {str(e)}")
 
@@ -237,6 +250,8 @@ def display_messages():
         </div>
         """, unsafe_allow_html=True)
     else:
+        if st.session_state['history_cursor'] is not None:
+            st.button("Load earlier messages", on_click=load_earlier_messages)
         for msg in st.session_state['messages']:
             role = msg.get('role', 'assistant')
             content = msg.get('content', '[No content available]')
@@ -262,7 +277,20 @@ def process_message(user_input):
         })
 
         try:
-            response = st.session_state['engine'].process(user_input)
+            # Stream the reply into a placeholder so the first tokens show up immediately
+            placeholder = st.empty()
+            response = ""
+            for event in st.session_state['engine'].process_stream(user_input):
+                if event['type'] == 'delta':
+                    response += event['text']
+                elif event['type'] == 'done':
+                    response = event['response']
+                placeholder.markdown(f"""
+                <div class="message assistant-message">
+                    <div class="message-label">ReflectAI</div>
+                    {response}
+                </div>
+                """, unsafe_allow_html=True)
             if response:
                 st.session_state['messages'].append({
                     'role': 'assistant',
@@ -0,0 +1,99 @@
+"""
+Compliance query latency over months of audit data: one flat JSON-lines
+log scanned end to end versus daily indexed segments (AuditStore).
+
+Usage: python benchmarks/bench_audit_store.py [--days 180] [--events-per-day 5000] [--users 2000]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ethical_modules.audit_store import AuditStore, seal_segment, segment_dir_for
+
+EVENTS = ["data_access"] * 14 + ["ethical_violation_detected"] * 3 + ["bias_detected", "crisis_detected"]
+
+
+def generate(directory, days, per_day, users, seed=7):
+    rng = random.Random(seed)
+    flat_path = os.path.join(directory, "flat_audit.log")
+    live_path = os.path.join(directory, "ethics_audit.log")
+    start = time.time() - days * 86400
+    with open(flat_path, "w") as flat:
+        for day in range(days):
+            lines = []
+            for i in range(per_day):
+                ts = start + day * 86400 + i * 86400 / per_day
+                record = {"message": rng.choice(EVENTS), "user_id": f"user{rng.randrange(users)}",
+                          "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ts))}
+                lines.append(json.dumps(record))
+            text = "\n".join(lines) + "\n"
+            flat.write(text)
+            with open(live_path, "w") as live:
+                live.write(text)
+            seal_segment(live_path, segment_dir_for(live_path))
+    return flat_path, live_path, start
+
+
+def flat_query(path, user_id, event, since, until):
+    matches = []
+    with open(path) as fh:
+        for line in fh:
+            record = json.loads(line)
+            if (record.get("user_id") == user_id and record.get("message") == event
+                    and since <= record["timestamp"] < until):
+                matches.append(record)
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--events-per-day", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        flat_path, live_path, start = generate(directory, args.days, args.events_per_day, args.users)
+        segment_dir = segment_dir_for(live_path)
+        segment_bytes = sum(os.path.getsize(os.path.join(segment_dir, n)) for n in os.listdir(segment_dir))
+        print(f"{args.days * args.events_per_day} events over {args.days} days generated in "
+              f"{time.perf_counter() - started:.1f}s; flat log {os.path.getsize(flat_path) / 1e6:.1f} MB, "
+              f"segments + indexes {segment_bytes / 1e6:.1f} MB")
+
+        since_ts = start + (args.days - 7) * 86400
+        since = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(since_ts))
+        until = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(start + args.days * 86400))
+        user = "user42"
+
+        t0 = time.perf_counter()
+        flat = flat_query(flat_path, user, "crisis_detected", since, until)
+        flat_s = time.perf_counter() - t0
+
+        store = AuditStore(live_path)
+        t0 = time.perf_counter()
+        cold = list(store.query(user_id=user, event="crisis_detected", since=since, until=until))
+        cold_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        list(store.query(user_id=user, event="crisis_detected", since=since, until=until))
+        warm_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        months = list(AuditStore(live_path).query(user_id=user, event="crisis_detected"))
+        all_s = time.perf_counter() - t0
+
+        assert [r["timestamp"] for r in cold] == [r["timestamp"] for r in flat]
+        print(f"'crisis detections for {user} last week' ({len(flat)} matches)")
+        print(f"  flat scan            {flat_s * 1000:>9.1f} ms")
+        print(f"  segments, cold index {cold_s * 1000:>9.1f} ms")
+        print(f"  segments, warm index {warm_s * 1000:>9.1f} ms")
+        print(f"same user, all {args.days} days ({len(months)} matches), cold: {all_s * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
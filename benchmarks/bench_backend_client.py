@@ -0,0 +1,177 @@
+"""
+Per-message latency of the Solara -> FastAPI hop: one-off requests vs the pooled client.
+
+Starts fastapi_app (stub LLM, in-memory store) over HTTPS behind a local
+proxy that adds a round-trip time to every packet exchange, as when the
+backend runs on another host, then sends the same sequence of streamed
+messages three ways:
+
+    requests   a new requests.post per message (the previous Solara code)
+    pooled     core.backend_client.BackendClient over HTTP/1.1 keep-alive
+    pooled-h2  the same with http2=True (uvicorn only speaks HTTP/1.1, so
+               this measures ALPN fallback unless a proxy in front speaks h2)
+
+Usage:
+    python benchmarks/bench_backend_client.py --rtt-ms 40 --messages 50
+"""
+import argparse
+import asyncio
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.load_test import USER_MESSAGES, free_port, percentile, start_server
+
+
+def make_certificate(directory):
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=localhost", "-addext", "subjectAltName=IP:127.0.0.1,DNS:localhost",
+                    "-keyout", keyfile, "-out", certfile], check=True, capture_output=True)
+    return certfile, keyfile
+
+
+class DelayProxy:
+    """
+    TCP proxy adding `rtt / 2` of one-way delay to every chunk in each
+    direction, plus one extra round trip before a new connection carries
+    data (the TCP handshake). Delays pipeline rather than accumulate.
+    """
+
+    def __init__(self, upstream_port, rtt):
+        self.upstream_port = upstream_port
+        self.rtt = rtt
+        self.port = free_port()
+        self.connections = 0
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+        self.ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", self.port))
+        self.ready.set()
+        self.loop.run_forever()
+
+    async def _pipe(self, reader, writer):
+        queue = asyncio.Queue()
+
+        async def delayed_writer():
+            while True:
+                due, data = await queue.get()
+                await asyncio.sleep(max(0.0, due - time.monotonic()))
+                if data is None:
+                    writer.close()
+                    return
+                writer.write(data)
+                await writer.drain()
+
+        sender = asyncio.ensure_future(delayed_writer())
+        try:
+            while True:
+                data = await reader.read(65536)
+                await queue.put((time.monotonic() + self.rtt / 2, data or None))
+                if not data:
+                    break
+            await sender
+        except (ConnectionError, OSError):
+            sender.cancel()
+
+    async def _handle(self, client_reader, client_writer):
+        self.connections += 1
+        await asyncio.sleep(self.rtt)
+        upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", self.upstream_port)
+        await asyncio.gather(self._pipe(client_reader, upstream_writer),
+                             self._pipe(upstream_reader, client_writer), return_exceptions=True)
+
+
+def run_requests(url, messages, cafile):
+    import requests
+    from core.streaming import iter_sse
+
+    timings = []
+    for i, message in enumerate(messages):
+        start = time.perf_counter()
+        with requests.post(url, json={"user_id": f"bench-{i % 5}", "message": message},
+                           timeout=20, stream=True, verify=cafile) as response:
+            response.raise_for_status()
+            list(iter_sse(response.iter_lines(decode_unicode=True)))
+        timings.append(time.perf_counter() - start)
+    return timings, "HTTP/1.1"
+
+
+def run_pooled(url, messages, cafile, http2):
+    from core.backend_client import BackendClient
+    from core.streaming import iter_sse
+
+    client = BackendClient(url.rsplit("/stream", 1)[0], url, http2=http2,
+                           verify=ssl.create_default_context(cafile=cafile))
+    timings, version = [], None
+    try:
+        for i, message in enumerate(messages):
+            start = time.perf_counter()
+            with client.stream_chat(f"bench-{i % 5}", message) as response:
+                response.raise_for_status()
+                version = response.http_version
+                list(iter_sse(response.iter_lines()))
+            timings.append(time.perf_counter() - start)
+    finally:
+        client.close()
+    return timings, version
+
+
+def summary(timings):
+    ordered = sorted(timings)
+    return {"mean_ms": round(statistics.mean(ordered) * 1000, 1),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rtt-ms", type=float, default=40.0, help="simulated network round-trip time")
+    parser.add_argument("--messages", type=int, default=30, help="messages sent per client variant")
+    args = parser.parse_args(argv)
+
+    os.environ.update({"REFLECTAI_LLM_BACKEND": "stub", "REFLECTAI_STUB_LATENCY": "fixed:0",
+                       "REFLECTAI_USER_RATE_PER_MINUTE": "0", "REFLECTAI_STORAGE": "memory"})
+
+    messages = [USER_MESSAGES[i % len(USER_MESSAGES)] for i in range(args.messages)]
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile, keyfile = make_certificate(tmp)
+        port = free_port()
+        server = start_server(port, certfile, keyfile)
+        try:
+            proxy = DelayProxy(port, args.rtt_ms / 1000)
+            url = f"https://127.0.0.1:{proxy.port}/chat/stream"
+            print(f"RTT {args.rtt_ms:.0f} ms, {args.messages} streamed messages per client, HTTPS")
+            print(f"{'client':<10} {'version':<9} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'connections':>12}")
+            baseline = None
+            variants = [("requests", lambda: run_requests(url, messages, certfile)),
+                        ("pooled", lambda: run_pooled(url, messages, certfile, http2=False)),
+                        ("pooled-h2", lambda: run_pooled(url, messages, certfile, http2=True))]
+            for name, run in variants:
+                before = proxy.connections
+                timings, version = run()
+                stats = summary(timings)
+                baseline = baseline or stats["mean_ms"]
+                saved = baseline - stats["mean_ms"]
+                print(f"{name:<10} {version:<9} {stats['mean_ms']:>8} {stats['p50_ms']:>8} {stats['p95_ms']:>8} "
+                      f"{proxy.connections - before:>12}" + (f"   saves {saved:.1f} ms/message" if saved > 0 else ""))
+        finally:
+            server.terminate()
+            server.wait(10)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Cold-start report: import time of each entry point and time to the first /healthz.
+
+Every measurement runs in a fresh interpreter, as on a scale-to-zero host.
+Import times come from `python -X importtime`. The report lists the total
+and the heaviest packages by self time, so regressions point at the
+import responsible. Time-to-healthz starts uvicorn on fastapi_app and
+polls until the first 200.
+
+Usage:
+    python benchmarks/bench_cold_start.py --runs 5 --output cold_start.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.load_test import free_port
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+ENTRY_POINTS = ("fastapi_app", "solara_app", "app")
+
+
+def child_environment():
+    env = dict(os.environ)
+    # Production-like configuration: an API key selects the SDK backend and
+    # Supabase is the store, but nothing may be contacted at import time
+    env.setdefault("GEMINI_API_KEY", "bench-placeholder-key")
+    env.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+    env.setdefault("SUPABASE_KEY", "bench-placeholder-key")
+    return env
+
+
+def parse_importtime(stderr):
+    """(total seconds, {top-level package: self seconds}) from -X importtime output."""
+    total = 0.0
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1e6
+        # Top-level imports are not indented
+        if name.startswith(" ") and not name.startswith("  "):
+            total += int(cumulative_us) / 1e6
+    return total, packages
+
+
+def measure_import(module, runs, env):
+    totals, packages = [], {}
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                capture_output=True, text=True, cwd=ROOT, env=env)
+        if result.returncode != 0:
+            last = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+            return {"error": last}
+        total, by_package = parse_importtime(result.stderr)
+        totals.append(total)
+        for package, seconds in by_package.items():
+            packages.setdefault(package, []).append(seconds)
+    heaviest = sorted(((statistics.median(v), k) for k, v in packages.items()), reverse=True)[:8]
+    return {"median_s": round(statistics.median(totals), 3), "min_s": round(min(totals), 3),
+            "heaviest": {name: round(seconds, 3) for seconds, name in heaviest}}
+
+
+def measure_healthz(runs, env, timeout=60.0):
+    import httpx
+
+    timings = []
+    for _ in range(runs):
+        port = free_port()
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-m", "uvicorn", "fastapi_app:app", "--port", str(port),
+                                    "--log-level", "warning"], cwd=ROOT, env=env)
+        try:
+            while True:
+                try:
+                    if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1).status_code == 200:
+                        timings.append(time.perf_counter() - start)
+                        break
+                except httpx.HTTPError:
+                    pass
+                if process.poll() is not None or time.perf_counter() - start > timeout:
+                    return {"error": "server did not become healthy"}
+                time.sleep(0.01)
+        finally:
+            process.terminate()
+            process.wait(10)
+    return {"median_s": round(statistics.median(timings), 3), "min_s": round(min(timings), 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    env = child_environment()
+    report = {"imports": {}, "healthz": None}
+    for module in ENTRY_POINTS:
+        stats = report["imports"][module] = measure_import(module, args.runs, env)
+        if "error" in stats:
+            print(f"import {module:<12} skipped: {stats['error']}")
+            continue
+        heaviest = ", ".join(f"{name} {seconds * 1000:.0f}" for name, seconds in stats["heaviest"].items())
+        print(f"import {module:<12} median {stats['median_s'] * 1000:6.0f} ms   heaviest (ms): {heaviest}")
+    report["healthz"] = measure_healthz(args.runs, env)
+    if "error" in report["healthz"]:
+        print(f"first /healthz      {report['healthz']['error']}")
+    else:
+        print(f"first /healthz      median {report['healthz']['median_s'] * 1000:6.0f} ms "
+              f"(fastapi_app under uvicorn, from process spawn)")
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Per-request engine setup overhead: building every component per /chat call
+(the old behaviour) versus per-user sessions over a shared EngineCore.
+
+Usage: python benchmarks/bench_engine_setup.py [--requests 500]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Placeholder credentials so clients are constructed exactly as in production;
+# no network calls are made while building them.
+os.environ.setdefault("GEMINI_API_KEY", "bench-placeholder-key")
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench-placeholder-key")
+
+from core.therapy_engine_groq import EngineCore, TherapyEngine, get_engine_core
+
+
+def open_fd_count():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return -1
+
+
+def run(label, build, n):
+    fds_before = open_fd_count()
+    start = time.perf_counter()
+    for i in range(n):
+        build(f"bench-user-{i}")
+    elapsed = time.perf_counter() - start
+    fds_after = open_fd_count()
+    print(f"{label:<28} {elapsed / n * 1e6:>10.1f} us/request   fds +{fds_after - fds_before}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    run("before: fresh components", lambda uid: TherapyEngine(uid, core=EngineCore()), args.requests)
+    get_engine_core()
+    run("after: shared EngineCore", lambda uid: TherapyEngine(uid), args.requests)
+
+
+if __name__ == "__main__":
+    main()
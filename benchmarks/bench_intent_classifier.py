@@ -0,0 +1,57 @@
+"""
+Intent classifier cost per message: one message at a time versus batches,
+next to the keyword scan it complements.
+
+Usage: python benchmarks/bench_intent_classifier.py [--iterations 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ethical_modules.safety_checker  # noqa: F401  (registers crisis rules)
+from benchmarks.load_test import USER_MESSAGES
+from ethical_modules.intent_classifier import IntentClassifier
+from ethical_modules.rule_engine import RULES
+
+
+def per_message(fn, messages, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - start) / (iterations * len(messages))
+
+
+def per_message_batched(fn, messages, batch, iterations):
+    texts = (messages * (batch // len(messages) + 1))[:batch]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(texts)
+    return (time.perf_counter() - start) / (iterations * batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    classifier = IntentClassifier.load()
+    print(f"weights loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+    RULES.compile()
+
+    print(f"{'':>22} {'us/message':>12}")
+    print(f"{'keyword scan':>22} {per_message(RULES.scan, USER_MESSAGES, args.iterations) * 1e6:>12.1f}")
+    print(f"{'classifier, single':>22} "
+          f"{per_message(classifier.check_for_crisis, USER_MESSAGES, args.iterations) * 1e6:>12.1f}")
+    for batch in (8, 64, 512):
+        seconds = per_message_batched(classifier.check_for_crisis_batch, USER_MESSAGES, batch,
+                                      max(1, args.iterations // 8))
+        print(f"{f'classifier, batch {batch}':>22} {seconds * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
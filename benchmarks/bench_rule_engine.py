@@ -0,0 +1,59 @@
+"""
+Keyword matching cost: repeated `any(x in text.lower() for x in LIST)` scans
+versus one pass of the compiled RuleEngine, as rule lists grow.
+
+Usage: python benchmarks/bench_rule_engine.py [--iterations 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ethical_modules.rule_engine import RuleEngine
+
+TEXT = (
+    "It makes complete sense that you're feeling overwhelmed when facing that difficulty. "
+    "Many people notice their thoughts racing at night. What does the feeling of frustration "
+    "tell you about what you truly value in that situation?"
+)
+
+
+def build_lists(size):
+    return {f"category_{c}": [f"rule phrase {c} {i}" for i in range(size // 10)] for c in range(10)}
+
+
+def time_substring(lists, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for phrases in lists.values():
+            any(p in TEXT.lower() for p in phrases)
+    return (time.perf_counter() - start) / iterations
+
+
+def time_automaton(lists, iterations):
+    engine = RuleEngine()
+    for category, phrases in lists.items():
+        engine.register(category, phrases)
+    engine.compile()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        engine.scan(TEXT)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'rules':>8} {'substring us':>14} {'automaton us':>14}")
+    for size in (50, 500, 5000, 20000):
+        lists = build_lists(size)
+        print(f"{size:>8} {time_substring(lists, args.iterations) * 1e6:>14.1f} "
+              f"{time_automaton(lists, args.iterations) * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
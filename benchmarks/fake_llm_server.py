@@ -0,0 +1,149 @@
+"""
+Local stand-in for the Gemini REST endpoint, with injectable latency and errors.
+
+Used by tests/test_resilience.py and handy for trying the LLM client
+against a misbehaving provider:
+
+    python benchmarks/fake_llm_server.py --port 8099 --latency lognormal:0.4,0.6 --error-rate 0.1
+    REFLECTAI_LLM_BACKEND=rest GEMINI_API_KEY=fake \
+        REFLECTAI_GEMINI_REST_URL=http://127.0.0.1:8099/generate uvicorn fastapi_app:app
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.llm_backends import parse_latency
+
+REPLY = "That sounds really hard. What has been on your mind most since it happened?"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so tests can tell pooled clients from one-off connections
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        # Connection warm-up probes; answered like the real endpoint, without closing
+        server: "FakeLLMServer" = self.server.owner
+        server.connections.add(self.client_address)
+        status = server.get_status
+        payload = json.dumps({"error": {"code": status, "message": "use POST"}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        server: "FakeLLMServer" = self.server.owner
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        status, delay = server.next_response(self.client_address)
+        time.sleep(delay)
+        if status == 200:
+            body = {"candidates": [{"content": server.reply}]}
+        else:
+            body = {"error": {"code": status, "message": "injected failure"}}
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients abandoning timed-out or hedged requests reset the connection
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class FakeLLMServer:
+    """
+    Threaded HTTP server answering every POST like the REST endpoint.
+
+    Responses come from `script` first: a queue of (status, delay) pairs,
+    one per request. After that, each request sleeps a draw from `latency`
+    (a parse_latency() spec) and fails with `error_status` with
+    probability `error_rate`. GETs (warm-up and health probes) are
+    answered with `get_status`, 405 like the real endpoint by default.
+    """
+
+    def __init__(self, port: int = 0, latency: str = "fixed:0", error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 0, reply: str = REPLY):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply = reply
+        self.rng = random.Random(seed)
+        self.script: deque = deque()
+        self.get_status = 405
+        self.requests = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self.httpd = _QuietServer(("127.0.0.1", port), _Handler)
+        self.httpd.owner = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/generate"
+
+    def next_response(self, client_address):
+        with self._lock:
+            self.requests += 1
+            self.connections.add(client_address)
+            if self.script:
+                return self.script.popleft()
+            status = self.error_status if self.rng.random() < self.error_rate else 200
+            return status, self.sample_latency(self.rng)
+
+    def start(self) -> "FakeLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Gemini REST endpoint with injected latency and errors.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", default="fixed:0.2", help="latency spec, e.g. lognormal:0.4,0.6")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args(argv)
+    server = FakeLLMServer(args.port, args.latency, args.error_rate, args.error_status)
+    print(f"Fake LLM endpoint at {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+End-to-end load test for the /chat API.
+
+Starts fastapi_app under uvicorn with the stub LLM backend and a local
+conversation store (in-memory, or SQLite with --storage sqlite), drives it with concurrent simulated users
+holding multi-turn conversations, and reports requests/sec and latency
+percentiles. Results are written as JSON; with --baseline the run fails
+(exit code 1) when throughput or p95 latency regress past --max-regression.
+
+Usage:
+    python benchmarks/load_test.py --users 200 --concurrency 50 --turns 5 \
+        --llm-latency lognormal:0.3,0.5 --output bench_results.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Messages that go through the full pipeline (no crisis/humor/out-of-scope shortcut)
+USER_MESSAGES = [
+    "I had a rough week at work and I can't switch off in the evenings",
+    "My sister and I argued again and I keep replaying it",
+    "I've been sleeping badly and everything feels heavier",
+    "I want to start exercising but I never follow through",
+    "I felt left out when my friends made plans without me",
+    "I keep procrastinating on my thesis and then feel guilty",
+]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(args):
+    """Point the app at the stub LLM; inherited by the server process."""
+    os.environ["REFLECTAI_LLM_BACKEND"] = "stub"
+    os.environ["REFLECTAI_STUB_LATENCY"] = args.llm_latency
+    os.environ["REFLECTAI_STUB_TOKEN_DELAY"] = str(args.token_delay)
+    os.environ["REFLECTAI_STUB_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["REFLECTAI_STUB_SEED"] = str(args.seed)
+    os.environ["REFLECTAI_USER_RATE_PER_MINUTE"] = str(args.user_rate)
+    os.environ["REFLECTAI_LLM_MAX_CONCURRENCY"] = str(args.llm_max_concurrency)
+    os.environ["REFLECTAI_LLM_MAX_QUEUE"] = str(args.llm_max_queue)
+    # Local storage only: the benchmark never talks to Supabase
+    os.environ["REFLECTAI_STORAGE"] = args.storage
+    if args.storage == "sqlite":
+        os.environ["REFLECTAI_SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="reflectai-bench-"), "bench.db")
+
+
+def serve(port, certfile=None, keyfile=None):
+    """Run the app in this process on the configured local store (server side of the benchmark)."""
+    import uvicorn
+    from core.chat_memory import get_conversation_store
+    from fastapi_app import app
+
+    store = get_conversation_store()
+
+    @app.get("/_bench/store")
+    def bench_store():
+        return {"backend": store.name, "fetches": getattr(store, "fetches", None),
+                "inserts": getattr(store, "inserts", None)}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False,
+                ssl_certfile=certfile, ssl_keyfile=keyfile)
+
+
+def start_server(port, certfile=None, keyfile=None):
+    """
+    Start the app in a child process so the load generator and the server
+    don't compete for one interpreter lock. With a certificate it serves HTTPS.
+    """
+    import httpx
+
+    command = [sys.executable, os.path.abspath(__file__), "--serve", str(port)]
+    if certfile:
+        command += [certfile, keyfile]
+    process = subprocess.Popen(command)
+    scheme = "https" if certfile else "http"
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            if httpx.get(f"{scheme}://127.0.0.1:{port}/healthz", timeout=1, verify=False).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError("benchmark server did not start")
+        time.sleep(0.1)
+
+
+async def run_user(client, url, index, turns, endpoint, latencies, statuses):
+    for turn in range(turns):
+        message = USER_MESSAGES[(index + turn) % len(USER_MESSAGES)]
+        payload = {"user_id": f"bench-user-{index}", "message": message}
+        start = time.perf_counter()
+        try:
+            if endpoint == "stream":
+                async with client.stream("POST", url, json=payload) as response:
+                    async for _ in response.aiter_bytes():
+                        pass
+                    status = response.status_code
+            else:
+                response = await client.post(url, json=payload)
+                status = response.status_code
+        except Exception as exc:
+            status = type(exc).__name__
+        latencies.append((time.perf_counter() - start, str(status)))
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+
+async def worker(client, url, users, args, latencies, statuses):
+    """One virtual client working through conversations from `users`."""
+    async with client:
+        while True:
+            try:
+                index = users.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await run_user(client, url, index, args.turns, args.endpoint, latencies, statuses)
+
+
+async def drive(base_url, args):
+    import httpx
+
+    url = base_url + ("/chat/stream" if args.endpoint == "stream" else "/chat")
+    latencies, statuses = [], {}
+    users = asyncio.Queue()
+    for i in range(args.users):
+        users.put_nowait(i)
+    # One single-connection client per worker: a shared pool sized to the
+    # concurrency spends O(connections) per request looking for an idle
+    # socket and ends up measuring the load generator instead of the
+    # server. The server is plain http, so skip loading CA certificates.
+    limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+    clients = [httpx.AsyncClient(timeout=args.timeout, limits=limits, verify=False)
+               for _ in range(min(args.concurrency, args.users))]
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(client, url, users, args, latencies, statuses) for client in clients))
+    elapsed = time.perf_counter() - start
+    return latencies, statuses, elapsed
+
+
+def latency_summary(values):
+    ordered = sorted(values)
+    return {
+        "mean": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "p50": round(percentile(ordered, 50) * 1000, 2),
+        "p95": round(percentile(ordered, 95) * 1000, 2),
+        "p99": round(percentile(ordered, 99) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def summarize(latencies, statuses, elapsed):
+    ok = statuses.get("200", 0)
+    rejected = statuses.get("429", 0) + statuses.get("503", 0)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "rejected": rejected,
+        "errors": len(latencies) - ok - rejected,
+        "status_counts": statuses,
+        "duration_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        # Successful requests only; shed requests are reported separately
+        "latency_ms": latency_summary([t for t, status in latencies if status == "200"]),
+        "rejected_latency_ms": latency_summary([t for t, status in latencies if status in ("429", "503")]),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, max_regression):
+    """Return a list of regression messages (empty when within budget)."""
+    problems = []
+    base_rps = baseline["results"]["requests_per_s"]
+    base_p95 = baseline["results"]["latency_ms"]["p95"]
+    rps = results["requests_per_s"]
+    p95 = results["latency_ms"]["p95"]
+    if base_rps and rps < base_rps * (1 - max_regression):
+        problems.append(f"throughput {rps} req/s is below baseline {base_rps} req/s")
+    if base_p95 and p95 > base_p95 * (1 + max_regression):
+        problems.append(f"p95 latency {p95} ms is above baseline {base_p95} ms")
+    return problems
+
+
+def run(args):
+    configure_environment(args)
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(port)
+    try:
+        latencies, statuses, elapsed = asyncio.run(drive(base_url, args))
+        import httpx
+        store = httpx.get(base_url + "/_bench/store", timeout=5).json()
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "revision": git_revision()},
+        "results": summarize(latencies, statuses, elapsed),
+        "store": store,
+    }
+    return report
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="End-to-end load test for the /chat API.")
+    parser.add_argument("--users", type=int, default=100, help="simulated users (conversations)")
+    parser.add_argument("--concurrency", type=int, default=50, help="users active at the same time")
+    parser.add_argument("--turns", type=int, default=5, help="messages per conversation")
+    parser.add_argument("--endpoint", choices=("chat", "stream"), default="chat")
+    parser.add_argument("--llm-latency", default="lognormal:0.3,0.5", help="stub time-to-first-token spec")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="stub delay between streamed chunks")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="stub LLM failure probability")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--user-rate", type=float, default=0,
+                        help="per-user messages/minute before 429s (0 disables rate limiting)")
+    parser.add_argument("--llm-max-concurrency", type=int, default=16, help="global cap on concurrent LLM calls")
+    parser.add_argument("--llm-max-queue", type=int, default=64, help="queued LLM turns before requests are shed")
+    parser.add_argument("--storage", choices=("memory", "sqlite"), default="memory",
+                        help="conversation store used by the server")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON report")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.15,
+                        help="allowed fractional drop in req/s or rise in p95 vs the baseline")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["--serve"]:
+        serve(int(argv[1]), *argv[2:4])
+        return 0
+    args = build_parser().parse_args(argv)
+    report = run(args)
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+
+    results = report["results"]
+    lat = results["latency_ms"]
+    print(f"{results['requests']} requests in {results['duration_s']}s "
+          f"({results['requests_per_s']} req/s), rejected (429/503): {results['rejected']}, "
+          f"errors: {results['errors']}")
+    print(f"latency ms  p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    print(f"report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            problems = compare(results, json.load(fh), args.max_regression)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        if problems:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
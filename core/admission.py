@@ -0,0 +1,250 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+LLM_MAX_CONCURRENCY = int(os.getenv("REFLECTAI_LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_QUEUE = int(os.getenv("REFLECTAI_LLM_MAX_QUEUE", "64"))
+USER_RATE_PER_MINUTE = float(os.getenv("REFLECTAI_USER_RATE_PER_MINUTE", "20"))
+USER_BURST = int(os.getenv("REFLECTAI_USER_BURST", "5"))
+RATE_LIMIT_MAX_USERS = 100_000
+
+
+class AdmissionRejected(Exception):
+    """A request turned away before doing any work. Safe to retry after `retry_after` seconds."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimited(AdmissionRejected):
+    status_code = 429
+
+
+class Overloaded(AdmissionRejected):
+    status_code = 503
+
+
+class TokenBucketLimiter:
+    """
+    Per-user token buckets: each user may send `burst` messages at once
+    and `rate_per_minute` on average. Buckets are kept for the most
+    recently active `max_users` users; an evicted bucket was idle long
+    enough to have refilled anyway.
+    """
+
+    def __init__(self, rate_per_minute: float = USER_RATE_PER_MINUTE, burst: int = USER_BURST,
+                 max_users: int = RATE_LIMIT_MAX_USERS):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.burst > 0
+
+    def try_acquire(self, user_id: str) -> float:
+        """Take one token. Returns 0 on success, else seconds until one is available."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = [float(self.burst), now]
+                if len(self._buckets) > self.max_users:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(user_id)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+
+class ConcurrencyLimit:
+    """
+    Counting semaphore usable from both event loops and threads, so the
+    async API and the synchronous UI paths share one global cap. Waiters
+    are served first come, first served.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def _grant_next(self):
+        # Caller holds self._lock and has just freed a slot
+        while self._waiters and self.active < self.limit:
+            waiter = self._waiters.popleft()
+            if isinstance(waiter, threading.Event):
+                self.active += 1
+                waiter.set()
+                return
+            loop, future = waiter
+            if future.done():
+                continue
+            self.active += 1
+            loop.call_soon_threadsafe(self._resolve, future)
+            return
+
+    def _resolve(self, future):
+        if not future.done():
+            future.set_result(True)
+        else:
+            # Cancelled after being granted: hand the slot on
+            self.release()
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+            self._grant_next()
+
+    def acquire(self):
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = future.done() and not future.cancelled()
+                try:
+                    self._waiters.remove((loop, future))
+                except ValueError:
+                    pass
+            if granted:
+                self.release()
+            raise
+
+
+class _Ticket:
+    """An admitted LLM turn. Holds a place in the queue until closed."""
+
+    __slots__ = ("controller", "closed")
+
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.controller._leave()
+
+    def llm_slot(self):
+        return _Slot(self.controller)
+
+
+class _Slot:
+    """Context manager around one LLM call, sync or async."""
+
+    __slots__ = ("controller", "started")
+
+    def __init__(self, controller: "AdmissionController"):
+        self.controller = controller
+
+    def __enter__(self):
+        self.controller.llm_limit.acquire()
+        self.started = time.monotonic()
+
+    def __exit__(self, *exc):
+        self.controller._call_done(time.monotonic() - self.started)
+
+    async def __aenter__(self):
+        await self.controller.llm_limit.acquire_async()
+        self.started = time.monotonic()
+
+    async def __aexit__(self, *exc):
+        self.controller._call_done(time.monotonic() - self.started)
+
+
+class AdmissionController:
+    """
+    Admission control in front of the LLM.
+
+    check_rate(user_id) applies the per-user token bucket. admit() lets
+    an LLM turn in only while fewer than `max_concurrency + max_queue`
+    turns are in the system, and otherwise sheds it with Overloaded, so
+    a queued turn waits for at most ~max_queue / max_concurrency LLM
+    calls. Inside an admitted turn, llm_slot() caps concurrent LLM calls
+    at `max_concurrency`.
+
+    Both checks run before the turn touches storage, so a rejected
+    request leaves no trace and can simply be retried.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE,
+                 limiter: Optional[TokenBucketLimiter] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.llm_limit = ConcurrencyLimit(max_concurrency)
+        self.limiter = limiter or TokenBucketLimiter()
+        self._lock = threading.Lock()
+        self.in_system = 0
+        # Smoothed LLM call duration, used for Retry-After hints
+        self.avg_call_seconds = 1.0
+        self.stats = {"admitted": 0, "shed": 0, "rate_limited": 0}
+
+    def check_rate(self, user_id: str):
+        wait = self.limiter.try_acquire(user_id)
+        if wait:
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            raise RateLimited("You're sending messages faster than I can thoughtfully reply. "
+                              f"Please wait a few seconds and try again.", wait)
+
+    def admit(self) -> _Ticket:
+        with self._lock:
+            if self.in_system >= self.max_concurrency + self.max_queue:
+                self.stats["shed"] += 1
+                backlog = self.in_system - self.max_concurrency + 1
+                retry_after = backlog / max(1, self.max_concurrency) * self.avg_call_seconds
+                raise Overloaded("I'm getting a lot of messages right now. "
+                                 "Please try again in a moment.", retry_after)
+            self.in_system += 1
+            self.stats["admitted"] += 1
+        return _Ticket(self)
+
+    def _leave(self):
+        with self._lock:
+            self.in_system -= 1
+
+    def _call_done(self, seconds: float):
+        self.llm_limit.release()
+        with self._lock:
+            self.avg_call_seconds += 0.1 * (seconds - self.avg_call_seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.stats, in_system=self.in_system, llm_active=self.llm_limit.active,
+                        llm_waiting=self.llm_limit.waiting, avg_call_seconds=round(self.avg_call_seconds, 4))
@@ -0,0 +1,76 @@
+import os
+import ssl
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional, Union
+
+import httpx
+
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("REFLECTAI_BACKEND_CONNECT_TIMEOUT", "5"))
+# Time allowed between bytes, not for the whole reply: streamed replies can run longer
+BACKEND_READ_TIMEOUT = float(os.getenv("REFLECTAI_BACKEND_READ_TIMEOUT", "30"))
+BACKEND_POOL_SIZE = int(os.getenv("REFLECTAI_BACKEND_POOL_SIZE", "20"))
+BACKEND_KEEPALIVE_SECONDS = float(os.getenv("REFLECTAI_BACKEND_KEEPALIVE_SECONDS", "60"))
+BACKEND_HTTP2 = os.getenv("REFLECTAI_BACKEND_HTTP2", "0") == "1"
+
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class BackendClient:
+    """
+    Shared HTTP client for the UI's calls to the chat API.
+
+    Connections are pooled and kept alive between messages, so only the
+    first message to a backend pays for the TCP and TLS handshakes. With
+    `http2` (and the optional `h2` package installed) messages are
+    multiplexed over one connection where the server or its proxy
+    supports it; otherwise HTTP/1.1 is used.
+    """
+
+    def __init__(self, chat_url: str, stream_url: Optional[str] = None,
+                 connect_timeout: float = BACKEND_CONNECT_TIMEOUT,
+                 read_timeout: float = BACKEND_READ_TIMEOUT,
+                 pool_size: int = BACKEND_POOL_SIZE,
+                 keepalive_seconds: float = BACKEND_KEEPALIVE_SECONDS,
+                 http2: bool = BACKEND_HTTP2,
+                 verify: Union[bool, ssl.SSLContext] = True):
+        self.chat_url = chat_url
+        self.stream_url = stream_url or chat_url.rstrip("/") + "/stream"
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size,
+                                   keepalive_expiry=keepalive_seconds)
+        self.http2 = http2 and http2_available()
+        self.verify = verify
+        self._client: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(timeout=self.timeout, limits=self.limits,
+                                                http2=self.http2, verify=self.verify)
+        return self._client
+
+    def chat(self, user_id: str, message: str) -> httpx.Response:
+        return self.client.post(self.chat_url, json={"user_id": user_id, "message": message})
+
+    @contextmanager
+    def stream_chat(self, user_id: str, message: str) -> Iterator[httpx.Response]:
+        """POST to the streaming endpoint; the connection returns to the pool on exit."""
+        with self.client.stream("POST", self.stream_url,
+                                json={"user_id": user_id, "message": message}) as response:
+            yield response
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
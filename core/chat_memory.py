@@ -1,34 +1,128 @@
 import os
 from datetime import datetime
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
-from supabase import create_client
+
+from core.conversation_cache import ConversationCache
+from core.health import HEALTH
+from core.metrics import REGISTRY
+from core.storage import HISTORY_COLUMNS, PAGE_COLUMNS, ConversationStore, create_store, page_cursor
+from core.write_behind import WriteBehindQueue
 
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Supabase by default; REFLECTAI_STORAGE=sqlite keeps history in a local file
+_store: ConversationStore = create_store()
+
+# Recent history per user; reads are served from here and writes go
+# through to the store, so the select only runs on a cache miss.
+conversation_cache = ConversationCache()
+
+
+def get_conversation_store() -> ConversationStore:
+    return _store
+
+
+def set_conversation_store(store: ConversationStore):
+    """Swap the storage backend (e.g. an in-memory store for benchmarks)."""
+    global _store
+    flush_conversation_writes()
+    _store = store
+    conversation_cache.clear()
+
+
+def _insert_rows(rows):
+    """Bulk insert used by the background writer; raises so it can retry."""
+    _store.insert(rows)
+
+
+# Rows per page when the UIs load history lazily
+HISTORY_PAGE_SIZE = int(os.getenv("REFLECTAI_HISTORY_PAGE_SIZE", "30"))
 
+# Inserts are buffered and flushed in bulk off the request path. Set
+# REFLECTAI_WRITE_BEHIND=0 to insert synchronously (e.g. one-off scripts).
+WRITE_BEHIND = os.getenv("REFLECTAI_WRITE_BEHIND", "1") == "1"
+conversation_writer = WriteBehindQueue(_insert_rows, name="conversation-writer")
 
-def load_user_conversation(user_id: str):
+REGISTRY.register_collector("reflectai_history_cache", conversation_cache.stats,
+                            "Conversation history cache statistics.")
+REGISTRY.register_collector("reflectai_conversation_writer", conversation_writer.snapshot,
+                            "Write-behind conversation writer totals.")
+
+
+def flush_conversation_writes(timeout: float = 10.0) -> bool:
+    """Wait for buffered conversation rows to reach the store."""
+    return conversation_writer.flush(timeout)
+
+
+def shutdown_conversation_writer(timeout: float = 10.0) -> bool:
+    """Flush buffered rows and stop the background writer (app shutdown)."""
+    return conversation_writer.stop(timeout)
+
+
+def _merge_pending(user_id: str, rows, limit: Optional[int]):
+    # Rows still waiting in the writer are not in the store yet
+    pending = conversation_writer.pending_rows(user_id)
+    if not pending:
+        return rows
+    seen = {(r.get('timestamp'), r.get('role'), r.get('content')) for r in rows}
+    merged = list(rows) + [r for r in pending if (r.get('timestamp'), r.get('role'), r.get('content')) not in seen]
+    merged.sort(key=lambda r: r.get('timestamp') or '')
+    return merged[-limit:] if limit is not None else merged
+
+
+def load_user_conversation(user_id: str, limit: Optional[int] = None):
+    """
+    Load a user's conversation in chronological order.
+    With `limit`, only the most recent `limit` rows are fetched.
+    """
+    cached = conversation_cache.get(user_id, limit)
+    if cached is not None:
+        return cached
+    if HEALTH.is_down("storage"):
+        # Probes found the store down: answer from rows not yet written
+        # instead of waiting out a timeout, and cache nothing
+        return _merge_pending(user_id, [], limit)
     try:
-        response = (
-            supabase
-            .table('conversations')
-            .select('*')
-            .eq('user_id', user_id)
-            .order('timestamp', desc=False)
-            .execute()
-        )
-        error = getattr(response, 'error', None)
-        if error:
-            print(f"Error loading conversation: {error.message if hasattr(error, 'message') else str(error)}")
-            return []
-        return getattr(response, 'data', [])
+        rows = _store.fetch(user_id, limit)
     except Exception as exc:
         print(f"Error loading conversation for {user_id}: {exc}")
-        return []
+        return _merge_pending(user_id, [], limit)
+    rows = _merge_pending(user_id, rows, limit)
+    conversation_cache.put(user_id, rows, complete=limit is None or len(rows) < limit)
+    return list(rows)
+
+
+def load_conversation_page(user_id: str, limit: int = HISTORY_PAGE_SIZE,
+                           before: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Load one page of a user's conversation, oldest-first: the newest
+    `limit` rows, or with `before` (a cursor from the previous page) the
+    `limit` rows preceding it. Returns (rows, cursor); the cursor is None
+    once the start of the conversation is reached.
+    """
+    # One extra row tells whether an older page exists. Pages come from
+    # the store rather than the cache: cursors need the rows' ids
+    if HEALTH.is_down("storage"):
+        if before is not None:
+            return [], before
+        rows = _merge_pending(user_id, [], limit + 1)
+    else:
+        try:
+            rows = _store.fetch(user_id, limit + 1, before=before, columns=PAGE_COLUMNS)
+        except Exception as exc:
+            print(f"Error loading conversation page for {user_id}: {exc}")
+            if before is not None:
+                # Keep the cursor so the page can be retried
+                return [], before
+            rows = []
+        if before is None:
+            rows = _merge_pending(user_id, rows, limit + 1)
+    history = [{c: r.get(c) for c in HISTORY_COLUMNS} for r in rows]
+    if len(rows) <= limit:
+        return history, None
+    return history[1:], page_cursor(rows[1])
 
 
 def append_to_conversation(user_id: str, role: str, content: str, session_id=None):
@@ -40,9 +134,12 @@ def append_to_conversation(user_id: str, role: str, content: str, session_id=Non
             "timestamp": datetime.utcnow().isoformat(),
             "session_id": session_id,
         }
-        response = supabase.table('conversations').insert(payload).execute()
-        error = getattr(response, 'error', None)
-        if error:
-            print(f"Error appending conversation: {error.message if hasattr(error, 'message') else str(error)}")
+        # Keep the cached history in step even if the insert fails,
+        # so the turn being answered is always part of the prompt
+        conversation_cache.append(user_id, payload)
+        if WRITE_BEHIND:
+            conversation_writer.submit(payload)
+        else:
+            _insert_rows([payload])
     except Exception as exc:
         print(f"Error appending conversation for {user_id}: {exc}")
@@ -0,0 +1,228 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+UI_MAX_MESSAGES = int(os.getenv("REFLECTAI_UI_MAX_MESSAGES", "500"))
+UI_MAX_SESSIONS = int(os.getenv("REFLECTAI_UI_MAX_SESSIONS", "1000"))
+UI_SESSION_IDLE_SECONDS = float(os.getenv("REFLECTAI_UI_SESSION_IDLE_SECONDS", "1800"))
+UI_MAX_BYTES = int(os.getenv("REFLECTAI_UI_MAX_BYTES", str(64 * 1024 * 1024)))
+# Sessions used this recently are never evicted to free memory
+UI_SESSION_GRACE_SECONDS = float(os.getenv("REFLECTAI_UI_SESSION_GRACE_SECONDS", "60"))
+
+MEMORY_CHECK_SECONDS = 5.0
+
+# Rough per-message cost of the dict and keys on top of the content
+MESSAGE_OVERHEAD_BYTES = 200
+
+
+def _message_size(message: Dict[str, str]) -> int:
+    return MESSAGE_OVERHEAD_BYTES + len(message.get("content") or "")
+
+
+class ChatTranscript:
+    """
+    Messages shown in one chat window, in order.
+
+    Appending is amortized O(1) and replace_last() swaps in a new dict, so
+    a message dict never changes once rendered; the UI can compare
+    messages by identity and skip unchanged bubbles. Only the newest
+    `max_messages` stay in memory (the full history is in storage);
+    indexes are absolute, so they stay stable as old messages are dropped.
+
+    Messages carry a UTC timestamp like stored rows. Once older messages
+    exist only in storage, `cursor` is where to page back from (see
+    chat_memory.load_conversation_page) and prepend() adds the rows. The
+    first cursor is the UI timestamp of the oldest user message kept;
+    after that each page's cursor comes from the store.
+    """
+
+    def __init__(self, max_messages: int = UI_MAX_MESSAGES):
+        self.max_messages = max_messages
+        self.messages: List[Dict[str, str]] = []
+        # Absolute index of self.messages[0]
+        self.offset = 0
+        self.cursor: Optional[str] = None
+        self.size = 0
+        self.version = 0
+
+    def __len__(self) -> int:
+        return self.offset + len(self.messages)
+
+    @property
+    def last(self) -> Optional[Dict[str, str]]:
+        return self.messages[-1] if self.messages else None
+
+    def append(self, role: str, content: str) -> int:
+        message = {"role": role, "content": content, "timestamp": datetime.utcnow().isoformat()}
+        self.messages.append(message)
+        self.size += _message_size(message)
+        # Trim in chunks so the list isn't shifted on every append
+        if len(self.messages) > self.max_messages + max(1, self.max_messages // 4):
+            self._trim(len(self.messages) - self.max_messages)
+        self.version += 1
+        return len(self) - 1
+
+    def replace_last(self, content: str):
+        old = self.messages[-1]
+        self.messages[-1] = {"role": old["role"], "content": content, "timestamp": old["timestamp"]}
+        self.size += len(content) - len(old["content"] or "")
+        self.version += 1
+
+    def _trim(self, count: int):
+        # Keep from a user message on: the UI shows it before it is stored,
+        # so every stored row older than its timestamp is one being dropped.
+        # (An assistant reply may be stored before the UI shows it.)
+        count = next((i for i in range(count, len(self.messages)) if self.messages[i]["role"] == "user"), count)
+        self.size -= sum(_message_size(m) for m in self.messages[:count])
+        del self.messages[:count]
+        self.offset += count
+        self.cursor = self.messages[0]["timestamp"]
+
+    def prepend(self, rows: List[Dict[str, str]], cursor: Optional[str]):
+        """Add a page of older rows from storage; `cursor` is where the next page starts."""
+        messages = [{"role": r["role"], "content": r["content"], "timestamp": r["timestamp"]} for r in rows]
+        self.messages[:0] = messages
+        self.offset -= len(messages)
+        self.size += sum(_message_size(m) for m in messages)
+        self.cursor = cursor
+        self.version += 1
+
+    def window(self, count: int) -> List[Tuple[int, Dict[str, str]]]:
+        """The newest `count` in-memory messages as (absolute index, message)."""
+        start = max(0, len(self.messages) - count)
+        return [(self.offset + i, self.messages[i]) for i in range(start, len(self.messages))]
+
+
+class ChatSession:
+    """One chat window's state: the conversation id sent to the engine and its transcript."""
+
+    __slots__ = ("session_id", "transcript", "last_active", "in_flight")
+
+    def __init__(self, max_messages: int = UI_MAX_MESSAGES):
+        self.session_id = str(uuid.uuid4())
+        self.transcript = ChatTranscript(max_messages)
+        self.last_active = time.monotonic()
+        # Replies being generated for this session (see SessionRegistry.working)
+        self.in_flight = 0
+
+
+class SessionRegistry:
+    """
+    Process-wide map from UI connection key to ChatSession.
+
+    Sessions idle for `idle_seconds` are evicted, and least recently used
+    sessions go first once there are more than `max_sessions` or their
+    transcripts together pass `max_bytes`. Sessions with a reply in flight,
+    or used within `grace_seconds`, are never evicted, so the limits may be
+    exceeded for a while. A connection whose session was evicted gets a
+    fresh one on its next access.
+    """
+
+    def __init__(self, max_sessions: int = UI_MAX_SESSIONS, idle_seconds: float = UI_SESSION_IDLE_SECONDS,
+                 max_bytes: int = UI_MAX_BYTES, max_messages: int = UI_MAX_MESSAGES,
+                 grace_seconds: float = UI_SESSION_GRACE_SECONDS,
+                 on_create: Optional[Callable[[ChatSession], None]] = None):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.grace_seconds = grace_seconds
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self.on_create = on_create
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_memory_check = 0.0
+        self.stats = {"created": 0, "evicted_idle": 0, "evicted_memory": 0, "closed": 0}
+
+    def get(self, key: str) -> ChatSession:
+        """The session for `key`, created if missing; marks it active."""
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = ChatSession(self.max_messages)
+                self.stats["created"] += 1
+                created = True
+            else:
+                self._sessions.move_to_end(key)
+                created = False
+            session.last_active = time.monotonic()
+            self._evict(keep=key)
+        if created and self.on_create is not None:
+            self.on_create(session)
+        return session
+
+    def reset(self, key: str) -> ChatSession:
+        """Replace the session for `key` with a new one (New Session button)."""
+        with self._lock:
+            self._sessions.pop(key, None)
+        return self.get(key)
+
+    def drop(self, key: str):
+        with self._lock:
+            if self._sessions.pop(key, None) is not None:
+                self.stats["closed"] += 1
+
+    @contextmanager
+    def working(self, session: ChatSession):
+        """Protect `session` from eviction while a reply is generated for it."""
+        with self._lock:
+            session.in_flight += 1
+            session.last_active = time.monotonic()
+        try:
+            yield session
+        finally:
+            with self._lock:
+                session.in_flight -= 1
+                session.last_active = time.monotonic()
+
+    def evict(self) -> int:
+        """Evict idle and over-budget sessions. Returns how many were removed."""
+        with self._lock:
+            return self._evict(force=True)
+
+    # Callers hold self._lock
+    def _evict(self, keep: Optional[str] = None, force: bool = False) -> int:
+        now = time.monotonic()
+        cutoff = now - self.idle_seconds
+        # Least recently active first; stop at the first active session.
+        # Busy sessions keep their place (last_active is refreshed when
+        # their reply ends) and are stepped over
+        idle = []
+        for key, session in self._sessions.items():
+            if session.in_flight or key == keep:
+                continue
+            if session.last_active >= cutoff:
+                break
+            idle.append(key)
+        for key in idle:
+            del self._sessions[key]
+        self.stats["evicted_idle"] += len(idle)
+        removed = len(idle)
+        # Summing transcript sizes is O(sessions), so the byte budget is
+        # checked at most every MEMORY_CHECK_SECONDS
+        check_bytes = force or now - self._last_memory_check >= MEMORY_CHECK_SECONDS
+        if not check_bytes and len(self._sessions) <= self.max_sessions:
+            return removed
+        total = 0  # Without a byte check, only the session count is enforced
+        if check_bytes:
+            self._last_memory_check = now
+            total = sum(s.transcript.size for s in self._sessions.values())
+        recent = now - self.grace_seconds
+        for key, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions and total <= self.max_bytes:
+                break
+            if key == keep or session.in_flight or session.last_active >= recent:
+                continue
+            total -= self._sessions.pop(key).transcript.size
+            self.stats["evicted_memory"] += 1
+            removed += 1
+        return removed
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.stats, sessions=len(self._sessions),
+                        bytes=sum(s.transcript.size for s in self._sessions.values()))
@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+CACHE_MAX_BYTES = int(os.getenv("REFLECTAI_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL_SECONDS = float(os.getenv("REFLECTAI_CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ROWS_PER_USER = int(os.getenv("REFLECTAI_CACHE_MAX_ROWS", "200"))
+
+# Rough per-row cost of the dict, keys and metadata on top of the content
+ROW_OVERHEAD_BYTES = 256
+
+
+def _row_size(row: dict) -> int:
+    return ROW_OVERHEAD_BYTES + len(row.get("content") or "")
+
+
+class _Entry:
+    __slots__ = ("rows", "complete", "used_at", "size")
+
+    def __init__(self, rows: List[dict], complete: bool):
+        self.rows = rows
+        self.complete = complete
+        # Last load, hit or write-through; the TTL counts from here
+        self.used_at = time.monotonic()
+        self.size = sum(_row_size(r) for r in rows)
+
+
+class ConversationCache:
+    """
+    In-process LRU cache of recent conversation rows, keyed by user_id.
+    Entries expire once unused for `ttl` seconds (a hit or a write-through
+    append keeps an active conversation cached), and
+    least recently used users are evicted once the estimated size of all
+    cached rows exceeds `max_bytes`.
+
+    An entry holds the newest rows of a conversation (at most
+    `max_rows_per_user`). `complete` records whether it is the whole
+    conversation, so unbounded reads can be served from it too.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL_SECONDS,
+                 max_rows_per_user: int = CACHE_MAX_ROWS_PER_USER):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_rows_per_user = max_rows_per_user
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, limit: Optional[int] = None) -> Optional[List[dict]]:
+        """Return the newest `limit` rows (all rows if None), or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            now = time.monotonic()
+            if entry is not None and now - entry.used_at > self.ttl:
+                self._remove(user_id)
+                entry = None
+            if entry is None or not (entry.complete or (limit is not None and len(entry.rows) >= limit)):
+                self.misses += 1
+                return None
+            entry.used_at = now
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            rows = entry.rows if limit is None else entry.rows[-limit:]
+            return list(rows)
+
+    def put(self, user_id: str, rows: List[dict], complete: bool):
+        """Store rows just read from storage."""
+        rows = list(rows)
+        if len(rows) > self.max_rows_per_user:
+            rows = rows[-self.max_rows_per_user:]
+            complete = False
+        with self._lock:
+            self._remove(user_id)
+            entry = _Entry(rows, complete)
+            self._entries[user_id] = entry
+            self._size += entry.size
+            self._evict()
+
+    def append(self, user_id: str, row: dict):
+        """Apply a write to a cached conversation; uncached users are left alone."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            if time.monotonic() - entry.used_at > self.ttl:
+                self._remove(user_id)
+                return
+            entry.used_at = time.monotonic()
+            entry.rows.append(row)
+            added = _row_size(row)
+            entry.size += added
+            self._size += added
+            while len(entry.rows) > self.max_rows_per_user:
+                removed = _row_size(entry.rows.pop(0))
+                entry.size -= removed
+                self._size -= removed
+                entry.complete = False
+            self._entries.move_to_end(user_id)
+            self._evict()
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._remove(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    # Callers hold self._lock
+    def _remove(self, user_id: str):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._size -= entry.size
+            self.evictions += 1
@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+HEALTH_INTERVAL_SECONDS = float(os.getenv("REFLECTAI_HEALTH_INTERVAL_SECONDS", "10"))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("REFLECTAI_HEALTH_PROBE_TIMEOUT_SECONDS", "5"))
+# Consecutive failed probes before a dependency counts as down
+HEALTH_FAILURE_THRESHOLD = int(os.getenv("REFLECTAI_HEALTH_FAILURES", "2"))
+# Probes kept for the rolling error rate and latency
+HEALTH_WINDOW = int(os.getenv("REFLECTAI_HEALTH_WINDOW", "20"))
+
+UNKNOWN = "unknown"
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+DOWN = "down"
+
+
+class DependencyHealth:
+    """
+    Rolling probe results for one dependency.
+
+    Down after `failure_threshold` failed probes in a row, until a probe
+    succeeds again; degraded while failures remain in the last `window`
+    probes; unknown before the first probe.
+    """
+
+    def __init__(self, name: str, probe: Callable[[], None], window: int = HEALTH_WINDOW,
+                 failure_threshold: int = HEALTH_FAILURE_THRESHOLD):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        # (ok, seconds) per probe, newest last
+        self.results: deque = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[float] = None
+        self.probes = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, seconds: float, error: Optional[str] = None):
+        with self._lock:
+            self.results.append((ok, seconds))
+            self.probes += 1
+            self.last_checked = time.time()
+            if ok:
+                self.consecutive_failures = 0
+            else:
+                self.consecutive_failures += 1
+                self.last_error = error
+
+    @property
+    def status(self) -> str:
+        with self._lock:
+            if not self.results:
+                return UNKNOWN
+            if self.consecutive_failures >= self.failure_threshold:
+                return DOWN
+            if any(not ok for ok, _ in self.results):
+                return DEGRADED
+            return HEALTHY
+
+    def snapshot(self) -> dict:
+        status = self.status
+        with self._lock:
+            latencies = sorted(seconds for ok, seconds in self.results if ok)
+            failures = sum(1 for ok, _ in self.results if not ok)
+            return {
+                "status": status,
+                "probes": self.probes,
+                "error_rate": round(failures / len(self.results), 3) if self.results else 0.0,
+                "latency_p50_seconds": round(latencies[len(latencies) // 2], 4) if latencies else None,
+                "latency_p95_seconds": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4)
+                if latencies else None,
+                "consecutive_failures": self.consecutive_failures,
+                "last_error": self.last_error,
+                "last_checked": self.last_checked,
+            }
+
+
+class HealthMonitor:
+    """
+    Probes registered dependencies from a background thread and caches
+    their status, so request paths can check a dependency's health
+    without calling it.
+
+    Probes run concurrently and each gets `timeout` seconds; a probe
+    still running when the next round starts counts as failed rather
+    than being started twice.
+    """
+
+    def __init__(self, interval: float = HEALTH_INTERVAL_SECONDS, timeout: float = HEALTH_PROBE_TIMEOUT_SECONDS):
+        self.interval = interval
+        self.timeout = timeout
+        self.dependencies: Dict[str, DependencyHealth] = {}
+        self._running: Dict[str, object] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def register(self, name: str, probe: Callable[[], None], **options) -> DependencyHealth:
+        """Add (or replace) a dependency. `probe` raises when the dependency is unhealthy."""
+        with self._lock:
+            dependency = self.dependencies[name] = DependencyHealth(name, probe, **options)
+            return dependency
+
+    def is_down(self, name: str) -> bool:
+        """True only when probes show `name` is down; unknown dependencies are assumed up."""
+        dependency = self.dependencies.get(name)
+        return dependency is not None and dependency.status == DOWN
+
+    def _timed(self, dependency: DependencyHealth):
+        start = time.monotonic()
+        try:
+            dependency.probe()
+        except Exception as exc:
+            dependency.record(False, time.monotonic() - start, f"{type(exc).__name__}: {exc}")
+        else:
+            dependency.record(True, time.monotonic() - start)
+
+    def probe_once(self):
+        """Run one round of probes and wait for it (at most `timeout`)."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="health-probe")
+            dependencies = list(self.dependencies.values())
+        submitted = {}
+        for dependency in dependencies:
+            previous = self._running.get(dependency.name)
+            if previous is not None and not previous.done():
+                dependency.record(False, self.timeout, "previous probe still running")
+                continue
+            submitted[dependency.name] = self._running[dependency.name] = \
+                self._executor.submit(self._timed, dependency)
+        _, pending = wait(list(submitted.values()), timeout=self.timeout)
+        for name, future in submitted.items():
+            if future in pending:
+                self.dependencies[name].record(False, self.timeout, f"probe timed out after {self.timeout}s")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_once()
+            except Exception as exc:
+                print(f"Health probe round failed: {exc}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(self.timeout)
+
+    def status(self) -> str:
+        statuses = {d.status for d in self.dependencies.values()}
+        if DOWN in statuses:
+            return DOWN
+        if DEGRADED in statuses:
+            return DEGRADED
+        return "ok"
+
+    def snapshot(self) -> dict:
+        return {"status": self.status(),
+                "dependencies": {name: d.snapshot() for name, d in self.dependencies.items()}}
+
+    def metrics(self) -> Dict[str, float]:
+        values = {}
+        for name, dependency in self.dependencies.items():
+            snapshot = dependency.snapshot()
+            values[f"{name}_up"] = 0 if snapshot["status"] == DOWN else 1
+            values[f"{name}_error_rate"] = snapshot["error_rate"]
+            values[f"{name}_latency_p95_seconds"] = snapshot["latency_p95_seconds"] or 0.0
+            values[f"{name}_probes"] = snapshot["probes"]
+        return values
+
+
+# Process-wide monitor; the engine and chat_memory consult it
+HEALTH = HealthMonitor()
+
+
+def start_dependency_probes(core) -> HealthMonitor:
+    """Register the LLM backend and conversation store of `core` with HEALTH and start probing."""
+    # Imported here: chat_memory itself consults HEALTH
+    from core.chat_memory import get_conversation_store
+    from core.metrics import REGISTRY
+
+    # The LLM probe fails on 5xx/429, not just on no answer; the store is
+    # looked up on every probe so a swapped store is the one probed
+    HEALTH.register("llm", core.llm.probe)
+    HEALTH.register("storage", lambda: get_conversation_store().warm())
+    REGISTRY.register_collector("reflectai_dependency", HEALTH.metrics,
+                                "Dependency health from background probes.")
+    # Read at call time, after the app has loaded .env
+    if os.getenv("REFLECTAI_HEALTH_PROBES", "1") == "1":
+        HEALTH.start()
+    return HEALTH
@@ -0,0 +1,411 @@
+import asyncio
+import hashlib
+import importlib.util
+import math
+import os
+import random
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_REST_URL = os.getenv(
+    "REFLECTAI_GEMINI_REST_URL",
+    "https://generativelanguage.googleapis.com/v1beta2/models/text-bison-001:generateMessage",
+)
+# Per-attempt deadlines; retries and backoff are handled by core.resilience
+LLM_TIMEOUT_SECONDS = float(os.getenv("REFLECTAI_LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("REFLECTAI_LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_POOL_SIZE = int(os.getenv("REFLECTAI_LLM_POOL_SIZE", "32"))
+
+
+def build_prompt(messages: List[Dict[str, str]]) -> str:
+    # Build a single prompt from system + conversation for SDK simplicity
+    conversation_text = []
+    for m in messages:
+        role = m.get("role", "user")
+        content = m.get("content", "")
+        conversation_text.append(f"{role.upper()}: {content}")
+    return "\n".join(conversation_text)
+
+
+class LLMBackend:
+    """
+    Interface the engine uses to talk to a language model.
+    `messages` is the prompt window: a system message followed by the
+    conversation turns, each a {"role", "content"} dict.
+
+    Subclasses implement generate(); the async and streaming variants
+    fall back to it (in a worker thread, as a single chunk) unless a
+    backend has a native implementation.
+    """
+
+    name = "base"
+
+    def generate(self, messages: List[Dict[str, str]]) -> str:
+        raise NotImplementedError
+
+    async def agenerate(self, messages: List[Dict[str, str]]) -> str:
+        return await asyncio.to_thread(self.generate, messages)
+
+    def stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        yield self.generate(messages)
+
+    async def astream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        yield await self.agenerate(messages)
+
+    def warm(self):
+        """Build the client and open a connection ahead of the first turn (startup)."""
+
+    async def awarm(self):
+        """warm() for the pool used from the running event loop."""
+        await asyncio.to_thread(self.warm)
+
+    def probe(self):
+        """Cheap health check for the background prober; raises if the provider is unhealthy."""
+        self.warm()
+
+    def close(self):
+        """Release pooled connections (app shutdown)."""
+
+    async def aclose(self):
+        self.close()
+
+
+class LLMHTTPError(RuntimeError):
+    """Error response from an LLM HTTP endpoint; `status_code` decides whether it is retried."""
+
+    def __init__(self, status_code: int, detail):
+        super().__init__(f"Google API error {status_code}: {detail}")
+        self.status_code = status_code
+
+
+class GeminiSDKBackend(LLMBackend):
+    """
+    Gemini through the official google-genai SDK (sync, async and streaming).
+    Without a `client`, the SDK is imported and its client built on first
+    use: importing google.genai takes most of a second, which would
+    otherwise be paid at process start.
+    """
+
+    name = "gemini"
+
+    def __init__(self, client=None, model: str = GEMINI_MODEL, timeout: float = LLM_TIMEOUT_SECONDS):
+        self._client = client
+        self.model = model
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    from google.genai import types
+                    # HttpOptions.timeout is in milliseconds
+                    http_options = types.HttpOptions(timeout=int(self.timeout * 1000))
+                    self._client = genai.Client(http_options=http_options)
+        return self._client
+
+    def warm(self):
+        # Model metadata: opens the TLS connection and checks the key, no tokens spent
+        self.client.models.get(model=self.model)
+
+    async def awarm(self):
+        await self.client.aio.models.get(model=self.model)
+
+    def generate(self, messages):
+        response = self.client.models.generate_content(model=self.model, contents=build_prompt(messages))
+        return getattr(response, "text", None) or ""
+
+    async def agenerate(self, messages):
+        response = await self.client.aio.models.generate_content(model=self.model, contents=build_prompt(messages))
+        return getattr(response, "text", None) or ""
+
+    def stream(self, messages):
+        for chunk in self.client.models.generate_content_stream(model=self.model, contents=build_prompt(messages)):
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+
+    async def astream(self, messages):
+        stream = await self.client.aio.models.generate_content_stream(model=self.model, contents=build_prompt(messages))
+        async for chunk in stream:
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+
+
+class GeminiRESTBackend(LLMBackend):
+    """
+    Legacy text-bison REST endpoint, used when the SDK client is unavailable.
+    Requests go through pooled keep-alive httpx clients (one for threads,
+    one per event loop) instead of a new connection per call.
+    """
+
+    name = "rest"
+
+    def __init__(self, api_key: Optional[str], url: str = GEMINI_REST_URL,
+                 timeout: float = LLM_TIMEOUT_SECONDS,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT_SECONDS,
+                 pool_size: int = LLM_POOL_SIZE):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop = None
+        self._lock = threading.Lock()
+
+    def _request(self, messages):
+        if not self.api_key:
+            raise RuntimeError("Missing GEMINI_API_KEY/GOOGLE_API_KEY in environment")
+        request_body = {
+            "prompt": {
+                "messages": messages
+            },
+            "temperature": 0.7,
+            "maxOutputTokens": 300
+        }
+        return {"params": {"key": self.api_key}, "json": request_body}
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> str:
+        if not response.is_success:
+            try:
+                err_json = response.json()
+            except Exception:
+                err_json = {"error": response.text}
+            raise LLMHTTPError(response.status_code, err_json)
+        data = response.json()
+        return (
+            data.get("candidates", [{}])[0].get("content")
+            or data.get("output", "")
+            or data.get("text", "")
+            or ""
+        )
+
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(timeout=self.timeout, limits=self.limits)
+            return self._client
+
+    def async_client(self) -> httpx.AsyncClient:
+        # An AsyncClient's connections belong to the loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._async_loop = loop
+        return self._async_client
+
+    def warm(self):
+        # Any answer will do: the point is a pooled, already-handshaken connection
+        self.client().get(self.url)
+
+    async def awarm(self):
+        await self.async_client().get(self.url)
+
+    def probe(self):
+        # Unlike warm(), an answer is not enough: 5xx and 429 mean the
+        # provider is failing or throttling us. Other 4xx (GET on a POST
+        # endpoint) still show it is up.
+        response = self.client().get(self.url)
+        if response.status_code >= 500 or response.status_code == 429:
+            raise LLMHTTPError(response.status_code, response.text[:200])
+
+    def generate(self, messages):
+        request = self._request(messages)
+        return self._parse(self.client().post(self.url, **request))
+
+    async def agenerate(self, messages):
+        request = self._request(messages)
+        return self._parse(await self.async_client().post(self.url, **request))
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        self.close()
+        client, self._async_client = self._async_client, None
+        if client is not None and self._async_loop is asyncio.get_running_loop():
+            await client.aclose()
+
+
+class TransientLLMError(RuntimeError):
+    """Base for backend failures that may not happen again; core.resilience retries them."""
+
+
+class StubBackendError(TransientLLMError):
+    pass
+
+
+STUB_REPLIES = [
+    "It makes sense that this has been weighing on you. What feels most important to explore right now?",
+    "Thank you for sharing that with me. When you notice that feeling, what thoughts tend to come up first?",
+    "That sounds like a lot to carry. What is one small thing that has helped you through moments like this before?",
+    "I hear how much effort you're putting in. What would it look like to be a little kinder to yourself this week?",
+]
+
+
+def parse_latency(spec: str):
+    """
+    Parse a latency distribution spec into a sampler returning seconds:
+    "fixed:0.5", "uniform:0.2,1.0", "normal:0.8,0.2" or
+    "lognormal:0.8,0.5" (median seconds, sigma of the log).
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+class StubBackend(LLMBackend):
+    """
+    Deterministic local backend for benchmarks, CI and offline development.
+    Replies are picked by hashing the latest user message, so the same
+    conversation always gets the same answer.
+
+    latency:             time to first token, as a parse_latency() spec
+    token_delay:         pause between streamed chunks, in seconds
+    failure_rate:        probability a call raises StubBackendError up front
+    stream_failure_rate: probability a stream fails after its first chunk
+    seed:                seed for the latency/failure random generator
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: str = "fixed:0", token_delay: float = 0.0,
+                 failure_rate: float = 0.0, stream_failure_rate: float = 0.0,
+                 seed: Optional[int] = None, replies: Optional[List[str]] = None,
+                 words_per_chunk: int = 3):
+        self.sample_latency = parse_latency(latency)
+        self.token_delay = token_delay
+        self.failure_rate = failure_rate
+        self.stream_failure_rate = stream_failure_rate
+        self.replies = replies or STUB_REPLIES
+        self.words_per_chunk = words_per_chunk
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls) -> "StubBackend":
+        seed = os.getenv("REFLECTAI_STUB_SEED")
+        return cls(
+            latency=os.getenv("REFLECTAI_STUB_LATENCY", "fixed:0"),
+            token_delay=float(os.getenv("REFLECTAI_STUB_TOKEN_DELAY", "0")),
+            failure_rate=float(os.getenv("REFLECTAI_STUB_FAILURE_RATE", "0")),
+            stream_failure_rate=float(os.getenv("REFLECTAI_STUB_STREAM_FAILURE_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    def reply_for(self, messages) -> str:
+        last_user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        digest = hashlib.sha1(last_user.encode("utf-8")).digest()
+        return self.replies[digest[0] % len(self.replies)]
+
+    def _chunks(self, text: str) -> List[str]:
+        words = text.split(" ")
+        return [" ".join(words[i:i + self.words_per_chunk]) + (" " if i + self.words_per_chunk < len(words) else "")
+                for i in range(0, len(words), self.words_per_chunk)]
+
+    def _plan(self):
+        """Draw this call's latency and failure outcomes."""
+        self.calls += 1
+        latency = self.sample_latency(self.rng)
+        fail = self.rng.random() < self.failure_rate
+        fail_mid_stream = self.rng.random() < self.stream_failure_rate
+        return latency, fail, fail_mid_stream
+
+    def generate(self, messages):
+        latency, fail, _ = self._plan()
+        time.sleep(latency)
+        if fail:
+            raise StubBackendError("Injected stub backend failure")
+        return self.reply_for(messages)
+
+    async def agenerate(self, messages):
+        latency, fail, _ = self._plan()
+        await asyncio.sleep(latency)
+        if fail:
+            raise StubBackendError("Injected stub backend failure")
+        return self.reply_for(messages)
+
+    def stream(self, messages):
+        latency, fail, fail_mid_stream = self._plan()
+        time.sleep(latency)
+        if fail:
+            raise StubBackendError("Injected stub backend failure")
+        for i, chunk in enumerate(self._chunks(self.reply_for(messages))):
+            if i:
+                time.sleep(self.token_delay)
+                if fail_mid_stream:
+                    raise StubBackendError("Injected stub stream failure")
+            yield chunk
+
+    async def astream(self, messages):
+        latency, fail, fail_mid_stream = self._plan()
+        await asyncio.sleep(latency)
+        if fail:
+            raise StubBackendError("Injected stub backend failure")
+        for i, chunk in enumerate(self._chunks(self.reply_for(messages))):
+            if i:
+                await asyncio.sleep(self.token_delay)
+                if fail_mid_stream:
+                    raise StubBackendError("Injected stub stream failure")
+            yield chunk
+
+
+def create_backend(name: Optional[str] = None, resilient: Optional[bool] = None) -> LLMBackend:
+    """
+    Build the backend selected by `name` or REFLECTAI_LLM_BACKEND:
+    "auto" (default: SDK when a key is set and google-genai is installed,
+    REST otherwise), "gemini", "rest" or "stub".
+
+    Unless `resilient` (REFLECTAI_LLM_RESILIENT) is off, the backend is
+    wrapped in core.resilience.ResilientBackend for retries, the circuit
+    breaker and hedging.
+    """
+    backend = _create_raw_backend(name)
+    if resilient is None:
+        resilient = os.getenv("REFLECTAI_LLM_RESILIENT", "1") == "1"
+    if not resilient:
+        return backend
+    # Imported here: core.resilience builds on this module
+    from core.resilience import ResilientBackend
+    return ResilientBackend(backend)
+
+
+def _create_raw_backend(name: Optional[str] = None) -> LLMBackend:
+    name = (name or os.getenv("REFLECTAI_LLM_BACKEND", "auto")).lower()
+    if name == "stub":
+        return StubBackend.from_env()
+
+    # Prefer GEMINI_API_KEY per google-genai docs; fallback to GOOGLE_API_KEY
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    if name == "rest":
+        return GeminiRESTBackend(api_key)
+    if name not in ("auto", "gemini"):
+        raise ValueError(f"Unknown LLM backend: {name!r}")
+    # The SDK client is built on first use; only check it is installed here
+    if api_key and (name == "gemini" or importlib.util.find_spec("google.genai") is not None):
+        os.environ.setdefault("GEMINI_API_KEY", api_key)
+        return GeminiSDKBackend()
+    # Without a key this raises a clear error on first use
+    return GeminiRESTBackend(api_key)
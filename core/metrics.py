@@ -0,0 +1,234 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond local checks up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """Child for one label combination. Resolve once and keep it on hot paths."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "_lock")
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        # Non-cumulative per-bucket counts; render() accumulates them
+        index = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    Minimal Prometheus registry: counters and histograms updated in
+    place, plus collectors that turn existing stats dicts (cache, writer,
+    prompt window) into gauges when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, prefix: str, collect: Callable[[], Dict[str, float]], documentation: str = ""):
+        """
+        Export `collect()` as one gauge per key, named `<prefix>_<key>`.
+        Registering the same prefix again replaces the previous collector.
+        """
+        with self._lock:
+            self._collectors[prefix] = (documentation, collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        for metric in metrics:
+            lines.extend(metric.render())
+        for prefix, (documentation, collect) in collectors:
+            try:
+                values = collect()
+            except Exception as exc:
+                lines.append(f"# collector {prefix} failed: {_escape(exc)}")
+                continue
+            for key, value in values.items():
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                name = f"{prefix}_{key}"
+                if documentation:
+                    lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CHAT_STAGE_SECONDS = REGISTRY.histogram(
+    "reflectai_chat_stage_seconds", "Time spent in each stage of a chat turn.", ("stage",))
+CHAT_SECONDS = REGISTRY.histogram(
+    "reflectai_chat_seconds", "End-to-end chat turn latency by outcome.", ("outcome",))
+CHAT_OUTCOMES = REGISTRY.counter(
+    "reflectai_chat_outcomes_total", "Chat turns by outcome.", ("outcome",))
+
+# Stage and outcome label values used by TherapyEngine
+STAGES = ("local", "queued", "save_message", "load_history", "build_prompt", "llm_queue", "llm", "review",
+          "save_reply")
+OUTCOMES = ("crisis", "humor", "out_of_scope", "llm_failure", "llm_unavailable", "unsafe_response", "biased_response",
+            "success", "coalesced", "rate_limited", "shed", "error", "disconnected")
+
+# Children resolved up front so recording is a dict lookup plus one locked add
+_STAGE_CHILDREN = {stage: CHAT_STAGE_SECONDS.labels(stage) for stage in STAGES}
+_CHAT_CHILDREN = {outcome: CHAT_SECONDS.labels(outcome) for outcome in OUTCOMES}
+_OUTCOME_CHILDREN = {outcome: CHAT_OUTCOMES.labels(outcome) for outcome in OUTCOMES}
+
+
+class ChatTimer:
+    """
+    Times one chat turn. lap(stage) records the time since the previous
+    lap (or the start) against `stage`; finish(outcome) records the total.
+    """
+
+    __slots__ = ("start", "last")
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        _STAGE_CHILDREN[stage].observe(now - self.last)
+        self.last = now
+
+    def finish(self, outcome: Optional[str]):
+        outcome = outcome if outcome in _CHAT_CHILDREN else "error"
+        _CHAT_CHILDREN[outcome].observe(time.perf_counter() - self.start)
+        _OUTCOME_CHILDREN[outcome].inc()
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
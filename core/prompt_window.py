@@ -0,0 +1,119 @@
+import os
+import re
+import threading
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Token budget for the assembled prompt (system prompt + history), and the
+# number of most recent rows fetched from storage per turn.
+PROMPT_TOKEN_BUDGET = int(os.getenv("REFLECTAI_PROMPT_TOKEN_BUDGET", "6000"))
+HISTORY_MAX_TURNS = int(os.getenv("REFLECTAI_HISTORY_MAX_TURNS", "40"))
+
+# Role label and separator added per message by the prompt builder
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Count tokens locally, without a tokenizer download or API call.
+    Words are charged one token per four characters (subword splitting)
+    and each punctuation mark is one token, which tracks Gemini's
+    SentencePiece counts closely for English chat text.
+    """
+    if not text:
+        return 0
+    return sum((len(piece) + 3) // 4 for piece in _PIECES.findall(text))
+
+
+@lru_cache(maxsize=8)
+def _fixed_tokens(text: str) -> int:
+    # The system prompt is the same on every turn; count it once
+    return estimate_tokens(text)
+
+
+@dataclass
+class PromptWindow:
+    messages: List[Dict[str, str]]
+    kept_turns: int
+    dropped_turns: int
+    prompt_tokens: int
+    dropped_tokens: int
+    # The history filled its fetch limit, so older rows were never loaded
+    history_capped: bool = False
+
+
+def build_prompt_window(system_prompt: str, history, budget: int = PROMPT_TOKEN_BUDGET,
+                        history_limit: Optional[int] = None) -> PromptWindow:
+    """
+    Keep the system prompt plus the most recent turns that fit in `budget`
+    tokens. The newest turn (the message being answered) is always kept.
+
+    Dropped turns and tokens count only rows in `history`. Rows beyond
+    the `history_limit` it was fetched with are never loaded, so they
+    cannot be counted; history_capped flags windows where such rows may
+    exist.
+    """
+    used = _fixed_tokens(system_prompt) + MESSAGE_OVERHEAD_TOKENS
+    kept = []
+    dropped_turns = 0
+    dropped_tokens = 0
+    for turn in reversed(history):
+        cost = estimate_tokens(turn["content"]) + MESSAGE_OVERHEAD_TOKENS
+        if kept and (dropped_turns or used + cost > budget):
+            # Once a turn is dropped every older turn goes too, so the
+            # window stays a contiguous tail of the conversation
+            dropped_turns += 1
+            dropped_tokens += cost
+            continue
+        kept.append({"content": turn["content"], "role": turn["role"]})
+        used += cost
+
+    messages = [{"content": system_prompt, "role": "system"}]
+    messages.extend(reversed(kept))
+    return PromptWindow(
+        messages=messages,
+        kept_turns=len(kept),
+        dropped_turns=dropped_turns,
+        prompt_tokens=used,
+        dropped_tokens=dropped_tokens,
+        history_capped=history_limit is not None and len(history) >= history_limit,
+    )
+
+
+@dataclass
+class PromptWindowStats:
+    """
+    Running totals of what the history window kept and dropped. Dropped
+    totals cover loaded rows only; capped_prompts counts prompts whose
+    history hit the fetch limit, where older rows went uncounted.
+    """
+    prompts: int = 0
+    kept_turns: int = 0
+    dropped_turns: int = 0
+    prompt_tokens: int = 0
+    dropped_tokens: int = 0
+    capped_prompts: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, window: PromptWindow):
+        with self._lock:
+            self.prompts += 1
+            self.kept_turns += window.kept_turns
+            self.dropped_turns += window.dropped_turns
+            self.prompt_tokens += window.prompt_tokens
+            self.dropped_tokens += window.dropped_tokens
+            self.capped_prompts += window.history_capped
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "prompts": self.prompts,
+                "kept_turns": self.kept_turns,
+                "dropped_turns": self.dropped_turns,
+                "prompt_tokens": self.prompt_tokens,
+                "dropped_tokens": self.dropped_tokens,
+                "capped_prompts": self.capped_prompts,
+            }
@@ -0,0 +1,444 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+import httpx
+
+from core.llm_backends import LLM_TIMEOUT_SECONDS, LLMBackend, TransientLLMError
+
+LLM_MAX_ATTEMPTS = int(os.getenv("REFLECTAI_LLM_MAX_ATTEMPTS", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("REFLECTAI_LLM_BACKOFF_BASE_SECONDS", "0.25"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("REFLECTAI_LLM_BACKOFF_MAX_SECONDS", "4"))
+LLM_BREAKER_FAILURES = int(os.getenv("REFLECTAI_LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("REFLECTAI_LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_HEDGE = os.getenv("REFLECTAI_LLM_HEDGE", "0") == "1"
+LLM_HEDGE_QUANTILE = float(os.getenv("REFLECTAI_LLM_HEDGE_QUANTILE", "0.95"))
+# Hedges may add at most this fraction of extra calls
+LLM_HEDGE_MAX_RATIO = float(os.getenv("REFLECTAI_LLM_HEDGE_MAX_RATIO", "0.1"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# HTTP statuses worth retrying: timeouts, rate limits and server errors
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+# Transport failures worth retrying: connect/read/write errors and dropped
+# connections. Other httpx transport errors (bad URL scheme, proxy
+# misconfiguration) fail the same way every time.
+RETRYABLE_TRANSPORT_ERRORS = (ConnectionError, httpx.NetworkError, httpx.RemoteProtocolError, TransientLLMError)
+
+
+class LLMUnavailable(RuntimeError):
+    """The circuit breaker is open: the provider failed repeatedly, so calls fail fast."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"LLM provider unavailable; circuit open for another {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+class LLMTimeout(TimeoutError):
+    """One attempt took longer than the per-attempt deadline."""
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    # httpx.TimeoutException does not derive from TimeoutError
+    return isinstance(exc, (TimeoutError, asyncio.TimeoutError, httpx.TimeoutException))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Transient failures (timeouts, connection errors, 408/429/5xx) are retried; the rest are not."""
+    if isinstance(exc, LLMUnavailable):
+        return False
+    if _is_timeout(exc) or isinstance(exc, RETRYABLE_TRANSPORT_ERRORS):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return isinstance(status, int) and status in RETRYABLE_STATUSES
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed:    calls go through; `failure_threshold` failures in a row open it
+    open:      calls fail fast with LLMUnavailable for `reset_seconds`
+    half-open: one trial call is let through; success closes the circuit,
+               failure opens it again. A trial that ends with neither
+               (cancelled) hands the slot to the next call.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES,
+                 reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def before_call(self) -> bool:
+        """
+        Raise LLMUnavailable if the call must not go through. Returns True
+        when the call is the half-open trial; it must then end in
+        record_success, record_failure or release_trial.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.stats["rejected"] += 1
+        raise LLMUnavailable(max(remaining, 0.0))
+
+    def release_trial(self):
+        """The trial call was abandoned without an outcome: let the next call be the trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.stats["opened"] += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class ResilientBackend(LLMBackend):
+    """
+    Wraps another backend with per-attempt deadlines, bounded retries,
+    a circuit breaker and optional hedged requests.
+
+    - A failed attempt is retried up to `max_attempts` times if the error
+      is transient (is_retryable), sleeping a full-jitter exponential
+      backoff: uniform(0, min(backoff_max, backoff_base * 2**attempt)).
+    - Transient failures count toward the breaker; while it is open,
+      calls raise LLMUnavailable without touching the provider.
+    - With hedging on, if an attempt has not answered by the recent
+      `hedge_quantile` latency, a second identical request is sent and
+      whichever answers first wins. Hedges are capped at `hedge_max_ratio`
+      of calls so a slow provider doesn't get twice the load.
+
+    Streams are retried only until their first chunk; after that a
+    failure is passed on, since part of the reply has been shown.
+    """
+
+    def __init__(self, inner: LLMBackend, timeout: float = LLM_TIMEOUT_SECONDS,
+                 max_attempts: int = LLM_MAX_ATTEMPTS,
+                 backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+                 breaker: Optional[CircuitBreaker] = None,
+                 hedge: bool = LLM_HEDGE, hedge_quantile: float = LLM_HEDGE_QUANTILE,
+                 hedge_max_ratio: float = LLM_HEDGE_MAX_RATIO, seed: Optional[int] = None):
+        self.inner = inner
+        self.name = inner.name
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_max_ratio = hedge_max_ratio
+        self.rng = random.Random(seed)
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0,
+                      "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+
+    # --- Bookkeeping ---
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _observe(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if hedging is off or not yet calibrated."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            if self.stats["hedges"] >= self.hedge_max_ratio * max(1, self.stats["calls"]):
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.hedge_quantile * len(ordered)))]
+
+    def backoff(self, attempt: int) -> float:
+        return self.rng.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _settle(self, exc: Optional[BaseException], attempt: int) -> bool:
+        """Record an attempt's outcome. Returns True if the caller should retry."""
+        if exc is None:
+            self.breaker.record_success()
+            return False
+        if is_retryable(exc):
+            self.breaker.record_failure()
+        else:
+            # The provider answered (e.g. 400): it is up, the request was bad
+            self.breaker.record_success()
+        if _is_timeout(exc):
+            self._count("timeouts")
+        if attempt + 1 < self.max_attempts and is_retryable(exc):
+            self._count("retries")
+            return True
+        self._count("failures")
+        return False
+
+    def _mid_stream_failure(self, exc: Exception):
+        if is_retryable(exc):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self._count("failures")
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.stats)
+        return dict(stats, breaker_state=self.breaker.state, breaker_opened=self.breaker.stats["opened"],
+                    breaker_rejected=self.breaker.stats["rejected"], hedge_delay_seconds=self.hedge_delay() or 0.0)
+
+    # --- Synchronous calls ---
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+            return self._executor
+
+    def _attempt(self, messages) -> str:
+        started = time.monotonic()
+        delay = self.hedge_delay()
+        if delay is None:
+            # The inner client enforces the per-attempt timeout itself
+            text = self.inner.generate(messages)
+            self._observe(time.monotonic() - started)
+            return text
+        pool = self._pool()
+        primary = pool.submit(self.inner.generate, messages)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            text = primary.result()
+            self._observe(time.monotonic() - started)
+            return text
+        self._count("hedges")
+        hedged = pool.submit(self.inner.generate, messages)
+        pending = {primary, hedged}
+        deadline = started + self.timeout
+        last_error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise LLMTimeout(f"LLM call exceeded {self.timeout:.1f}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is hedged:
+                        self._count("hedge_wins")
+                    self._observe(time.monotonic() - started)
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
+
+    def generate(self, messages) -> str:
+        self._count("calls")
+        attempt = 0
+        while True:
+            trial = self.breaker.before_call()
+            self._count("attempts")
+            try:
+                text = self._attempt(messages)
+            except Exception as exc:
+                if not self._settle(exc, attempt):
+                    raise
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            self._settle(None, attempt)
+            return text
+
+    def stream(self, messages):
+        self._count("calls")
+        attempt = 0
+        while True:
+            trial = self.breaker.before_call()
+            self._count("attempts")
+            chunks = self.inner.stream(messages)
+            try:
+                first = next(chunks, None)
+            except Exception as exc:
+                if not self._settle(exc, attempt):
+                    raise
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            break
+        try:
+            if first is not None:
+                yield first
+            yield from chunks
+        except GeneratorExit:
+            # Closed early (a guard blocked a chunk, the client left): the
+            # provider was answering, so this counts as a success
+            chunks.close()
+            self.breaker.record_success()
+            raise
+        except Exception as exc:
+            self._mid_stream_failure(exc)
+            raise
+        self.breaker.record_success()
+
+    # --- Async calls ---
+
+    async def _attempt_async(self, messages) -> str:
+        started = time.monotonic()
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self.inner.agenerate(messages))
+        tasks = {primary}
+        hedged = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay if delay is not None else self.timeout)
+            if not done and delay is not None:
+                self._count("hedges")
+                hedged = asyncio.ensure_future(self.inner.agenerate(messages))
+                tasks.add(hedged)
+            last_error = None
+            pending = tasks - done
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            self._count("hedge_wins")
+                        self._observe(time.monotonic() - started)
+                        return task.result()
+                    last_error = task.exception()
+                if not pending:
+                    raise last_error
+                remaining = started + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeout(f"LLM call exceeded {self.timeout:.1f}s")
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise LLMTimeout(f"LLM call exceeded {self.timeout:.1f}s")
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def agenerate(self, messages) -> str:
+        self._count("calls")
+        attempt = 0
+        while True:
+            trial = self.breaker.before_call()
+            self._count("attempts")
+            try:
+                text = await self._attempt_async(messages)
+            except Exception as exc:
+                if not self._settle(exc, attempt):
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # CancelledError is not an Exception; the trial had no outcome
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            self._settle(None, attempt)
+            return text
+
+    async def astream(self, messages):
+        self._count("calls")
+        attempt = 0
+        while True:
+            trial = self.breaker.before_call()
+            self._count("attempts")
+            chunks = self.inner.astream(messages).__aiter__()
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+            except StopAsyncIteration:
+                first = None
+            except Exception as exc:
+                await _aclose(chunks)
+                if not self._settle(exc, attempt):
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                await _aclose(chunks)
+                if trial:
+                    self.breaker.release_trial()
+                raise
+            break
+        try:
+            if first is not None:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+        except (GeneratorExit, asyncio.CancelledError):
+            # Closed or cancelled after the first chunk: the provider was answering
+            await _aclose(chunks)
+            self.breaker.record_success()
+            raise
+        except Exception as exc:
+            self._mid_stream_failure(exc)
+            raise
+        self.breaker.record_success()
+
+    def warm(self):
+        self.inner.warm()
+
+    async def awarm(self):
+        await self.inner.awarm()
+
+    def probe(self):
+        # Straight to the provider: the breaker must not hide its recovery
+        self.inner.probe()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.inner.close()
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+async def _aclose(iterator):
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:
+            pass
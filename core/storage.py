@@ -0,0 +1,251 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# What the engine and the UIs read from a history row
+HISTORY_COLUMNS = ("role", "content", "timestamp")
+ROW_COLUMNS = ("user_id", "role", "content", "timestamp", "session_id")
+# History plus the store's row id, which breaks timestamp ties in page cursors
+PAGE_COLUMNS = HISTORY_COLUMNS + ("id",)
+
+
+def page_cursor(row: dict) -> str:
+    """
+    Cursor for the rows older than `row`: "timestamp|id". Rows not yet in
+    the store have no id, and their cursor is the bare timestamp.
+    """
+    row_id = row.get("id")
+    return row["timestamp"] if row_id is None else f"{row['timestamp']}|{row_id}"
+
+
+def parse_cursor(cursor: str) -> Tuple[str, Optional[Union[int, str]]]:
+    timestamp, separator, row_id = cursor.partition("|")
+    if not separator or not row_id:
+        return timestamp, None
+    return timestamp, int(row_id) if row_id.isdigit() else row_id
+
+
+class ConversationStore:
+    """
+    Storage interface behind core.chat_memory.
+    Rows are dicts with user_id, role, content, timestamp and session_id.
+
+    Reads page backwards by (timestamp, id) (keyset pagination): `before`
+    is the page_cursor() of the oldest row already loaded, so each page is
+    an index range scan on (user_id, timestamp) no matter how deep it goes,
+    and rows sharing a timestamp are neither repeated nor skipped at a
+    page boundary. A bare timestamp also works as `before`.
+    """
+
+    name = "base"
+
+    def fetch(self, user_id: str, limit: Optional[int] = None, before: Optional[str] = None,
+              columns: Sequence[str] = HISTORY_COLUMNS) -> List[dict]:
+        """
+        Return a user's rows oldest-first, with only `columns`. With
+        `limit`, only the newest `limit` rows; with `before`, only rows
+        older than that cursor. "id" may be requested in `columns`.
+        """
+        raise NotImplementedError
+
+    def insert(self, rows: List[dict]):
+        """Insert rows in one round-trip. Raises on failure so callers can retry."""
+        raise NotImplementedError
+
+    def warm(self):
+        """Connect ahead of the first request (startup). Raises if the store is unreachable."""
+
+
+class SupabaseStore(ConversationStore):
+    """
+    The `conversations` table in Supabase (PostgREST). Without a `client`,
+    one is created from `url` and `key` on first use, so importing the
+    supabase package stays off the startup path.
+    """
+
+    name = "supabase"
+
+    def __init__(self, client=None, table: str = "conversations",
+                 url: Optional[str] = None, key: Optional[str] = None):
+        self._client = client
+        self.table = table
+        self.url = url
+        self.key = key
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from supabase import create_client
+                    self._client = create_client(self.url, self.key)
+        return self._client
+
+    def fetch(self, user_id, limit=None, before=None, columns=HISTORY_COLUMNS):
+        query = (
+            self.client
+            .table(self.table)
+            .select(','.join(columns))
+            .eq('user_id', user_id)
+        )
+        if before is not None:
+            timestamp, row_id = parse_cursor(before)
+            if row_id is None:
+                query = query.lt('timestamp', timestamp)
+            else:
+                query = query.or_(f'timestamp.lt."{timestamp}",'
+                                  f'and(timestamp.eq."{timestamp}",id.lt.{row_id})')
+        query = query.order('timestamp', desc=limit is not None).order('id', desc=limit is not None)
+        if limit is not None:
+            query = query.limit(limit)
+        response = query.execute()
+        error = getattr(response, 'error', None)
+        if error:
+            raise RuntimeError(error.message if hasattr(error, 'message') else str(error))
+        rows = getattr(response, 'data', []) or []
+        # Newest-first when limited; hand back oldest-first either way
+        return list(reversed(rows)) if limit is not None else rows
+
+    def warm(self):
+        # Cheapest indexed read; opens the pooled HTTPS connection to PostgREST
+        self.fetch("__warmup__", limit=1, columns=("timestamp",))
+
+    def insert(self, rows):
+        response = self.client.table(self.table).insert(rows).execute()
+        error = getattr(response, 'error', None)
+        if error:
+            raise RuntimeError(error.message if hasattr(error, 'message') else str(error))
+
+
+class MemoryStore(ConversationStore):
+    """Process-local store for benchmarks and tests."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._rows: Dict[str, List[dict]] = {}
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.fetches = 0
+        self.inserts = 0
+
+    def fetch(self, user_id, limit=None, before=None, columns=HISTORY_COLUMNS):
+        with self._lock:
+            self.fetches += 1
+            rows = self._rows.get(user_id, [])
+            if before is not None:
+                timestamp, row_id = parse_cursor(before)
+                rows = [r for r in rows if r["timestamp"] < timestamp
+                        or (row_id is not None and r["timestamp"] == timestamp and r["id"] < row_id)]
+            if limit is not None:
+                rows = rows[max(0, len(rows) - limit):]
+            return [{c: r.get(c) for c in columns} for r in rows]
+
+    def insert(self, rows):
+        with self._lock:
+            self.inserts += 1
+            for row in rows:
+                self._rows.setdefault(row["user_id"], []).append(dict(row, id=self._next_id))
+                self._next_id += 1
+
+
+class SqliteStore(ConversationStore):
+    """
+    Embedded SQLite database for single-node deployments, dev and offline
+    benchmarks. WAL mode lets readers run while the write-behind thread
+    commits. Each thread gets its own connection, and reads are index
+    range scans on (user_id, timestamp).
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "data/reflectai.db", table: str = "conversations"):
+        self.path = path
+        self.table = table
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "id INTEGER PRIMARY KEY, user_id TEXT NOT NULL, role TEXT NOT NULL, "
+                "content TEXT, timestamp TEXT NOT NULL, session_id TEXT)"
+            )
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_user_timestamp ON {table} (user_id, timestamp)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints; a crash loses at most the last commits, not the file
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def fetch(self, user_id, limit=None, before=None, columns=HISTORY_COLUMNS):
+        unknown = set(columns) - set(ROW_COLUMNS) - {"id"}
+        if unknown:
+            raise ValueError(f"Unknown columns: {sorted(unknown)}")
+        sql = f"SELECT {', '.join(columns)} FROM {self.table} WHERE user_id = ?"
+        params: list = [user_id]
+        if before is not None:
+            timestamp, row_id = parse_cursor(before)
+            if row_id is None:
+                sql += " AND timestamp < ?"
+                params.append(timestamp)
+            else:
+                sql += " AND (timestamp < ? OR (timestamp = ? AND id < ?))"
+                params.extend([timestamp, timestamp, row_id])
+        # id breaks ties between rows written in the same microsecond
+        if limit is not None:
+            sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+            params.append(limit)
+        else:
+            sql += " ORDER BY timestamp, id"
+        rows = [dict(r) for r in self._connection().execute(sql, params)]
+        return list(reversed(rows)) if limit is not None else rows
+
+    def insert(self, rows):
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                f"INSERT INTO {self.table} ({', '.join(ROW_COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+                [tuple(row.get(c) for c in ROW_COLUMNS) for row in rows],
+            )
+
+    def warm(self):
+        # Opens this thread's connection and pulls the index pages into the page cache
+        self.fetch("__warmup__", limit=1, columns=("timestamp",))
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+def create_store(name: Optional[str] = None) -> ConversationStore:
+    """
+    Build the store selected by `name` or REFLECTAI_STORAGE: "supabase"
+    (default), "sqlite" (file at REFLECTAI_SQLITE_PATH) or "memory".
+    """
+    name = (name or os.getenv("REFLECTAI_STORAGE", "supabase")).lower()
+    if name == "sqlite":
+        return SqliteStore(os.getenv("REFLECTAI_SQLITE_PATH", "data/reflectai.db"))
+    if name == "memory":
+        return MemoryStore()
+    if name != "supabase":
+        raise ValueError(f"Unknown storage backend: {name!r}")
+    return SupabaseStore(url=os.getenv("SUPABASE_URL"), key=os.getenv("SUPABASE_KEY"))
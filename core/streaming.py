@@ -0,0 +1,29 @@
+import json
+
+
+def format_sse(event: dict) -> str:
+    """Encode an engine stream event as a server-sent event frame."""
+    payload = {k: v for k, v in event.items() if k != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+
+
+def iter_sse(lines):
+    """
+    Parse server-sent event frames from an iterable of text lines
+    (e.g. httpx's Response.iter_lines()).
+    Yields engine event dicts in the shape produced by process_stream().
+    """
+    event_type, data = None, []
+    for line in lines:
+        if line is None:
+            continue
+        if line == "":
+            if event_type and data:
+                event = json.loads("\n".join(data))
+                event["type"] = event_type
+                yield event
+            event_type, data = None, []
+        elif line.startswith("event:"):
+            event_type = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
@@ -1,12 +1,23 @@
-import os
+import asyncio
 from ethical_modules.safety_checker import EthicalSafetyChecker
 from ethical_modules.bias_detector import BiasDetector
 from ethical_modules.ethics_logger import EthicsLogger
+from ethical_modules.stream_guard import StreamGuard
+from ethical_modules.rule_engine import RULES, RuleHits
 import random
-import requests
-from google import genai
+import threading
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 from core.chat_memory import load_user_conversation, append_to_conversation
+from core.llm_backends import LLMBackend, create_backend
+from core.admission import AdmissionController, AdmissionRejected, RateLimited
+from core.resilience import LLMUnavailable
+from core.health import HEALTH
+from core.metrics import REGISTRY, ChatTimer
+from core.turns import TurnCoordinator
+from core.prompt_window import (
+    HISTORY_MAX_TURNS, PROMPT_TOKEN_BUDGET, PromptWindowStats, build_prompt_window,
+)
 
 load_dotenv()
 
@@ -41,6 +52,9 @@ You are ReflectAI, a highly skilled and deeply empathetic **digital mental welln
 * **Humor Use (Strictly Controlled):** **DO NOT** use sarcasm or humor on any sensitive topics (fear, grief, anxiety, trauma). Light, gentle humor is only acceptable when the user's input is explicitly lighthearted or indicates very mild stress about a trivial event.
 '''
 
+UNSAFE_RESPONSE_REPLY = "Sorry, I can't respond safely to that. Let's talk about your feelings."
+BIASED_RESPONSE_REPLY = "Let's focus on your personal experiences—everyone's journey is unique."
+LLM_FAILURE_REPLY = "Sorry, I am having trouble connecting to the support system right now."
 
 HUMOR_TRIGGERS = ["stress", "anxious", "nervous", "worried", "upset"]
 
@@ -90,131 +104,497 @@ UNSUPPORTED_TOPICS = [
     "movie recommendations",
     "historical facts"
 ]
-def is_out_of_scope(user_input):
-    lower = user_input.lower()
-    return any(topic in lower for topic in UNSUPPORTED_TOPICS)
 
-def is_meta_topic(user_input):
-    lower = user_input.lower()
-    return any(topic in lower for topic in META_TOPICS)
+# Topic and humor lists share the process-wide automaton with the ethics
+# rules, so one scan of the user's message answers every keyword check.
+RULES.register("humor", HUMOR_TRIGGERS, whole_word=False)
+RULES.register("meta", META_TOPICS, whole_word=False)
+RULES.register("unsupported", UNSUPPORTED_TOPICS, whole_word=False)
 
-class TherapyEngine:
-    def __init__(self, user_id):
+def is_out_of_scope(user_input, hits: Optional[RuleHits] = None):
+    keyword_hit = (hits or RULES.scan(user_input)).any("unsupported")
+    # The intent classifier tells "what is the capital of France" from
+    # "what is wrong with me"; a keyword hit only lowers its bar, and the
+    # keyword list alone is the fallback without it
+    from ethical_modules.intent_classifier import get_intent_classifier
+    classifier = get_intent_classifier()
+    if classifier is not None:
+        return classifier.is_out_of_scope(user_input, keyword_hit=keyword_hit)
+    return keyword_hit
+
+def is_meta_topic(user_input, hits: Optional[RuleHits] = None):
+    return (hits or RULES.scan(user_input)).any("meta")
+
+class EngineCore:
+    """
+    Process-wide engine components shared by every chat session.
+    Holds the LLM backend, the ethics checkers and the audit logger so they
+    are built once at startup instead of on every message.
+    """
+
+    def __init__(self, llm: Optional[LLMBackend] = None, logger: Optional[EthicsLogger] = None):
         self.safety_checker = EthicalSafetyChecker()
         self.bias_detector = BiasDetector()
-        self.logger = EthicsLogger()
+        self.logger = logger or EthicsLogger()
+        self.prompt_token_budget = PROMPT_TOKEN_BUDGET
+        self.window_stats = PromptWindowStats()
+        # Gemini SDK, REST fallback or local stub (REFLECTAI_LLM_BACKEND)
+        self.llm = llm or create_backend()
+        # Per-user serialization and coalescing of LLM turns
+        self.turns = TurnCoordinator()
+        # Per-user rate limits, global LLM concurrency cap and load shedding
+        self.admission = AdmissionController()
+        REGISTRY.register_collector("reflectai_prompt_window", self.window_stats.snapshot,
+                                    "Prompt window totals since startup.")
+        REGISTRY.register_collector("reflectai_admission", self.admission.snapshot,
+                                    "Admission control: rate limits, shedding and LLM concurrency.")
+        # Retries, circuit breaker and hedging (ResilientBackend only)
+        REGISTRY.register_collector("reflectai_llm", lambda: getattr(self.llm, "snapshot", dict)(),
+                                    "LLM client retries, timeouts, hedges and circuit breaker state.")
+        REGISTRY.register_collector("reflectai_turns", lambda: dict(self.turns.stats, in_flight=self.turns.in_flight()),
+                                    "Per-user turn coordinator totals.")
+
+
+_engine_core = None
+_engine_core_lock = threading.Lock()
+
+
+def get_engine_core() -> EngineCore:
+    """Return the shared EngineCore, creating it on first use."""
+    global _engine_core
+    if _engine_core is None:
+        with _engine_core_lock:
+            if _engine_core is None:
+                _engine_core = EngineCore()
+    return _engine_core
+
+
+class TherapyEngine:
+    """
+    Lightweight per-user session over the shared EngineCore.
+    Cheap to construct, so callers can create one per request.
+    """
+
+    def __init__(self, user_id, core: Optional[EngineCore] = None):
+        self.core = core or get_engine_core()
         self.user_id = user_id
-        # Prefer GEMINI_API_KEY per google-genai docs; fallback to GOOGLE_API_KEY
-        self.google_api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        self.gemini_api_url = "https://generativelanguage.googleapis.com/v1beta2/models/text-bison-001:generateMessage"
-        # Initialize official Google GenAI client when possible
-        self.genai_client = None
-        if self.google_api_key:
-            try:
-                os.environ.setdefault("GEMINI_API_KEY", self.google_api_key)
-                self.genai_client = genai.Client()
-            except Exception:
-                self.genai_client = None
+        self.safety_checker = self.core.safety_checker
+        self.bias_detector = self.core.bias_detector
+        self.logger = self.core.logger
+        self.llm = self.core.llm
+        self.last_prompt_window = None
+        # Outcome label of the last turn, for metrics (see core.metrics.OUTCOMES)
+        self.last_outcome = None
+
+    # --- Pipeline stages shared by the sync and async paths ---
+    #
+    # 1. local:   crisis, humor and out-of-scope checks on the message alone
+    #             (no storage, no LLM); answered turns are persisted in the
+    #             background
+    # 2. context: save the user message and load the bounded history
+    # 3. llm:     query the model
+    # 4. review:  safety and bias checks on the response
+    # 5. accept:  audit the access and save the reply
+    #
+    # Each entry point times its stages with a ChatTimer and records the
+    # turn's outcome when it finishes.
+
+    def _local_stage(self, user_input: str, input_hits: RuleHits) -> Optional[str]:
+        """Zero-I/O checks. Returns a canned reply, or None to continue to the LLM."""
+        # Crisis check comes first so a distressed message never gets a joke
+        # or a topic redirect
+        crisis, crisis_type = self.safety_checker.check_for_crisis(user_input, hits=input_hits)
+        if crisis:
+            self.logger.log_crisis_detection(self.user_id, crisis_type, len(user_input))
+            self.last_outcome = "crisis"
+            return ("I'm sensing you might be in crisis. Here are some resources that might help:\n[Show crisis_resources.json info here]")
 
-    def process(self, user_input: str):
         # Humor response shortcut
-        if any(trigger in user_input.lower() for trigger in HUMOR_TRIGGERS):
+        if input_hits.any("humor"):
             humor = random.choice(HUMOR_RESPONSES)
+            self.last_outcome = "humor"
             return f"{humor}\n\nTell me more about what you're feeling."
 
-        # Save user input
-        append_to_conversation(self.user_id, "user", user_input)
-
-        # Load conversation history
-        conversation_history = load_user_conversation(self.user_id)
-
-        # Build prompt messages
-        messages = [{"content": SYSTEM_PROMPT, "role": "system"}]
-        messages.extend({
-            "content": turn["content"],
-            "role": turn["role"]
-        } for turn in conversation_history)
-        
-        is_meta = is_meta_topic(user_input)
         # Out of scope check
-        if not is_meta and is_out_of_scope(user_input):
+        is_meta = is_meta_topic(user_input, hits=input_hits)
+        if not is_meta and is_out_of_scope(user_input, hits=input_hits):
             self.logger.log_ethical_violation(self.user_id, "out_of_scope_query", user_input)
+            self.last_outcome = "out_of_scope"
             return ("I'm here to support your mental wellbeing. Sorry—I can't answer questions about unrelated topics. Let's talk about your feelings and wellbeing.")
+        return None
 
-        # Crisis check
-        crisis, crisis_type = self.safety_checker.check_for_crisis(user_input)
-        if crisis:
-            self.logger.log_crisis_detection(self.user_id, crisis_type, len(user_input))
-            return ("I'm sensing you might be in crisis. Here are some resources that might help:\n[Show crisis_resources.json info here]")
+    def _persist_local_turn(self, user_input: str, reply: str):
+        append_to_conversation(self.user_id, "user", user_input)
+        append_to_conversation(self.user_id, "assistant", reply)
 
-        # Query LLM via official google-genai SDK (preferred). Fallback to REST if needed.
+    def _persist_local_turn_later(self, user_input: str, reply: str):
+        """Persist a locally answered turn without making the caller wait."""
         try:
-            if not self.google_api_key:
-                raise RuntimeError("Missing GEMINI_API_KEY/GOOGLE_API_KEY in environment")
-
-            # Build a single prompt from system + conversation for SDK simplicity
-            conversation_text = []
-            for m in messages:
-                role = m.get("role", "user")
-                content = m.get("content", "")
-                conversation_text.append(f"{role.upper()}: {content}")
-            prompt = "\n".join(conversation_text)
-
-            if self.genai_client is not None:
-                sdk_response = self.genai_client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=prompt,
-                )
-                llm_response = getattr(sdk_response, "text", None) or ""
-                if not llm_response:
-                    llm_response = "I'm sorry, I couldn't generate a response right now."
-            else:
-                # Fallback to REST
-                request_body = {
-                    "prompt": {
-                        "messages": messages
-                    },
-                    "temperature": 0.7,
-                    "maxOutputTokens": 300
-                }
-                url = f"{self.gemini_api_url}?key={self.google_api_key}"
-                headers = {"Content-Type": "application/json"}
-                response = requests.post(url, headers=headers, json=request_body, timeout=30)
-                if not response.ok:
-                    try:
-                        err_json = response.json()
-                    except Exception:
-                        err_json = {"error": response.text}
-                    raise RuntimeError(f"Google API error {response.status_code}: {err_json}")
-                data = response.json()
-                llm_response = (
-                    data.get("candidates", [{}])[0].get("content")
-                    or data.get("output", "")
-                    or data.get("text", "")
-                    or ""
-                )
-                if not llm_response:
-                    llm_response = "I'm sorry, I couldn't generate a response right now."
-        except Exception as e:
-            self.logger.log_ethical_violation(self.user_id, "llm_request_failed", str(e))
-            return "Sorry, I am having trouble connecting to the support system right now."
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Sync callers: appends only touch the cache and the write-behind queue
+            self._persist_local_turn(user_input, reply)
+            return
+        loop.run_in_executor(None, self._persist_local_turn, user_input, reply)
+
+    def _context_stage(self, user_input: str, timer: ChatTimer):
+        append_to_conversation(self.user_id, "user", user_input)
+        timer.lap("save_message")
+        conversation_history = load_user_conversation(self.user_id, limit=HISTORY_MAX_TURNS)
+        timer.lap("load_history")
+        messages = self._build_messages(conversation_history)
+        timer.lap("build_prompt")
+        return messages
+
+    async def _context_stage_async(self, user_input: str, timer: ChatTimer):
+        await asyncio.to_thread(append_to_conversation, self.user_id, "user", user_input)
+        timer.lap("save_message")
+        conversation_history = await asyncio.to_thread(load_user_conversation, self.user_id, HISTORY_MAX_TURNS)
+        timer.lap("load_history")
+        messages = self._build_messages(conversation_history)
+        timer.lap("build_prompt")
+        return messages
+
+    def _build_messages(self, conversation_history):
+        # System prompt plus the most recent turns that fit the token budget
+        window = build_prompt_window(SYSTEM_PROMPT, conversation_history, self.core.prompt_token_budget,
+                                     history_limit=HISTORY_MAX_TURNS)
+        self.last_prompt_window = window
+        self.core.window_stats.record(window)
+        return window.messages
+
+    def _query_llm(self, messages) -> str:
+        return self.llm.generate(messages) or "I'm sorry, I couldn't generate a response right now."
+
+    async def _query_llm_async(self, messages) -> str:
+        return await self.llm.agenerate(messages) or "I'm sorry, I couldn't generate a response right now."
+
+    def _review_response(self, llm_response: str, user_input: str, input_hits: RuleHits) -> Optional[str]:
+        """Ethics and bias checks. Returns a fallback reply if the response is rejected."""
+        # Both checks share a single scan of the response
+        hits = RULES.scan(llm_response)
 
         # Ethics check
-        ethics_result = self.safety_checker.validate_response(llm_response, user_input)
+        ethics_result = self.safety_checker.validate_response(llm_response, user_input, hits=hits, input_hits=input_hits)
         if not ethics_result["is_ethical"]:
             self.logger.log_ethical_violation(self.user_id, "unsafe_response", str(ethics_result["issues"]))
-            return "Sorry, I can't respond safely to that. Let's talk about your feelings."
+            self.last_outcome = "unsafe_response"
+            return UNSAFE_RESPONSE_REPLY
 
         # Bias check
-        bias_result = self.bias_detector.full_bias_check(llm_response)
+        bias_result = self.bias_detector.full_bias_check(llm_response, hits=hits)
         if not bias_result["passed_ethical_check"]:
             self.logger.log_bias_detection(str(bias_result["gender_bias"]["type"]), "high")
-            return "Let's focus on your personal experiences—everyone's journey is unique."
+            self.last_outcome = "biased_response"
+            return BIASED_RESPONSE_REPLY
+        return None
+
+    def _llm_failure(self, exc: Exception) -> str:
+        self.logger.log_ethical_violation(self.user_id, "llm_request_failed", str(exc))
+        # Circuit open: failed fast without calling the provider
+        self.last_outcome = "llm_unavailable" if isinstance(exc, LLMUnavailable) else "llm_failure"
+        return LLM_FAILURE_REPLY
+
+    def _check_llm_health(self):
+        # Background probes found the provider down: fail at once rather than
+        # take an LLM slot and wait out the request timeout
+        if HEALTH.is_down("llm"):
+            raise LLMUnavailable(HEALTH.interval)
+
+    def _guard_fallback(self, tripped: Optional[Tuple[str, str]]) -> Optional[str]:
+        """Turn a StreamGuard verdict into a fallback reply, or None if nothing tripped."""
+        if tripped is None:
+            return None
+        kind, issue = tripped
+        if kind == "ethics":
+            self.logger.log_ethical_violation(self.user_id, "unsafe_response", str([issue]))
+            self.last_outcome = "unsafe_response"
+            return UNSAFE_RESPONSE_REPLY
+        self.logger.log_bias_detection("gender_stereotype" if "stereotype" in issue else "cultural_assumption", "high")
+        self.last_outcome = "biased_response"
+        return BIASED_RESPONSE_REPLY
+
+    def _llm_turn(self, user_input: str, input_hits: RuleHits, timer: ChatTimer, ticket) -> str:
+        """Stages 2-5 for an admitted message that needs the LLM."""
+        messages = self._context_stage(user_input, timer)
+
+        try:
+            self._check_llm_health()
+            with ticket.llm_slot():
+                timer.lap("llm_queue")
+                llm_response = self._query_llm(messages)
+        except Exception as e:
+            return self._llm_failure(e)
+        finally:
+            timer.lap("llm")
+
+        rejected = self._review_response(llm_response, user_input, input_hits)
+        timer.lap("review")
+        if rejected:
+            return rejected
 
         # Logging access
         self.logger.log_data_access(self.user_id, "read")
 
         # Save AI response
         append_to_conversation(self.user_id, "assistant", llm_response)
+        timer.lap("save_reply")
+        self.last_outcome = "success"
 
         return llm_response
+
+    async def _llm_turn_async(self, user_input: str, input_hits: RuleHits, timer: ChatTimer, ticket) -> str:
+        messages = await self._context_stage_async(user_input, timer)
+
+        try:
+            self._check_llm_health()
+            async with ticket.llm_slot():
+                timer.lap("llm_queue")
+                llm_response = await self._query_llm_async(messages)
+        except Exception as e:
+            return self._llm_failure(e)
+        finally:
+            timer.lap("llm")
+
+        rejected = self._review_response(llm_response, user_input, input_hits)
+        timer.lap("review")
+        if rejected:
+            return rejected
+
+        self.logger.log_data_access(self.user_id, "read")
+        await asyncio.to_thread(append_to_conversation, self.user_id, "assistant", llm_response)
+        timer.lap("save_reply")
+        self.last_outcome = "success"
+
+        return llm_response
+
+    # --- Entry points ---
+    #
+    # Local replies never wait and are never rate limited. Messages that
+    # need the LLM go through admission control first (per-user token
+    # bucket, then load shedding when too many turns are queued); a
+    # rejection raises AdmissionRejected before anything is stored. Turns
+    # are then serialized per user through the core's TurnCoordinator, so
+    # concurrent messages from one user (double submits, two tabs) don't
+    # race on the history or pay for parallel LLM calls.
+
+    def _rejected(self, exc: AdmissionRejected):
+        self.last_outcome = "rate_limited" if isinstance(exc, RateLimited) else "shed"
+
+    def process(self, user_input: str):
+        timer = ChatTimer()
+        self.last_outcome = None
+        try:
+            input_hits = RULES.scan(user_input)
+            local_reply = self._local_stage(user_input, input_hits)
+            timer.lap("local")
+            if local_reply:
+                self._persist_local_turn_later(user_input, local_reply)
+                return local_reply
+
+            self.core.admission.check_rate(self.user_id)
+            ticket = self.core.admission.admit()
+            try:
+                with self.core.turns.hold(self.user_id):
+                    timer.lap("queued")
+                    return self._llm_turn(user_input, input_hits, timer, ticket)
+            finally:
+                ticket.close()
+        except AdmissionRejected as exc:
+            self._rejected(exc)
+            raise
+        finally:
+            timer.finish(self.last_outcome)
+
+    async def process_async(self, user_input: str):
+        """
+        Same pipeline as process(), without blocking the event loop.
+        The LLM call uses the backend's async API and Supabase
+        round-trips run in worker threads.
+
+        Messages that arrive while this user's previous turn is running
+        are coalesced into one follow-up LLM turn, and every sender gets
+        its reply; last_outcome is "coalesced" for the messages whose turn
+        was run by another call.
+        """
+        timer = ChatTimer()
+        self.last_outcome = None
+        ran_turn = False
+
+        async def run_turn(text: str) -> str:
+            nonlocal ran_turn
+            ran_turn = True
+            ticket = self.core.admission.admit()
+            try:
+                timer.lap("queued")
+                hits = input_hits if text == user_input else RULES.scan(text)
+                return await self._llm_turn_async(text, hits, timer, ticket)
+            finally:
+                ticket.close()
+
+        try:
+            input_hits = RULES.scan(user_input)
+            local_reply = self._local_stage(user_input, input_hits)
+            timer.lap("local")
+            if local_reply:
+                self._persist_local_turn_later(user_input, local_reply)
+                return local_reply
+
+            self.core.admission.check_rate(self.user_id)
+            reply = await self.core.turns.submit(self.user_id, user_input, run_turn)
+            if not ran_turn:
+                self.last_outcome = "coalesced"
+            return reply
+        except AdmissionRejected as exc:
+            self._rejected(exc)
+            raise
+        except asyncio.CancelledError:
+            self.last_outcome = self.last_outcome or "disconnected"
+            raise
+        finally:
+            timer.finish(self.last_outcome)
+
+    def process_stream(self, user_input: str):
+        """
+        Streaming variant of process(). Yields event dicts:
+        {"type": "delta", "text": ...} for each accepted chunk, then a final
+        {"type": "done", "response": ..., "blocked": bool}. The done event
+        carries the authoritative reply; when a safety or bias rule trips
+        mid-stream it is the fallback message and the partial text must be
+        discarded by the client.
+        """
+        timer = ChatTimer()
+        self.last_outcome = None
+        try:
+            input_hits = RULES.scan(user_input)
+            local_reply = self._local_stage(user_input, input_hits)
+            timer.lap("local")
+            if local_reply:
+                self._persist_local_turn_later(user_input, local_reply)
+                yield {"type": "done", "response": local_reply, "blocked": False}
+                return
+
+            self.core.admission.check_rate(self.user_id)
+            ticket = self.core.admission.admit()
+            try:
+                with self.core.turns.hold(self.user_id):
+                    timer.lap("queued")
+                    yield from self._stream_turn(user_input, input_hits, timer, ticket)
+            finally:
+                ticket.close()
+        except AdmissionRejected as exc:
+            self._rejected(exc)
+            raise
+        except GeneratorExit:
+            # Consumer went away before the done event
+            self.last_outcome = self.last_outcome or "disconnected"
+            raise
+        finally:
+            timer.finish(self.last_outcome)
+
+    def _stream_turn(self, user_input: str, input_hits: RuleHits, timer: ChatTimer, ticket):
+        messages = self._context_stage(user_input, timer)
+
+        # The llm stage includes the per-chunk guard checks
+        guard = StreamGuard(self.safety_checker, self.bias_detector)
+        try:
+            self._check_llm_health()
+            with ticket.llm_slot():
+                timer.lap("llm_queue")
+                for chunk in self.llm.stream(messages):
+                    fallback = self._guard_fallback(guard.feed(chunk))
+                    if fallback:
+                        timer.lap("llm")
+                        yield {"type": "done", "response": fallback, "blocked": True}
+                        return
+                    yield {"type": "delta", "text": chunk}
+        except Exception as e:
+            timer.lap("llm")
+            yield {"type": "done", "response": self._llm_failure(e), "blocked": True}
+            return
+        timer.lap("llm")
+        fallback = self._guard_fallback(guard.finish())
+        if fallback:
+            yield {"type": "done", "response": fallback, "blocked": True}
+            return
+
+        llm_response = guard.text or "I'm sorry, I couldn't generate a response right now."
+        rejected = self._review_response(llm_response, user_input, input_hits)
+        timer.lap("review")
+        if rejected:
+            yield {"type": "done", "response": rejected, "blocked": True}
+            return
+
+        self.logger.log_data_access(self.user_id, "read")
+        append_to_conversation(self.user_id, "assistant", llm_response)
+        timer.lap("save_reply")
+        self.last_outcome = "success"
+        yield {"type": "done", "response": llm_response, "blocked": False}
+
+    async def process_stream_async(self, user_input: str):
+        """
+        Async variant of process_stream() for the SSE endpoint. Streamed
+        turns are serialized per user but not coalesced.
+        """
+        timer = ChatTimer()
+        self.last_outcome = None
+        ticket = None
+        try:
+            input_hits = RULES.scan(user_input)
+            local_reply = self._local_stage(user_input, input_hits)
+            timer.lap("local")
+            if local_reply:
+                self._persist_local_turn_later(user_input, local_reply)
+                yield {"type": "done", "response": local_reply, "blocked": False}
+                return
+
+            self.core.admission.check_rate(self.user_id)
+            ticket = self.core.admission.admit()
+            async with self.core.turns.exclusive(self.user_id):
+                timer.lap("queued")
+                messages = await self._context_stage_async(user_input, timer)
+
+                guard = StreamGuard(self.safety_checker, self.bias_detector)
+                try:
+                    self._check_llm_health()
+                    async with ticket.llm_slot():
+                        timer.lap("llm_queue")
+                        async for chunk in self.llm.astream(messages):
+                            fallback = self._guard_fallback(guard.feed(chunk))
+                            if fallback:
+                                timer.lap("llm")
+                                yield {"type": "done", "response": fallback, "blocked": True}
+                                return
+                            yield {"type": "delta", "text": chunk}
+                except Exception as e:
+                    timer.lap("llm")
+                    yield {"type": "done", "response": self._llm_failure(e), "blocked": True}
+                    return
+                timer.lap("llm")
+                fallback = self._guard_fallback(guard.finish())
+                if fallback:
+                    yield {"type": "done", "response": fallback, "blocked": True}
+                    return
+
+                llm_response = guard.text or "I'm sorry, I couldn't generate a response right now."
+                rejected = self._review_response(llm_response, user_input, input_hits)
+                timer.lap("review")
+                if rejected:
+                    yield {"type": "done", "response": rejected, "blocked": True}
+                    return
+
+                self.logger.log_data_access(self.user_id, "read")
+                await asyncio.to_thread(append_to_conversation, self.user_id, "assistant", llm_response)
+                timer.lap("save_reply")
+                self.last_outcome = "success"
+                yield {"type": "done", "response": llm_response, "blocked": False}
+        except AdmissionRejected as exc:
+            self._rejected(exc)
+            raise
+        except (GeneratorExit, asyncio.CancelledError):
+            self.last_outcome = self.last_outcome or "disconnected"
+            raise
+        finally:
+            if ticket is not None:
+                ticket.close()
+            timer.finish(self.last_outcome)
@@ -0,0 +1,243 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Awaitable, Callable, Dict, List, Optional
+
+# Messages coalesced into one turn are sent to the model as one user message
+COALESCE_SEPARATOR = "\n"
+# The same text again within this many seconds is a double submit and shares
+# the earlier reply; later repeats are new messages
+DUPLICATE_WINDOW_SECONDS = float(os.getenv("REFLECTAI_TURN_DUPLICATE_SECONDS", "2"))
+
+
+class _Waiter:
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, event=None, loop=None, future=None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+
+class _TurnLock:
+    """
+    FIFO lock that threads and event-loop tasks both wait on, so the
+    synchronous and async pipelines share one per-user queue. Release
+    hands the lock straight to the oldest waiter.
+    """
+
+    __slots__ = ("_guard", "_locked", "_waiters")
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locked = False
+        self._waiters: deque = deque()
+
+    def _try_acquire(self, waiter: _Waiter) -> bool:
+        with self._guard:
+            if not self._locked and not self._waiters:
+                self._locked = True
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def acquire(self):
+        waiter = _Waiter(event=threading.Event())
+        if not self._try_acquire(waiter):
+            waiter.event.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop=loop, future=loop.create_future())
+        if self._try_acquire(waiter):
+            return
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._guard:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            # Handed over just as we were cancelled: pass it on
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        with self._guard:
+            if not self._waiters:
+                self._locked = False
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        if waiter.event is not None:
+            waiter.event.set()
+        else:
+            waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Batch:
+    """Messages answered by one LLM turn, and the future every sender awaits."""
+
+    __slots__ = ("messages", "arrivals", "run", "future")
+
+    def __init__(self, message: str, run: Callable[[str], Awaitable[str]], future: asyncio.Future):
+        self.messages: List[str] = [message]
+        # time.monotonic() each message arrived
+        self.arrivals: List[float] = [time.monotonic()]
+        self.run = run
+        self.future = future
+        # Mark the outcome as retrieved even if every sender has gone away
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def add(self, message: str):
+        self.messages.append(message)
+        self.arrivals.append(time.monotonic())
+
+    def repeats(self, message: str, window: float) -> bool:
+        """True if `message` already arrived in this batch within the last `window` seconds."""
+        now = time.monotonic()
+        return any(m == message and now - at <= window for m, at in zip(self.messages, self.arrivals))
+
+
+class _Mailbox:
+    __slots__ = ("lock", "current", "pending", "refs")
+
+    def __init__(self):
+        self.lock = _TurnLock()
+        self.current: Optional[_Batch] = None
+        self.pending: Optional[_Batch] = None
+        self.refs = 0
+
+
+class TurnCoordinator:
+    """
+    Per-user in-flight guard for LLM turns.
+
+    submit() runs at most one turn per user at a time. Messages that
+    arrive while a turn is running are collected into a single pending
+    batch and answered together by the next turn; the same text arriving
+    again within `duplicate_window` seconds of a message already running
+    or pending (double submit) shares that turn's reply instead of
+    starting another. Every sender in a batch gets the same reply.
+
+    exclusive() serializes streamed turns (no coalescing) and hold() does
+    the same for synchronous callers on threads. All three wait on the
+    same per-user lock, so a threaded turn and an async turn for one user
+    never overlap. State exists only while a user has turns in flight,
+    and each user has their own lock, so different users never wait on
+    each other.
+    """
+
+    def __init__(self, duplicate_window: float = DUPLICATE_WINDOW_SECONDS):
+        self.duplicate_window = duplicate_window
+        self._boxes: Dict[str, _Mailbox] = {}
+        self._guard = threading.Lock()
+        self.stats = {"turns": 0, "coalesced": 0, "duplicates": 0}
+
+    def _acquire(self, user_id: str) -> _Mailbox:
+        with self._guard:
+            box = self._boxes.get(user_id)
+            if box is None:
+                box = self._boxes[user_id] = _Mailbox()
+            box.refs += 1
+            return box
+
+    def _release(self, user_id: str, box: _Mailbox):
+        with self._guard:
+            box.refs -= 1
+            if not box.refs and self._boxes.get(user_id) is box:
+                del self._boxes[user_id]
+
+    async def submit(self, user_id: str, message: str, run: Callable[[str], Awaitable[str]]) -> str:
+        """
+        Answer `message` with `run(text)`, where `text` is this message
+        joined with any others coalesced into the same turn. Returns the
+        turn's reply.
+        """
+        box = self._acquire(user_id)
+        try:
+            for batch in (box.current, box.pending):
+                if batch is not None and batch.repeats(message, self.duplicate_window):
+                    self.stats["duplicates"] += 1
+                    return await asyncio.shield(batch.future)
+            if box.pending is not None:
+                batch = box.pending
+                batch.add(message)
+                self.stats["coalesced"] += 1
+            else:
+                loop = asyncio.get_running_loop()
+                batch = box.pending = _Batch(message, run, loop.create_future())
+                # The turn runs in its own task (holding its own reference to
+                # the mailbox) so a sender that disconnects doesn't cancel it
+                # for the others
+                with self._guard:
+                    box.refs += 1
+                loop.create_task(self._drive(user_id, box, batch))
+            return await asyncio.shield(batch.future)
+        finally:
+            self._release(user_id, box)
+
+    async def _drive(self, user_id: str, box: _Mailbox, batch: _Batch):
+        try:
+            await box.lock.acquire_async()
+            try:
+                # Close the batch: later messages start the next one
+                if box.pending is batch:
+                    box.pending = None
+                box.current = batch
+                self.stats["turns"] += 1
+                try:
+                    result = await batch.run(COALESCE_SEPARATOR.join(batch.messages))
+                except asyncio.CancelledError:
+                    batch.future.cancel()
+                    raise
+                except Exception as exc:
+                    batch.future.set_exception(exc)
+                else:
+                    batch.future.set_result(result)
+                finally:
+                    box.current = None
+            finally:
+                box.lock.release()
+        finally:
+            self._release(user_id, box)
+
+    @asynccontextmanager
+    async def exclusive(self, user_id: str):
+        """Run a turn for `user_id` once any earlier turn has finished."""
+        box = self._acquire(user_id)
+        try:
+            await box.lock.acquire_async()
+            try:
+                yield
+            finally:
+                box.lock.release()
+        finally:
+            self._release(user_id, box)
+
+    @contextmanager
+    def hold(self, user_id: str):
+        """Thread-side equivalent of exclusive() for the synchronous pipeline."""
+        box = self._acquire(user_id)
+        try:
+            box.lock.acquire()
+            try:
+                yield
+            finally:
+                box.lock.release()
+        finally:
+            self._release(user_id, box)
+
+    def in_flight(self) -> int:
+        """Users with a turn running or waiting."""
+        return len(self._boxes)
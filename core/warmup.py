@@ -0,0 +1,145 @@
+import asyncio
+import inspect
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Set REFLECTAI_WARMUP=0 to report ready at once (e.g. tests, one-off scripts)
+WARMUP_ENABLED = os.getenv("REFLECTAI_WARMUP", "1") == "1"
+# A stuck step never keeps the instance out of rotation for longer than this
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("REFLECTAI_WARMUP_TIMEOUT_SECONDS", "20"))
+
+Step = Tuple[str, Callable]
+
+
+class Warmup:
+    """
+    Named start-up steps run once, in order, with readiness tracking.
+
+    Steps may be plain or async callables. A failing step is recorded and
+    the rest still run: the engine has fallbacks for a missing dependency,
+    and a dependency that is down should not keep the instance unready
+    forever. The instance counts as ready once every step has finished or
+    `timeout` seconds after warm-up started, whichever comes first.
+    """
+
+    def __init__(self, steps: List[Step], timeout: float = WARMUP_TIMEOUT_SECONDS):
+        self.steps = steps
+        self.timeout = timeout
+        self.results: Dict[str, dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return "ready"
+        if self.started_at is None:
+            return "pending"
+        if time.monotonic() - self.started_at > self.timeout:
+            return "timeout"
+        return "warming"
+
+    @property
+    def ready(self) -> bool:
+        return self.status in ("ready", "timeout")
+
+    def _begin(self) -> bool:
+        with self._lock:
+            if self.started_at is not None:
+                return False
+            self.started_at = time.monotonic()
+            return True
+
+    def _record(self, name: str, start: float, error: Optional[BaseException]):
+        result = {"ok": error is None, "seconds": round(time.monotonic() - start, 4)}
+        if error is not None:
+            result["error"] = f"{type(error).__name__}: {error}"
+            print(f"Warm-up step {name} failed: {result['error']}")
+        self.results[name] = result
+
+    def run(self):
+        """Run every step in this thread (async steps get their own event loop)."""
+        if not self._begin():
+            return
+        for name, step in self.steps:
+            start = time.monotonic()
+            try:
+                outcome = step()
+                if inspect.isawaitable(outcome):
+                    asyncio.run(outcome)
+                self._record(name, start, None)
+            except Exception as exc:
+                self._record(name, start, exc)
+        self.finished_at = time.monotonic()
+
+    async def arun(self):
+        """Run every step from the server's event loop; blocking steps run in a worker thread."""
+        if not self._begin():
+            return
+        for name, step in self.steps:
+            start = time.monotonic()
+            try:
+                if inspect.iscoroutinefunction(step):
+                    await step()
+                else:
+                    await asyncio.to_thread(step)
+                self._record(name, start, None)
+            except Exception as exc:
+                self._record(name, start, exc)
+        self.finished_at = time.monotonic()
+
+    def start(self) -> threading.Thread:
+        """Run the steps on a daemon thread, for servers without a startup hook."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def snapshot(self) -> dict:
+        """Readiness report served by /readyz."""
+        end = self.finished_at or time.monotonic()
+        return {
+            "status": self.status,
+            "seconds": round(end - self.started_at, 4) if self.started_at is not None else 0.0,
+            "steps": dict(self.results),
+        }
+
+    def metrics(self) -> Dict[str, float]:
+        snapshot = self.snapshot()
+        return {"ready": 1 if self.ready else 0, "seconds": snapshot["seconds"],
+                "failed_steps": sum(1 for r in self.results.values() if not r["ok"])}
+
+
+def _load_intent_classifier():
+    # Imported in the step, so numpy loads off the startup path
+    from ethical_modules.intent_classifier import get_intent_classifier
+    get_intent_classifier()
+
+
+def engine_warmup(core, asynchronous: bool = True) -> Warmup:
+    """
+    Warm-up for a process serving chats through `core`: compile the rule
+    automaton, load the intent classifier, open the LLM and storage
+    connection pools and start the conversation writer. With
+    `asynchronous`, the LLM pool warmed is the one used from the server's
+    event loop.
+    """
+    # Imported here: chat_memory selects and builds the store at import
+    from core.chat_memory import conversation_writer, get_conversation_store
+    from ethical_modules.rule_engine import RULES
+
+    if not WARMUP_ENABLED:
+        return Warmup([])
+    store = get_conversation_store()
+    return Warmup([
+        ("rules", RULES.compile),
+        ("intent", _load_intent_classifier),
+        ("llm", core.llm.awarm if asynchronous else core.llm.warm),
+        ("storage", store.warm),
+        ("writer", conversation_writer.start),
+    ])
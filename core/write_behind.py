@@ -0,0 +1,173 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List
+
+WRITE_BATCH_SIZE = int(os.getenv("REFLECTAI_WRITE_BATCH_SIZE", "50"))
+WRITE_FLUSH_SECONDS = float(os.getenv("REFLECTAI_WRITE_FLUSH_SECONDS", "0.5"))
+WRITE_QUEUE_MAX = int(os.getenv("REFLECTAI_WRITE_QUEUE_MAX", "5000"))
+WRITE_ENQUEUE_TIMEOUT = float(os.getenv("REFLECTAI_WRITE_ENQUEUE_TIMEOUT", "2.0"))
+WRITE_MAX_RETRIES = int(os.getenv("REFLECTAI_WRITE_MAX_RETRIES", "3"))
+
+
+class WriteBehindQueue:
+    """
+    Buffers rows in memory and persists them from a background thread as
+    bulk inserts, flushing when `max_batch` rows are waiting or
+    `flush_interval` seconds have passed since the oldest one arrived.
+
+    The buffer is bounded: when it is full, submit() blocks for up to
+    `enqueue_timeout` seconds and then writes the row synchronously, so a
+    slow database slows producers down instead of growing memory or
+    losing rows. Failed batches are retried with exponential backoff, and
+    pending rows are flushed at interpreter exit.
+    """
+
+    def __init__(self, write_rows: Callable[[List[dict]], None],
+                 max_batch: int = WRITE_BATCH_SIZE,
+                 flush_interval: float = WRITE_FLUSH_SECONDS,
+                 max_pending: int = WRITE_QUEUE_MAX,
+                 enqueue_timeout: float = WRITE_ENQUEUE_TIMEOUT,
+                 max_retries: int = WRITE_MAX_RETRIES,
+                 retry_backoff: float = 0.5,
+                 name: str = "write-behind"):
+        self.write_rows = write_rows
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._unfinished = 0
+        # Rows accepted but not yet persisted, per user, so readers that
+        # miss the cache can still see them
+        self._pending: Dict[str, List[dict]] = {}
+        self._thread = None
+        self._stopping = False
+        self._atexit_registered = False
+        # Updated from callers' threads and the writer thread; under self._lock
+        self.stats = {"submitted": 0, "written": 0, "batches": 0, "retries": 0,
+                      "failed": 0, "sync_writes": 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                if not self._atexit_registered:
+                    atexit.register(self.stop)
+                    self._atexit_registered = True
+
+    def submit(self, row: dict):
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            self._unfinished += 1
+            self.stats["submitted"] += 1
+            self._pending.setdefault(row.get("user_id"), []).append(row)
+        try:
+            self._queue.put(row, timeout=self.enqueue_timeout)
+        except queue.Full:
+            # Backpressure exhausted: persist this row on the caller's thread
+            self._count("sync_writes")
+            self._write_with_retries([row])
+            self._done([row])
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def pending_rows(self, user_id: str) -> List[dict]:
+        with self._lock:
+            return list(self._pending.get(user_id, ()))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every submitted row has been written (or given up on)."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._unfinished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """Flush pending rows and stop the background thread."""
+        if self._thread is None:
+            return True
+        flushed = self.flush(timeout)
+        self._stopping = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+        return flushed
+
+    def _run(self):
+        while True:
+            row = self._queue.get()
+            if row is None:
+                if self._stopping:
+                    return
+                continue
+            batch = [row]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is None:
+                    # Stop marker: write what we have, then handle it on the next get()
+                    self._queue.put_nowait(None)
+                    break
+                batch.append(row)
+            self._write_with_retries(batch)
+            self._done(batch)
+
+    def _write_with_retries(self, batch: List[dict]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.write_rows(batch)
+                with self._lock:
+                    self.stats["written"] += len(batch)
+                    self.stats["batches"] += 1
+                return
+            except Exception as exc:
+                if attempt == self.max_retries:
+                    self._count("failed", len(batch))
+                    print(f"Error persisting {len(batch)} rows after {attempt + 1} attempts: {exc}")
+                    return
+                self._count("retries")
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _done(self, batch: List[dict]):
+        with self._idle:
+            for row in batch:
+                rows = self._pending.get(row.get("user_id"))
+                if rows:
+                    try:
+                        rows.remove(row)
+                    except ValueError:
+                        pass
+                    if not rows:
+                        del self._pending[row.get("user_id")]
+            self._unfinished -= len(batch)
+            if not self._unfinished:
+                self._idle.notify_all()
@@ -0,0 +1,286 @@
+"""
+Segmented, indexed storage for the ethics audit log.
+
+The live log (logs/ethics_audit.log) is a JSON-lines file. AuditSink
+seals it into a segment whenever its time bucket ends or it grows past
+the size limit. A segment is a gzip file made of independent members
+("blocks") of up to BLOCK_RECORDS records, clustered by user_id so one
+user's events sit in a few adjacent blocks, plus a side index:
+
+    {"version": 1, "segment": "...jsonl.gz", "count": N, "start": t0, "end": t1,
+     "blocks": [[offset, length, start, end], ...],
+     "users": {user_id: [block, ...]}, "events": {event: [block, ...]}}
+
+Segment names carry their time range, so queries skip segments outside
+the range without opening their indexes, then prune blocks by user,
+event and time and only decompress the blocks that can match.
+
+Usage:
+    python -m ethical_modules.audit_store query --user user1 --event crisis_detected \
+        --since 2024-05-01 --until 2024-05-08
+    python -m ethical_modules.audit_store seal logs/ethics_audit.log
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Union
+
+AUDIT_SEGMENT_SECONDS = int(os.getenv("REFLECTAI_AUDIT_SEGMENT_SECONDS", "86400"))
+AUDIT_SEGMENT_MAX_BYTES = int(os.getenv("REFLECTAI_AUDIT_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+BLOCK_RECORDS = 512
+INDEX_VERSION = 1
+
+TimeArg = Union[None, int, float, str, datetime]
+
+
+def segment_dir_for(log_path: str) -> str:
+    """Segments of logs/ethics_audit.log live in logs/ethics_audit_segments/."""
+    stem = os.path.splitext(os.path.basename(log_path))[0]
+    return os.path.join(os.path.dirname(os.path.abspath(log_path)), f"{stem}_segments")
+
+
+def bucket_of(timestamp: float, segment_seconds: int = AUDIT_SEGMENT_SECONDS) -> int:
+    return int(timestamp // segment_seconds)
+
+
+def to_epoch(value: TimeArg) -> Optional[float]:
+    """Accept epoch seconds, datetimes or ISO-8601 strings (naive means local time)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def _record_time(record: dict, default: float) -> float:
+    try:
+        return to_epoch(record.get("timestamp")) or default
+    except (TypeError, ValueError):
+        return default
+
+
+def seal_segment(source_path: str, segment_dir: str, block_records: int = BLOCK_RECORDS) -> Optional[str]:
+    """
+    Compress a JSON-lines audit file into a segment plus side index and
+    delete the source. Returns the index path, or None if the file held
+    no records. The index is written last, so a segment without one is
+    incomplete and ignored by queries.
+    """
+    fallback_time = os.path.getmtime(source_path)
+    records = []
+    with open(source_path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = {"message": "unparseable_audit_line", "raw": line}
+            records.append((_record_time(record, fallback_time), line, record))
+    if not records:
+        os.remove(source_path)
+        return None
+    start, end = min(r[0] for r in records), max(r[0] for r in records)
+    # Cluster by user; a stable sort keeps each user's events in time order
+    records.sort(key=lambda r: (str(r[2].get("user_id", "")), r[0]))
+
+    os.makedirs(segment_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    # <stem>-<start>-<end>-<unique>: lets queries prune by time from the name alone
+    base = f"{stem}-{math.floor(start)}-{math.ceil(end)}-{os.getpid()}{time.monotonic_ns()}"
+    segment_name = base + ".jsonl.gz"
+    segment_path = os.path.join(segment_dir, segment_name)
+
+    blocks, users, events = [], {}, {}
+    with open(segment_path + ".tmp", "wb") as out:
+        for block_id, first in enumerate(range(0, len(records), block_records)):
+            chunk = records[first:first + block_records]
+            payload = ("\n".join(line for _, line, _ in chunk) + "\n").encode("utf-8")
+            member = gzip.compress(payload, compresslevel=6, mtime=0)
+            blocks.append([out.tell(), len(member), min(r[0] for r in chunk), max(r[0] for r in chunk)])
+            out.write(member)
+            for _, _, record in chunk:
+                user = record.get("user_id")
+                if user is not None:
+                    ids = users.setdefault(str(user), [])
+                    if not ids or ids[-1] != block_id:
+                        ids.append(block_id)
+                ids = events.setdefault(str(record.get("message", "")), [])
+                if not ids or ids[-1] != block_id:
+                    ids.append(block_id)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(segment_path + ".tmp", segment_path)
+
+    index = {"version": INDEX_VERSION, "segment": segment_name, "count": len(records),
+             "start": start, "end": end, "blocks": blocks, "users": users, "events": events}
+    index_path = os.path.join(segment_dir, base + ".idx.json")
+    with open(index_path + ".tmp", "w", encoding="utf-8") as out:
+        json.dump(index, out, separators=(",", ":"))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(index_path + ".tmp", index_path)
+    os.remove(source_path)
+    return index_path
+
+
+class AuditStore:
+    """
+    Read side of the audit log: sealed segments plus the live file.
+    Indexes are cached and reloaded only when new segments appear.
+    """
+
+    def __init__(self, log_path: str, segment_dir: Optional[str] = None):
+        self.log_path = log_path
+        self.segment_dir = segment_dir or segment_dir_for(log_path)
+        self._indexes: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.stats = {"segments_scanned": 0, "blocks_read": 0, "bytes_read": 0}
+
+    def _load_indexes(self, lo: Optional[float] = None, hi: Optional[float] = None) -> List[dict]:
+        """Indexes of sealed segments overlapping [lo, hi), oldest first."""
+        try:
+            names = [n for n in os.listdir(self.segment_dir) if n.endswith(".idx.json")]
+        except FileNotFoundError:
+            names = []
+        selected = []
+        for name in names:
+            try:
+                start, end = (int(v) for v in name[:-len(".idx.json")].rsplit("-", 3)[1:3])
+            except ValueError:
+                start, end = None, None
+            if start is not None and ((lo is not None and end < lo) or (hi is not None and start >= hi)):
+                continue
+            selected.append(name)
+        with self._lock:
+            for name in selected:
+                if name not in self._indexes:
+                    with open(os.path.join(self.segment_dir, name), encoding="utf-8") as fh:
+                        self._indexes[name] = json.load(fh)
+            return sorted((self._indexes[n] for n in selected), key=lambda i: i["start"])
+
+    def query(self, user_id: Optional[str] = None, event: Optional[str] = None,
+              since: TimeArg = None, until: TimeArg = None, include_live: bool = True) -> Iterator[dict]:
+        """
+        Yield audit records matching every given filter, oldest first.
+        `since` is inclusive and `until` exclusive.
+        """
+        lo, hi = to_epoch(since), to_epoch(until)
+        # Cheap substring test on the raw line before paying for json.loads
+        needles = [json.dumps(v) for v in (user_id, event) if v is not None and v.isascii()]
+
+        def matches(record, ts):
+            return ((user_id is None or record.get("user_id") == user_id)
+                    and (event is None or record.get("message") == event)
+                    and (lo is None or ts >= lo) and (hi is None or ts < hi))
+
+        for index in self._load_indexes(lo, hi):
+            if (lo is not None and index["end"] < lo) or (hi is not None and index["start"] >= hi):
+                continue
+            candidates = range(len(index["blocks"]))
+            if user_id is not None:
+                candidates = index["users"].get(user_id, [])
+            if event is not None:
+                by_event = set(index["events"].get(event, []))
+                candidates = [b for b in candidates if b in by_event]
+            candidates = [b for b in candidates
+                          if not ((lo is not None and index["blocks"][b][3] < lo)
+                                  or (hi is not None and index["blocks"][b][2] >= hi))]
+            if not candidates:
+                continue
+            self.stats["segments_scanned"] += 1
+            found = []
+            with open(os.path.join(self.segment_dir, index["segment"]), "rb") as fh:
+                for block in candidates:
+                    offset, length, _, _ = index["blocks"][block]
+                    fh.seek(offset)
+                    data = zlib.decompress(fh.read(length), 16 + zlib.MAX_WBITS)
+                    self.stats["blocks_read"] += 1
+                    self.stats["bytes_read"] += length
+                    for line in data.decode("utf-8").splitlines():
+                        if needles and not all(n in line for n in needles):
+                            continue
+                        record = json.loads(line)
+                        ts = _record_time(record, index["start"])
+                        if matches(record, ts):
+                            found.append((ts, record))
+            # Blocks are clustered by user; hand matches back in time order
+            found.sort(key=lambda item: item[0])
+            for _, record in found:
+                yield record
+
+        if include_live:
+            # The live file covers at most one bucket, so a scan is cheap
+            for path in (self.log_path + ".sealing", self.log_path):
+                try:
+                    fh = open(path, encoding="utf-8")
+                except FileNotFoundError:
+                    continue
+                with fh:
+                    fallback = os.path.getmtime(path)
+                    for line in fh:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        if matches(record, _record_time(record, fallback)):
+                            yield record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or seal the ethics audit log.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    query = sub.add_parser("query", help="print matching audit records as JSON lines")
+    query.add_argument("--log", default="logs/ethics_audit.log", help="live audit log path")
+    query.add_argument("--user", help="user_id to match")
+    query.add_argument("--event", help="event name, e.g. crisis_detected or ethical_violation_detected")
+    query.add_argument("--since", help="inclusive start (ISO-8601 or epoch seconds)")
+    query.add_argument("--until", help="exclusive end (ISO-8601 or epoch seconds)")
+    query.add_argument("--count", action="store_true", help="print only the number of matches")
+
+    seal = sub.add_parser("seal", help="compress a JSON-lines log into an indexed segment (offline)")
+    seal.add_argument("log", help="log file to seal; it is removed afterwards")
+
+    args = parser.parse_args(argv)
+    if args.command == "seal":
+        index_path = seal_segment(args.log, segment_dir_for(args.log))
+        print(index_path or "no records to seal")
+        return 0
+
+    def parse_time(value):
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+    store = AuditStore(args.log)
+    started = time.perf_counter()
+    matches = 0
+    for record in store.query(user_id=args.user, event=args.event,
+                              since=parse_time(args.since), until=parse_time(args.until)):
+        matches += 1
+        if not args.count:
+            print(json.dumps(record))
+    if args.count:
+        print(matches)
+    print(f"{matches} records in {time.perf_counter() - started:.3f}s "
+          f"({store.stats['segments_scanned']} segments, {store.stats['blocks_read']} blocks read)",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
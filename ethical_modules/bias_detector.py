@@ -1,35 +1,45 @@
+from typing import Optional
+
+from ethical_modules.rule_engine import RULES, RuleHits
+
+
 class BiasDetector:
     """
     Identifies potential gender and cultural biases in responses.
     Flexible matching for singular/plural and keyword variations.
     """
 
-    def __init__(self):
-        # Masculine/feminine keywords for bias detection
-        self.masculine_terms = ["man", "men", "boy", "boys", "male", "males"]
-        self.feminine_terms = ["woman", "women", "girl", "girls", "female", "females"]
-        self.strength_terms = ["strong", "tough", "brave", "aggressive"]
-        self.emotion_terms = ["emotional", "sensitive", "weak", "fragile"]
-
-        # Cultural assumptions (Western-centric features, etc.)
-        self.cultural_assumptions = [
-            "you should tell your family",   # Family involvement isn't universal
-            "western therapy approach",      # Western-centric
-            "individual achievement",        # Implies individualism
-        ]
-
-    def check_gender_bias(self, response: str):
-        response_lower = response.lower()
+    # Masculine/feminine keywords for bias detection
+    masculine_terms = ["man", "men", "boy", "boys", "male", "males"]
+    feminine_terms = ["woman", "women", "girl", "girls", "female", "females"]
+    strength_terms = ["strong", "tough", "brave", "aggressive"]
+    emotion_terms = ["emotional", "sensitive", "weak", "fragile"]
+
+    # Cultural assumptions (Western-centric features, etc.)
+    cultural_assumptions = [
+        "you should tell your family",   # Family involvement isn't universal
+        "western therapy approach",      # Western-centric
+        "individual achievement",        # Implies individualism
+    ]
+
+    TERM_GROUPS = ('masculine', 'feminine', 'strength', 'emotion')
+
+    def term_groups(self, response: str, hits: Optional[RuleHits] = None):
+        """Return the names of the term groups present in the response."""
+        hits = hits or RULES.scan(response)
+        return {name for name in self.TERM_GROUPS if f'bias.{name}' in hits}
+
+    def gender_bias_from_groups(self, groups):
         biased = False
         issue = None
 
         # Masculine: "man"/"men" + "strong"/"tough"/etc.
-        if any(m in response_lower for m in self.masculine_terms) and any(s in response_lower for s in self.strength_terms):
+        if 'masculine' in groups and 'strength' in groups:
             biased = True
             issue = "Masculine strength stereotype detected"
 
         # Feminine: "woman"/"women" + "emotional"/"weak"/etc.
-        if any(f in response_lower for f in self.feminine_terms) and any(e in response_lower for e in self.emotion_terms):
+        if 'feminine' in groups and 'emotion' in groups:
             biased = True
             issue = "Feminine emotion/weakness stereotype detected"
 
@@ -39,22 +49,31 @@ class BiasDetector:
             'issue': issue
         }
 
-    def check_cultural_sensitivity(self, response: str):
-        response_lower = response.lower()
-        issues = []
-        for assumption in self.cultural_assumptions:
-            if assumption in response_lower:
-                issues.append(f"Potential cultural assumption: {assumption}")
+    def check_gender_bias(self, response: str, hits: Optional[RuleHits] = None):
+        return self.gender_bias_from_groups(self.term_groups(response, hits=hits))
+
+    def check_cultural_sensitivity(self, response: str, hits: Optional[RuleHits] = None):
+        hits = hits or RULES.scan(response)
+        issues = [f"Potential cultural assumption: {assumption}"
+                  for assumption in hits.phrases('bias.cultural')]
         return {
             'culturally_sensitive': len(issues) == 0,
             'issues': issues
         }
 
-    def full_bias_check(self, response: str):
-        gender_result = self.check_gender_bias(response)
-        cultural_result = self.check_cultural_sensitivity(response)
+    def full_bias_check(self, response: str, hits: Optional[RuleHits] = None):
+        hits = hits or RULES.scan(response)
+        gender_result = self.check_gender_bias(response, hits=hits)
+        cultural_result = self.check_cultural_sensitivity(response, hits=hits)
         return {
             'passed_ethical_check': not gender_result['biased'] and cultural_result['culturally_sensitive'],
             'gender_bias': gender_result,
             'cultural_sensitivity': cultural_result
         }
+
+
+# Gender terms are whole words so "man" no longer fires on "many" or "human";
+# singular and plural forms are listed explicitly above.
+for _group in BiasDetector.TERM_GROUPS:
+    RULES.register(f'bias.{_group}', getattr(BiasDetector, f'{_group}_terms'), whole_word=True)
+RULES.register('bias.cultural', BiasDetector.cultural_assumptions, whole_word=False)
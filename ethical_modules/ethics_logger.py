@@ -1,24 +1,368 @@
-import json
+import atexit
 import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from logging.handlers import QueueHandler
+from typing import Dict, Optional
 from pythonjsonlogger import jsonlogger
 
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so one writer process per log file
+    fcntl = None
+
+from ethical_modules.audit_store import (
+    AUDIT_SEGMENT_MAX_BYTES, AUDIT_SEGMENT_SECONDS, bucket_of, seal_segment, segment_dir_for,
+)
+
+DEFAULT_LOG_FILE = 'logs/ethics_audit.log'
+AUDIT_BATCH_SIZE = int(os.getenv("REFLECTAI_AUDIT_BATCH_SIZE", "256"))
+AUDIT_FSYNC_SECONDS = float(os.getenv("REFLECTAI_AUDIT_FSYNC_SECONDS", "1.0"))
+
+
+class _SinkQueueHandler(QueueHandler):
+    """Hands records to the sink's queue without formatting them on the caller's thread."""
+
+    def __init__(self, sink: "AuditSink"):
+        super().__init__(sink.queue)
+        self.sink = sink
+
+    def prepare(self, record):
+        # Audit calls pass plain strings; formatting happens on the writer thread
+        return record
+
+    def enqueue(self, record):
+        self.sink._accept(record)
+
+
+class _ProcessLock:
+    """
+    flock() on a side file, so every process writing the same audit log
+    agrees on when it may be renamed. flock is held per open file, not per
+    thread: callers take the sink's own thread lock first.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    @contextmanager
+    def hold(self, exclusive: bool = True):
+        if fcntl is None:
+            yield
+            return
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class AuditSink:
+    """
+    Process-wide writer for one audit log file.
+
+    Loggers put records on an in-memory queue and return immediately; a
+    background thread drains the queue in batches, writes each batch with
+    a single write() and fsyncs at most every `fsync_interval` seconds (and
+    once the queue goes idle). The queue is unbounded, so nothing is
+    dropped, and close() drains it before the file is closed.
+
+    When the current time bucket (`segment_seconds`) ends or the file
+    passes `segment_max_bytes`, the file is sealed into a compressed,
+    indexed segment (see ethical_modules.audit_store) and a fresh one is
+    started.
+
+    Several processes (uvicorn workers) may share one log file. Each batch
+    is written under a shared flock on `<path>.lock` after checking that
+    the path still names the file this process has open; a rotation
+    renames the file under the exclusive lock, so the other processes
+    move to the new file before their next write instead of appending to
+    the one being sealed. `<path>.seal.lock` lets one process at a time
+    rotate and seal, so two rotations never share the `.sealing` file.
+    """
+
+    def __init__(self, path: str, logger_name: str,
+                 batch_size: int = AUDIT_BATCH_SIZE,
+                 fsync_interval: float = AUDIT_FSYNC_SECONDS,
+                 segment_seconds: int = AUDIT_SEGMENT_SECONDS,
+                 segment_max_bytes: int = AUDIT_SEGMENT_MAX_BYTES):
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.segment_seconds = segment_seconds
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_dir = segment_dir_for(path)
+        self._bucket = None
+        # Held while a segment is being sealed; taken before self._lock.
+        # The process locks are taken after the matching thread lock.
+        self._seal_lock = threading.Lock()
+        self._seal_flock = _ProcessLock(path + ".seal.lock")
+        self._write_flock = _ProcessLock(path + ".lock")
+        self.queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.formatter = jsonlogger.JsonFormatter()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._unfinished = 0
+        self._file = None
+        self._thread = None
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        self.stats = {"records": 0, "batches": 0, "fsyncs": 0, "errors": 0, "segments": 0}
+
+        self.handler = _SinkQueueHandler(self)
+        self.logger = logging.getLogger(logger_name)
+        self.logger.setLevel(logging.INFO)
+        if logger_name != 'ethics_audit':
+            # Keep per-file loggers out of the default audit log
+            self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def _accept(self, record):
+        with self._lock:
+            if self._thread is None:
+                self._start()
+            self._unfinished += 1
+        self.queue.put(record)
+
+    # Callers hold self._lock
+    def _start(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open()
+        self._thread = threading.Thread(target=self._run, name="ethics-audit-writer", daemon=True)
+        self._thread.start()
+
+    # Callers hold self._lock
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        size = self._size()
+        self._bucket = bucket_of(os.path.getmtime(self.path) if size else time.time(), self.segment_seconds)
+
+    # Callers hold self._lock
+    def _size(self) -> int:
+        # Not tell(): other processes append to the same file
+        return os.fstat(self._file.fileno()).st_size
+
+    # Callers hold self._lock and the write flock
+    def _follow(self):
+        """Reopen the path if another process has rotated the file away."""
+        if self._file is None:
+            return
+        try:
+            moved = os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            moved = True
+        if moved:
+            self._sync()
+            self._file.close()
+            self._open()
+
+    # Callers hold self._lock
+    def _rotation_due(self) -> bool:
+        if self._file is None or not self._size():
+            return False
+        return (bucket_of(time.time(), self.segment_seconds) != self._bucket
+                or self._size() >= self.segment_max_bytes)
+
+    def rotate(self, force: bool = True) -> Optional[str]:
+        """
+        Seal the current file into a segment and start a new one. Without
+        `force`, only when its time bucket has ended or it is too large.
+        Returns the new segment's index path, if one was written.
+        """
+        if not force:
+            # Cheap check first: most batches need no rotation
+            with self._lock:
+                if not self._rotation_due():
+                    return None
+        with self._seal_lock, self._seal_flock.hold():
+            with self._lock, self._write_flock.hold():
+                # Another process may have rotated while we waited
+                self._follow()
+                if self._file is None or not self._size() or not (force or self._rotation_due()):
+                    return None
+                self._dirty = True
+                self._sync()
+                self._file.close()
+                os.replace(self.path, self.path + ".sealing")
+                self._open()
+            # Compress and index without blocking writers
+            return self._seal(self.path + ".sealing")
+
+    # Callers hold self._seal_lock
+    def _seal(self, sealing_path: str) -> Optional[str]:
+        try:
+            index_path = seal_segment(sealing_path, self.segment_dir)
+        except Exception as exc:
+            self.stats["errors"] += 1
+            print(f"Error sealing audit segment {sealing_path}: {exc}")
+            return None
+        if index_path:
+            self.stats["segments"] += 1
+        return index_path
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until every queued record has been written and fsynced."""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._unfinished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+            self._sync()
+        return True
+
+    def close(self, timeout: float = 10.0) -> bool:
+        """Drain the queue, stop the writer thread and close the file."""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return True
+        flushed = self.flush(timeout)
+        self.queue.put(None)
+        thread.join(timeout)
+        with self._lock:
+            self._thread = None
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+            self._write_flock.close()
+        with self._seal_lock:
+            self._seal_flock.close()
+        return flushed
+
+    def _run(self):
+        # A crash mid-rotation leaves the renamed file behind; seal it first.
+        # Checked again under the lock: another process may be sealing it.
+        if os.path.exists(self.path + ".sealing"):
+            with self._seal_lock, self._seal_flock.hold():
+                if os.path.exists(self.path + ".sealing"):
+                    self._seal(self.path + ".sealing")
+        while True:
+            try:
+                record = self.queue.get(timeout=self.fsync_interval if self._dirty else None)
+            except queue.Empty:
+                # Idle with unsynced writes
+                with self._lock:
+                    self._sync()
+                continue
+            if record is None:
+                return
+            batch = [record]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+            self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        self.rotate(force=False)
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception as exc:
+                self.stats["errors"] += 1
+                print(f"Error formatting audit record {record.msg!r}: {exc}")
+        with self._idle:
+            try:
+                if lines:
+                    with self._write_flock.hold(exclusive=False):
+                        self._follow()
+                        self._file.write("\n".join(lines) + "\n")
+                        self._file.flush()
+                    self._dirty = True
+                    self.stats["records"] += len(lines)
+                    self.stats["batches"] += 1
+                if time.monotonic() - self._last_sync >= self.fsync_interval:
+                    self._sync()
+            except Exception as exc:
+                self.stats["errors"] += 1
+                print(f"Error writing {len(lines)} audit records to {self.path}: {exc}")
+            self._unfinished -= len(batch)
+            if not self._unfinished:
+                self._idle.notify_all()
+
+    # Callers hold self._lock
+    def _sync(self):
+        if self._dirty and self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.stats["fsyncs"] += 1
+            self._dirty = False
+        self._last_sync = time.monotonic()
+
+
+_sinks: Dict[str, AuditSink] = {}
+_sinks_lock = threading.Lock()
+_atexit_registered = False
+
+
+def get_audit_sink(log_file: str = DEFAULT_LOG_FILE) -> AuditSink:
+    """Return the shared sink for `log_file`, creating it on first use."""
+    global _atexit_registered
+    path = os.path.abspath(log_file)
+    sink = _sinks.get(path)
+    if sink is not None:
+        return sink
+    with _sinks_lock:
+        sink = _sinks.get(path)
+        if sink is None:
+            default = path == os.path.abspath(DEFAULT_LOG_FILE)
+            name = 'ethics_audit' if default else f'ethics_audit.sink{len(_sinks)}'
+            sink = _sinks[path] = AuditSink(path, name)
+            if not _atexit_registered:
+                atexit.register(shutdown_audit_logs)
+                _atexit_registered = True
+    return sink
+
+
+def flush_audit_logs(timeout: float = 10.0) -> bool:
+    """Wait for queued audit records in every log file to reach disk."""
+    return all([sink.flush(timeout) for sink in list(_sinks.values())])
+
+
+def shutdown_audit_logs(timeout: float = 10.0) -> bool:
+    """Drain and close every audit log (app shutdown). Sinks reopen on the next record."""
+    return all([sink.close(timeout) for sink in list(_sinks.values())])
+
+
 class EthicsLogger:
     """
     Maintains audit trail for all ethical decisions and safety events.
     Logs are persistent and human-readable.
-    """
 
-    def __init__(self, log_file='logs/ethics_audit.log'):
-        self.logger = logging.getLogger('ethics_audit')
-        self.logger.setLevel(logging.INFO)
+    Loggers for the same file share one AuditSink, so constructing an
+    EthicsLogger is cheap and never opens a file; events are written in
+    the background.
+    """
 
-        # JSON formatter for readable logs
-        logHandler = logging.FileHandler(log_file)
-        formatter = jsonlogger.JsonFormatter()
-        logHandler.setFormatter(formatter)
-        if not self.logger.hasHandlers():
-            self.logger.addHandler(logHandler)
+    def __init__(self, log_file=DEFAULT_LOG_FILE):
+        self.sink = get_audit_sink(log_file)
+        self.logger = self.sink.logger
 
     def log_crisis_detection(self, user_id: str, crisis_type: str, user_text_length: int):
         self.logger.info(
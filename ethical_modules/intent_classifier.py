@@ -0,0 +1,299 @@
+"""
+Local intent classifier for user messages: support, crisis (by type) or
+out of scope.
+
+Keyword rules miss paraphrases ("I don't want to wake up") and fire on
+phrases such as "what is" inside emotional sentences. This model scores
+the whole message instead. Features are hashed word n-grams: unigrams,
+their stems and stem bigrams with start/end markers, so "what is" at
+the start of a message is a different feature from "what is" in the
+middle. A linear softmax layer over 2**FEATURE_BITS buckets turns them
+into label probabilities.
+
+Scoring a message hashes its n-grams and sums a few weight rows, which
+takes microseconds on CPU. Batches are scored in one pass. The weights
+(float16, compressed .npz) are trained from intent_examples.tsv with
+the `train` command and loaded once per process by
+get_intent_classifier().
+
+Usage:
+    python -m ethical_modules.intent_classifier train
+    python -m ethical_modules.intent_classifier score "I don't want to wake up"
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ethical_modules.rule_engine import normalize
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+WEIGHTS_PATH = os.path.join(MODULE_DIR, "intent_weights.npz")
+EXAMPLES_PATH = os.path.join(MODULE_DIR, "intent_examples.tsv")
+FEATURE_BITS = 14
+WEIGHTS_VERSION = 1
+
+SUPPORT = "support"
+OUT_OF_SCOPE = "out_of_scope"
+CRISIS_PREFIX = "crisis."
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+@lru_cache(maxsize=1 << 16)
+def _stem(token: str) -> str:
+    """Strip a common inflection: "hurting", "hurts" and "hurt" share a stem."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            # "cutting" -> "cutt" -> "cut"
+            if len(token) > 3 and token[-1] == token[-2] and token[-1] not in "aeiouls":
+                token = token[:-1]
+            break
+    return token
+
+
+@lru_cache(maxsize=1 << 17)
+def _gram_hash(gram: str) -> int:
+    # crc32 rather than hash(): str hashes are salted per process
+    return zlib.crc32(gram.encode())
+
+
+def extract_features(text: str, dim: int) -> List[int]:
+    """De-duplicated hash buckets of the message's n-grams."""
+    tokens = _TOKEN.findall(normalize(text or ""))
+    stems = [_stem(t) for t in tokens]
+    grams = tokens + [s + "~" for s in stems]
+    padded = ["<s>"] + stems + ["</s>"]
+    grams += [f"{a} {b}" for a, b in zip(padded, padded[1:])]
+    mask = dim - 1
+    return list({_gram_hash(g) & mask for g in grams})
+
+
+def _sparse(texts: Sequence[str], dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The batch's features as (offsets, buckets): text i owns
+    buckets[offsets[i]:offsets[i + 1]]. Every text has at least the
+    start/end bigram, so no slice is empty (as np.add.reduceat needs).
+    """
+    offsets, cols = [], []
+    for text in texts:
+        offsets.append(len(cols))
+        cols.extend(extract_features(text, dim))
+    return np.asarray(offsets, dtype=np.intp), np.asarray(cols, dtype=np.intp)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    np.exp(logits, out=logits)
+    return logits / logits.sum(axis=1, keepdims=True)
+
+
+class IntentClassifier:
+    """
+    Linear model over hashed n-grams.
+
+    A message is a crisis when the crisis labels together reach
+    `crisis_threshold`; the most likely crisis label gives its type. A
+    missed crisis costs more than a false alarm, but a false alarm is not
+    free: "I bought a new car" answered with hotline numbers ends the
+    conversation. Without a keyword hit the model alone decides, so the
+    threshold sits well above the crisis mass of everyday statements
+    (the "support" examples include plenty of them) and below that of
+    real paraphrases.
+
+    Out of scope is the costly mistake the other way round (a person in
+    distress gets the canned off-topic reply), so it needs OUT_OF_SCOPE
+    ranked above SUPPORT and the crisis labels together below
+    `crisis_floor`. On top of that, OUT_OF_SCOPE must reach
+    `out_of_scope_threshold`, unless an out-of-scope keyword matched.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, labels: Sequence[str],
+                 crisis_threshold: float = 0.7, out_of_scope_threshold: float = 0.6,
+                 crisis_floor: float = 0.1):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.labels = list(labels)
+        self.dim = self.weights.shape[0]
+        self.crisis_threshold = crisis_threshold
+        self.out_of_scope_threshold = out_of_scope_threshold
+        self.crisis_floor = crisis_floor
+        self._crisis = np.array([label.startswith(CRISIS_PREFIX) for label in self.labels])
+        self._out_of_scope = self.labels.index(OUT_OF_SCOPE)
+        self._support = self.labels.index(SUPPORT)
+
+    @classmethod
+    def load(cls, path: str = WEIGHTS_PATH, **thresholds) -> "IntentClassifier":
+        with np.load(path) as data:
+            if int(data["version"]) != WEIGHTS_VERSION:
+                raise ValueError(f"{path}: unsupported weights version {int(data['version'])}")
+            return cls(data["weights"], data["bias"], [str(label) for label in data["labels"]], **thresholds)
+
+    def save(self, path: str = WEIGHTS_PATH):
+        # float16 halves the file; the trained weights are far from its limits
+        np.savez_compressed(path, version=WEIGHTS_VERSION, weights=self.weights.astype(np.float16),
+                            bias=self.bias, labels=np.array(self.labels))
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        """Label probabilities, one row per text, columns in `labels` order."""
+        if len(texts) == 1:
+            # A single message skips the scatter-add and the 2-D softmax
+            logits = self.weights.take(extract_features(texts[0], self.dim), axis=0).sum(axis=0) + self.bias
+            logits = np.exp(logits - logits.max())
+            return (logits / logits.sum())[None, :]
+        offsets, cols = _sparse(texts, self.dim)
+        return _softmax(np.add.reduceat(self.weights.take(cols, axis=0), offsets, axis=0) + self.bias)
+
+    def check_for_crisis_batch(self, texts: Sequence[str]) -> List[Tuple[bool, Optional[str]]]:
+        if not texts:
+            return []
+        probabilities = self.predict_proba(texts)
+        crisis = probabilities[:, self._crisis]
+        names = [label[len(CRISIS_PREFIX):] for label in np.array(self.labels)[self._crisis]]
+        return [(True, names[int(row.argmax())]) if row.sum() >= self.crisis_threshold else (False, None)
+                for row in crisis]
+
+    def check_for_crisis(self, text: str) -> Tuple[bool, Optional[str]]:
+        """Same contract as EthicalSafetyChecker.check_for_crisis: (is_crisis, crisis_type or None)."""
+        return self.check_for_crisis_batch([text])[0]
+
+    def is_out_of_scope_batch(self, texts: Sequence[str],
+                              keyword_hits: Optional[Sequence[bool]] = None) -> List[bool]:
+        """`keyword_hits[i]`: whether an out-of-scope keyword matched texts[i]."""
+        if not texts:
+            return []
+        probabilities = self.predict_proba(texts)
+        crisis = probabilities[:, self._crisis].sum(axis=1)
+        support = probabilities[:, self._support]
+        out_of_scope = probabilities[:, self._out_of_scope]
+        keyword_hits = keyword_hits or [False] * len(texts)
+        return [bool(c < self.crisis_floor and o > s and (hit or o >= self.out_of_scope_threshold))
+                for c, s, o, hit in zip(crisis, support, out_of_scope, keyword_hits)]
+
+    def is_out_of_scope(self, text: str, keyword_hit: bool = False) -> bool:
+        return self.is_out_of_scope_batch([text], [keyword_hit])[0]
+
+
+def load_examples(path: str = EXAMPLES_PATH) -> List[Tuple[str, str]]:
+    """(label, text) pairs from a TSV file; blank lines and # comments are skipped."""
+    examples = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            label, text = line.split("\t", 1)
+            examples.append((label, text))
+    return examples
+
+
+def train(examples: Sequence[Tuple[str, str]], bits: int = FEATURE_BITS, epochs: int = 400,
+          learning_rate: float = 0.5, l2: float = 1e-4) -> IntentClassifier:
+    """
+    Fit the softmax layer with full-batch Adam, classes weighted to
+    balance the examples. Deterministic: the same examples always give
+    the same weights.
+    """
+    labels = sorted({label for label, _ in examples})
+    dim = 1 << bits
+    offsets, cols = _sparse([text for _, text in examples], dim)
+    rows = np.repeat(np.arange(len(examples)), np.diff(offsets, append=len(cols)))
+    targets = np.zeros((len(examples), len(labels)))
+    targets[np.arange(len(examples)), [labels.index(label) for label, _ in examples]] = 1.0
+    counts = targets.sum(axis=0)
+    sample_weight = (targets @ (len(examples) / (len(labels) * counts)))[:, None] / len(examples)
+
+    params = [np.zeros((dim, len(labels))), np.zeros(len(labels))]
+    moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+    beta1, beta2 = 0.9, 0.999
+    for step in range(1, epochs + 1):
+        rate = learning_rate / (1 + step / 100)
+        weights, bias = params
+        logits = np.add.reduceat(weights.take(cols, axis=0), offsets, axis=0) + bias
+        error = (_softmax(logits) - targets) * sample_weight
+        grad_weights = l2 * weights
+        np.add.at(grad_weights, cols, error[rows])
+        for param, grad, (m, v) in zip(params, (grad_weights, error.sum(axis=0)), moments):
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad * grad
+            param -= rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + 1e-8)
+    return IntentClassifier(params[0], params[1], labels)
+
+
+_classifier = None
+_classifier_loaded = False
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """
+    Return the process-wide classifier, loading the weights on first use.
+    None when disabled (REFLECTAI_INTENT_CLASSIFIER=0) or the weights
+    cannot be loaded; callers then fall back to the keyword rules.
+    """
+    global _classifier, _classifier_loaded
+    if not _classifier_loaded:
+        with _classifier_lock:
+            if not _classifier_loaded:
+                if os.getenv("REFLECTAI_INTENT_CLASSIFIER", "1") == "1":
+                    path = os.getenv("REFLECTAI_INTENT_WEIGHTS", WEIGHTS_PATH)
+                    try:
+                        _classifier = IntentClassifier.load(
+                            path,
+                            crisis_threshold=float(os.getenv("REFLECTAI_CRISIS_THRESHOLD", "0.7")),
+                            out_of_scope_threshold=float(os.getenv("REFLECTAI_OUT_OF_SCOPE_THRESHOLD", "0.6")),
+                            crisis_floor=float(os.getenv("REFLECTAI_OUT_OF_SCOPE_CRISIS_FLOOR", "0.1")),
+                        )
+                    except (OSError, KeyError, ValueError) as exc:
+                        print(f"Intent classifier unavailable, using keyword rules only: {exc}")
+                _classifier_loaded = True
+    return _classifier
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or try the local intent classifier.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fit = sub.add_parser("train", help="train on the examples file and write the weights")
+    fit.add_argument("--examples", default=EXAMPLES_PATH, help="TSV of <label>TAB<text> lines")
+    fit.add_argument("--output", default=WEIGHTS_PATH, help="weights file to write")
+    fit.add_argument("--bits", type=int, default=FEATURE_BITS, help="log2 of the number of hash buckets")
+    fit.add_argument("--epochs", type=int, default=400)
+
+    score = sub.add_parser("score", help="print label probabilities for each message")
+    score.add_argument("--weights", default=WEIGHTS_PATH)
+    score.add_argument("texts", nargs="+")
+
+    args = parser.parse_args(argv)
+    if args.command == "train":
+        examples = load_examples(args.examples)
+        started = time.perf_counter()
+        model = train(examples, bits=args.bits, epochs=args.epochs)
+        model.save(args.output)
+        model = IntentClassifier.load(args.output)
+        predicted = model.predict_proba([text for _, text in examples]).argmax(axis=1)
+        correct = sum(model.labels[p] == label for p, (label, _) in zip(predicted, examples))
+        print(f"{len(examples)} examples, {len(model.labels)} labels, trained in "
+              f"{time.perf_counter() - started:.2f}s; training accuracy {correct / len(examples):.3f}; "
+              f"{os.path.getsize(args.output) / 1024:.1f} KiB written to {args.output}")
+        return 0
+
+    model = IntentClassifier.load(args.weights)
+    for text, row in zip(args.texts, model.predict_proba(args.texts)):
+        ranked = sorted(zip(model.labels, row), key=lambda item: -item[1])
+        print(f"{text!r}: " + ", ".join(f"{label} {p:.2f}" for label, p in ranked[:3]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import threading
+from collections import deque
+from typing import Dict, Iterable, List
+
+# Typographic quotes are folded to ASCII so "it’s" matches "it's"
+_NORMALIZE_TABLE = str.maketrans({"’": "'", "‘": "'", "“": '"', "”": '"'})
+
+
+def normalize(text: str) -> str:
+    """Normalize text once before matching: lowercase and fold typographic quotes."""
+    return text.lower().translate(_NORMALIZE_TABLE)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class RuleHits:
+    """
+    Result of one scan: the phrases matched per category, in order of
+    first occurrence.
+    """
+
+    def __init__(self, matches: Dict[str, List[str]]):
+        self.matches = matches
+
+    def __contains__(self, category: str) -> bool:
+        return category in self.matches
+
+    def any(self, *categories: str) -> bool:
+        return any(c in self.matches for c in categories)
+
+    def phrases(self, category: str) -> List[str]:
+        return self.matches.get(category, [])
+
+    def __repr__(self):
+        return f"RuleHits({self.matches!r})"
+
+
+class RuleEngine:
+    """
+    Compiles every keyword list into a single Aho-Corasick automaton.
+    One pass over the normalized text reports every category hit, and the
+    cost of a scan depends on the text length rather than on how many
+    phrases are registered.
+
+    Matching is word-boundary aware. With whole_word=True a phrase must
+    start and end on a word boundary ("man" does not match "many" or
+    "human"). With whole_word=False it only has to start on one, so
+    inflections still match ("stress" matches "stressed" but not
+    "distress").
+    """
+
+    def __init__(self):
+        self._rules: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._compiled = None
+
+    def register(self, category: str, phrases: Iterable[str], whole_word: bool = True):
+        """Add (or replace) a category. The automaton is rebuilt on the next scan."""
+        with self._lock:
+            self._rules[category] = (tuple(normalize(p) for p in phrases if p), whole_word)
+            self._compiled = None
+
+    def categories(self) -> List[str]:
+        return list(self._rules)
+
+    @property
+    def max_phrase_length(self) -> int:
+        return max((len(p) for phrases, _ in self._rules.values() for p in phrases), default=0)
+
+    def compile(self):
+        with self._lock:
+            if self._compiled is None:
+                self._compiled = self._build()
+            return self._compiled
+
+    def _build(self):
+        goto = [{}]
+        outputs = [[]]
+        for category, (phrases, whole_word) in self._rules.items():
+            for phrase in phrases:
+                node = 0
+                for ch in phrase:
+                    nxt = goto[node].get(ch)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[node][ch] = nxt
+                        goto.append({})
+                        outputs.append([])
+                    node = nxt
+                outputs[node].append((category, phrase, len(phrase), whole_word))
+
+        # Breadth-first pass for failure links; each node inherits the
+        # outputs of its failure target so suffix matches are reported.
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[child] = target if target != child else 0
+                outputs[child] = outputs[child] + outputs[fail[child]]
+        return goto, fail, outputs
+
+    def scan(self, text: str) -> RuleHits:
+        goto, fail, outputs = self.compile()
+        text = normalize(text or "")
+        size = len(text)
+        matches: Dict[str, List[str]] = {}
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if not outputs[node]:
+                continue
+            for category, phrase, length, whole_word in outputs[node]:
+                start = i - length + 1
+                if start > 0 and _is_word_char(phrase[0]) and _is_word_char(text[start - 1]):
+                    continue
+                if whole_word and i + 1 < size and _is_word_char(phrase[-1]) and _is_word_char(text[i + 1]):
+                    continue
+                found = matches.setdefault(category, [])
+                if phrase not in found:
+                    found.append(phrase)
+        return RuleHits(matches)
+
+
+# Process-wide rule engine; modules register their keyword lists at import
+RULES = RuleEngine()
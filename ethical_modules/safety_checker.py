@@ -1,6 +1,8 @@
 import json
 from datetime import datetime
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List, Optional
+
+from ethical_modules.rule_engine import RULES, RuleHits
 
 class EthicalSafetyChecker:
     """
@@ -15,67 +17,101 @@ class EthicalSafetyChecker:
         'overdose': ['overdose', 'pills', 'poison', 'toxins']
     }
 
-    def check_for_crisis(self, text: str) -> Tuple[bool, str]:
+    def check_for_crisis(self, text: str, hits: Optional[RuleHits] = None) -> Tuple[bool, str]:
         """
         Detect crisis indicators in user text.
         Returns (is_crisis: True/False, crisis_type: str or None)
+        Pass `hits` from an earlier RULES.scan(text) to skip rescanning.
+        Keywords decide first; the intent classifier then catches
+        paraphrases they miss ("I don't want to wake up").
         """
-        text_lower = text.lower()
-        for crisis_type, keywords in self.CRISIS_KEYWORDS.items():
-            if any(keyword in text_lower for keyword in keywords):
+        hits = hits or RULES.scan(text)
+        for crisis_type in self.CRISIS_KEYWORDS:
+            if f'crisis.{crisis_type}' in hits:
                 return True, crisis_type
+        # Imported here so numpy and the weights load on first use, not at import
+        from ethical_modules.intent_classifier import get_intent_classifier
+        classifier = get_intent_classifier()
+        if classifier is not None:
+            return classifier.check_for_crisis(text)
         return False, None
 
-    def validate_response(self, response: str, user_input: str) -> Dict:
+    # Phrase rules for AI responses, checked by validate_response and,
+    # incrementally, by the streaming guard
+    DECEPTIVE_PHRASES = [
+        "i truly understand your pain",
+        "i can feel what you're feeling",
+        "i know exactly how you feel",
+        "i've experienced this too"
+    ]
+    DIAGNOSTIC_PHRASES = [
+        "you have depression",
+        "you have anxiety",
+        "you're bipolar",
+        "you have ptsd",
+        "you need medication",
+        "depression",
+        "medication"
+    ]
+    DISMISSIVE_PHRASES = [
+        "just think positive",
+        "just get over it",
+        "others have it worse",
+        "it's not that bad"
+    ]
+
+    def find_phrase_violations(self, response: str, hits: Optional[RuleHits] = None) -> List[str]:
         """
-        Check if an AI response meets ethical standards.
-        Returns a dict: is_ethical, issues, severity
+        Run the phrase rules (deceptive empathy, diagnosis, dismissiveness)
+        over a response or a fragment of one. Returns the list of issues.
         """
+        hits = hits or RULES.scan(response)
         issues = []
-        severity = 'low'
 
         # RULE 1: No deceptive empathy
-        deceptive_phrases = [
-            "i truly understand your pain",
-            "i can feel what you're feeling",
-            "i know exactly how you feel",
-            "i've experienced this too"
-        ]
-        if any(phrase in response.lower() for phrase in deceptive_phrases):
+        if 'response.deceptive' in hits:
             issues.append("ETHICAL_VIOLATION: Deceptive empathy detected")
-            severity = 'high'
 
         # RULE 2: No diagnosis
-        diagnostic_phrases = [
-            "you have depression",
-            "you have anxiety",
-            "you're bipolar",
-            "you have ptsd",
-            "you need medication"
-        ]
-        if any(phrase in response.lower() for phrase in diagnostic_phrases) or "depression" in response.lower() or "medication" in response.lower():
+        if 'response.diagnostic' in hits:
             issues.append("ETHICAL_VIOLATION: Attempting to diagnose condition")
-            severity = 'high'
-
-        # RULE 3: Responding to crisis
-        if self.check_for_crisis(user_input)[0]:
-            if "professional" not in response.lower() or "988" not in response:
-                issues.append("ETHICAL_VIOLATION: Not properly escalating crisis")
-                severity = 'high'
 
         # RULE 4: No dismissiveness
-        dismissive_phrases = [
-            "just think positive",
-            "just get over it",
-            "others have it worse",
-            "it's not that bad"
-        ]
-        if any(phrase in response.lower() for phrase in dismissive_phrases):
+        if 'response.dismissive' in hits:
             issues.append("ETHICAL_VIOLATION: Dismissive response detected")
-            severity = 'high'
 
+        return issues
+
+    def validate_response(self, response: str, user_input: str,
+                          hits: Optional[RuleHits] = None,
+                          input_hits: Optional[RuleHits] = None) -> Dict:
+        """
+        Check if an AI response meets ethical standards.
+        Returns a dict: is_ethical, issues, severity
+        `hits`/`input_hits` are optional scans of response/user_input.
+        """
+        hits = hits or RULES.scan(response)
+        issues = self.find_phrase_violations(response, hits=hits)
+
+        # RULE 3: Responding to crisis
+        if self.check_for_crisis(user_input, hits=input_hits)[0]:
+            if not hits.any('response.professional') or not hits.any('response.hotline'):
+                issues.append("ETHICAL_VIOLATION: Not properly escalating crisis")
+
+        severity = 'high' if issues else 'low'
         return {
             'is_ethical': severity != 'high',
             'issues': issues,
             'severity': severity
         }
+
+
+# Crisis and response phrases match on a word start, so inflections such as
+# "abused" or "medications" are still caught.
+for _crisis_type, _keywords in EthicalSafetyChecker.CRISIS_KEYWORDS.items():
+    RULES.register(f'crisis.{_crisis_type}', _keywords, whole_word=False)
+RULES.register('response.deceptive', EthicalSafetyChecker.DECEPTIVE_PHRASES, whole_word=False)
+RULES.register('response.diagnostic', EthicalSafetyChecker.DIAGNOSTIC_PHRASES, whole_word=False)
+RULES.register('response.dismissive', EthicalSafetyChecker.DISMISSIVE_PHRASES, whole_word=False)
+RULES.register('response.professional', ['professional'], whole_word=False)
+RULES.register('response.hotline', ['988'], whole_word=False)
@@ -0,0 +1,76 @@
+from typing import Optional, Tuple
+
+from ethical_modules.rule_engine import RULES, _is_word_char
+
+
+class StreamGuard:
+    """
+    Applies the safety and bias phrase rules to a response while it streams.
+    Each chunk is checked before it is released; only the new text plus a
+    short overlap with the previous chunk is rescanned, so the cost per
+    chunk stays proportional to the chunk size.
+
+    A chunk can end mid-word ("Talk to your man" + "ager"), and the rule
+    engine treats the end of its input as a word boundary. So the scan
+    stops at the last non-word character and the partial word waits for
+    the next chunk, or for finish() once the stream has ended.
+    """
+
+    def __init__(self, safety_checker, bias_detector):
+        self.safety_checker = safety_checker
+        self.bias_detector = bias_detector
+        self.text = ""
+        self.scanned = 0
+        self.groups = set()
+        # A phrase split across chunks is still inside the rescanned window
+        self.overlap = RULES.max_phrase_length
+
+    def _window(self, end: int) -> str:
+        start = max(0, self.scanned - self.overlap)
+        # Back up to a word start so the window never begins mid-word
+        while start > 0 and not self.text[start - 1].isspace():
+            start -= 1
+        return self.text[start:end]
+
+    def _settled(self) -> int:
+        """End of the text up to the last word boundary; what follows may be a partial word."""
+        end = len(self.text)
+        while end > self.scanned and _is_word_char(self.text[end - 1]):
+            end -= 1
+        return end
+
+    def feed(self, chunk: str) -> Optional[Tuple[str, str]]:
+        """
+        Add a chunk to the buffer and check it.
+        Returns None when the text so far is acceptable, otherwise
+        ('ethics', issue) or ('bias', issue) for the first rule that tripped.
+        """
+        self.text += chunk
+        return self._check(self._settled())
+
+    def finish(self) -> Optional[Tuple[str, str]]:
+        """Check the trailing word held back by feed(). Call once the stream has ended."""
+        return self._check(len(self.text))
+
+    def _check(self, end: int) -> Optional[Tuple[str, str]]:
+        if end <= self.scanned:
+            return None
+        window = self._window(end)
+        self.scanned = end
+
+        # One pass over the window serves every rule below
+        hits = RULES.scan(window)
+
+        issues = self.safety_checker.find_phrase_violations(window, hits=hits)
+        if issues:
+            return 'ethics', issues[0]
+
+        self.groups |= self.bias_detector.term_groups(window, hits=hits)
+        gender = self.bias_detector.gender_bias_from_groups(self.groups)
+        if gender['biased']:
+            return 'bias', gender['issue']
+
+        cultural = self.bias_detector.check_cultural_sensitivity(window, hits=hits)
+        if not cultural['culturally_sensitive']:
+            return 'bias', cultural['issues'][0]
+        return None
@@ -1,9 +1,19 @@
+import asyncio
 import os
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
-from core.therapy_engine_groq import TherapyEngine
+from core.admission import AdmissionRejected
+from core.therapy_engine_groq import TherapyEngine, get_engine_core
+from core.chat_memory import shutdown_conversation_writer
+from core.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, render_metrics
+from core.warmup import engine_warmup
+from core.health import start_dependency_probes
+from ethical_modules.ethics_logger import shutdown_audit_logs
+from core.streaming import format_sse
 
 
 class ChatRequest(BaseModel):
@@ -15,7 +25,29 @@ class ChatResponse(BaseModel):
     response: str
 
 
-app = FastAPI(title="ReflectAI API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the shared engine components once, before the first request
+    app.state.engine_core = get_engine_core()
+    # Open the LLM and storage pools and prime caches in the background;
+    # /healthz answers at once, /readyz once this is done
+    app.state.warmup = engine_warmup(app.state.engine_core)
+    REGISTRY.register_collector("reflectai_warmup", app.state.warmup.metrics, "Start-up warm-up progress.")
+    warming = asyncio.create_task(app.state.warmup.arun())
+    # Keep probing the LLM and store so requests skip a dependency that is down
+    app.state.health = start_dependency_probes(app.state.engine_core)
+    yield
+    warming.cancel()
+    app.state.health.stop()
+    # Persist buffered conversation rows before the process exits
+    shutdown_conversation_writer()
+    # Drain queued audit events to disk
+    shutdown_audit_logs()
+    # Close pooled LLM connections
+    await app.state.engine_core.llm.aclose()
+
+
+app = FastAPI(title="ReflectAI API", version="1.0.0", lifespan=lifespan)
 
 # Allow CORS for local dev and simple deployments
 app.add_middleware(
@@ -27,29 +59,83 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    # Rate limited (429) or shed under load (503); nothing was stored, so clients may retry
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+
 @app.get("/healthz")
 def healthz():
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+def readyz(request: Request):
+    # 503 until warm-up is done, so load balancers keep first users off a cold instance
+    warmup = getattr(request.app.state, "warmup", None)
+    if warmup is None:
+        return JSONResponse({"status": "pending"}, status_code=503)
+    return JSONResponse(warmup.snapshot(), status_code=200 if warmup.ready else 503)
+
+
+@app.get("/healthz/details")
+def healthz_details(request: Request):
+    # Cached probe results per dependency; always 200, /healthz stays the liveness check
+    health = getattr(request.app.state, "health", None)
+    if health is None:
+        return {"status": "unknown", "dependencies": {}}
+    return health.snapshot()
+
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format: per-stage timings, outcomes, cache/writer stats
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     if not req.message or not req.user_id:
         raise HTTPException(status_code=400, detail="user_id and message are required")
 
     try:
-        engine = TherapyEngine(req.user_id)
-        reply = engine.process(req.message)
+        engine = TherapyEngine(req.user_id, core=get_engine_core())
+        reply = await engine.process_async(req.message)
         if not isinstance(reply, str) or not reply:
             raise ValueError("Empty response from engine")
         return ChatResponse(response=reply)
-    except HTTPException:
+    except (HTTPException, AdmissionRejected):
         raise
     except Exception as exc:
         # Surface a generic error while logging specifics inside the engine
         raise HTTPException(status_code=500, detail=f"Failed to process message: {exc}")
 
 
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    if not req.message or not req.user_id:
+        raise HTTPException(status_code=400, detail="user_id and message are required")
+
+    engine = TherapyEngine(req.user_id, core=get_engine_core())
+    stream = engine.process_stream_async(req.message)
+    # Admission checks run before the first event; a rejection raised here
+    # becomes a 429/503 instead of a broken 200 stream
+    first = await stream.__anext__()
+
+    async def events():
+        yield format_sse(first)
+        async for event in stream:
+            yield format_sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
     # Local dev runner: uvicorn fastapi_app:app --host 0.0.0.0 --port 8765
     import uvicorn
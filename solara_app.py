@@ -1,12 +1,23 @@
 import solara
-import requests
+import httpx
 import os
-import uuid
-from typing import List, Dict, Optional
+import time
+from typing import Dict, Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from solara.lab import task
+from solara.server import kernel_context
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from core.therapy_engine_groq import TherapyEngine
+from core.admission import AdmissionRejected
+from core.backend_client import BackendClient
+from core.chat_memory import load_conversation_page
+from core.chat_sessions import ChatSession, SessionRegistry
+from core.therapy_engine_groq import TherapyEngine, get_engine_core
+from core.streaming import format_sse, iter_sse
+from core.warmup import engine_warmup
+from core.health import HEALTH, start_dependency_probes
+from core.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, render_metrics
 
 # Mount FastAPI endpoints into the same Solara server process
 try:
@@ -27,6 +38,15 @@ elif _render_base:
     FASTAPI_CHAT_URL = _render_base.rstrip("/") + "/chat"
 else:
     FASTAPI_CHAT_URL = f"http://127.0.0.1:{_port}/chat"
+FASTAPI_STREAM_URL = os.environ.get("FASTAPI_STREAM_URL") or FASTAPI_CHAT_URL.rstrip("/") + "/stream"
+# Stream partial replies into the chat (0: show each reply once complete)
+UI_STREAMING = os.environ.get("REFLECTAI_UI_STREAMING", "1") == "1"
+# Partial text is pushed to the browser at most this often, in seconds
+UI_STREAM_INTERVAL = float(os.environ.get("REFLECTAI_UI_STREAM_INTERVAL", "0.05"))
+# Messages rendered at once; older ones load on demand
+UI_RENDER_WINDOW = int(os.environ.get("REFLECTAI_UI_RENDER_WINDOW", "50"))
+# Pooled keep-alive client shared by every session (external backend mode)
+backend_client = BackendClient(FASTAPI_CHAT_URL, FASTAPI_STREAM_URL)
 
 # --- Embedded FastAPI routes ---
 class ChatRequest(BaseModel):
@@ -36,80 +56,255 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
 
+@fastapi_app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
 @fastapi_app.get("/healthz")
 def healthz():
     return {"status": "ok"}
 
+@fastapi_app.get("/readyz")
+def readyz():
+    return JSONResponse(warmup.snapshot(), status_code=200 if warmup.ready else 503)
+
+# Solara registers its own always-ok /readyz first; this one must match first
+fastapi_app.router.routes.insert(0, fastapi_app.router.routes.pop())
+
+@fastapi_app.get("/healthz/details")
+def healthz_details():
+    return HEALTH.snapshot()
+
+# Ahead of Solara's catch-all page route
+fastapi_app.router.routes.insert(0, fastapi_app.router.routes.pop())
+
+@fastapi_app.get("/metrics")
+def metrics():
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 @fastapi_app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     if not req.message or not req.user_id:
         raise HTTPException(status_code=400, detail="user_id and message are required")
     try:
-        engine = TherapyEngine(req.user_id)
-        reply = engine.process(req.message)
+        engine = TherapyEngine(req.user_id, core=get_engine_core())
+        reply = await engine.process_async(req.message)
         if not isinstance(reply, str) or not reply:
             raise ValueError("Empty response from engine")
         return ChatResponse(response=reply)
-    except HTTPException:
+    except (HTTPException, AdmissionRejected):
         raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Failed to process message: {exc}")
 
+@fastapi_app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    if not req.message or not req.user_id:
+        raise HTTPException(status_code=400, detail="user_id and message are required")
+    engine = TherapyEngine(req.user_id, core=get_engine_core())
+    stream = engine.process_stream_async(req.message)
+    # Surface admission rejections as 429/503 before the stream starts
+    first = await stream.__anext__()
+
+    async def events():
+        yield format_sse(first)
+        async for event in stream:
+            yield format_sse(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Solara has no startup hook for app code: warm the shared clients from a
+# background thread as soon as the app module is loaded
+warmup = engine_warmup(get_engine_core(), asynchronous=False)
+REGISTRY.register_collector("reflectai_warmup", warmup.metrics, "Start-up warm-up progress.")
+warmup.start()
+start_dependency_probes(get_engine_core())
+
 # --- STATE MANAGEMENT ---
 class AppState:
     """Manages the application's global state using reactive variables."""
     is_authenticated: solara.Reactive[bool] = solara.Reactive(False)
     username: solara.Reactive[Optional[str]] = solara.Reactive(None)
     show_login_modal: solara.Reactive[bool] = solara.Reactive(True)
-    session_id: solara.Reactive[str] = solara.Reactive(str(uuid.uuid4()))
-    messages: solara.Reactive[List[Dict[str, str]]] = solara.Reactive([])
-    loading: solara.Reactive[bool] = solara.Reactive(False)
+    # Bumped whenever the chat transcript changes, and on a new conversation
+    revision: solara.Reactive[int] = solara.Reactive(0)
+    conversation: solara.Reactive[int] = solara.Reactive(0)
+    # How many of the newest messages are rendered
+    visible: solara.Reactive[int] = solara.Reactive(UI_RENDER_WINDOW)
     user_input: solara.Reactive[str] = solara.Reactive("")
     current_view: solara.Reactive[str] = solara.Reactive("chat")
 
 state = AppState()
 
+def _greet(session: ChatSession):
+    session.transcript.append("assistant", get_initial_greeting())
+
+# Chat sessions live outside the reactive state so messages can be
+# appended in place; each browser connection (virtual kernel) has one
+sessions = SessionRegistry(on_create=_greet)
+REGISTRY.register_collector("reflectai_ui_sessions", sessions.snapshot,
+                            "Solara chat sessions held in memory.")
+
+def connection_key() -> str:
+    return kernel_context.get_current_context().id
+
+def current_session() -> ChatSession:
+    return sessions.get(connection_key())
+
+def refresh():
+    """Re-render the chat after the transcript changed."""
+    state.revision.value += 1
+
 # --- UTILITY FUNCTIONS ---
 def get_initial_greeting():
     return "Hello there. I'm ReflectAI, your digital wellness companion. I'm here to listen without judgment. How are you genuinely feeling today, and what's on your mind?"
 
 def start_new_session():
-    state.messages.value = []
-    state.session_id.value = str(uuid.uuid4())
-    greeting = get_initial_greeting()
-    state.messages.value = [{"role": "assistant", "content": greeting}]
-
-if not state.messages.value:
-    start_new_session()
+    # A reply still running belongs to the old session
+    if chat_task.pending:
+        chat_task.cancel()
+    sessions.reset(connection_key())
+    state.visible.value = UI_RENDER_WINDOW
+    state.conversation.value += 1
+    refresh()
 
 # --- CHAT LOGIC ---
+def add_message(session: ChatSession, role: str, content: str):
+    session.transcript.append(role, content)
+    refresh()
+
+def render_stream(events, session: ChatSession, is_current=lambda: True) -> bool:
+    """
+    Grow the last assistant bubble as stream events arrive. Partial text
+    reaches the browser at most every UI_STREAM_INTERVAL seconds; the
+    final reply always does. Stops and closes the stream once
+    is_current() turns False. Returns True if the stream completed.
+    """
+    started = False
+    partial = ""
+    last_flush = 0.0
+    try:
+        for event in events:
+            if not is_current():
+                return False
+            if event["type"] == "delta":
+                partial += event["text"]
+                if time.monotonic() - last_flush < UI_STREAM_INTERVAL:
+                    continue
+            elif event["type"] == "done":
+                # The final reply replaces any partial text (e.g. a blocked stream)
+                partial = event["response"] or "Error: Received empty response from the AI."
+            else:
+                continue
+            if started:
+                session.transcript.replace_last(partial)
+            else:
+                session.transcript.append("assistant", partial)
+                started = True
+            refresh()
+            last_flush = time.monotonic()
+    finally:
+        close = getattr(events, "close", None)
+        if close is not None:
+            close()
+    return True
+
+def busy_detail(response: httpx.Response) -> Optional[str]:
+    """The API's explanation for a 429/503 (rate limited or shed under load), else None."""
+    if response.status_code not in (429, 503):
+        return None
+    response.read()
+    return response.json().get("detail", "The assistant is busy. Please try again shortly.")
+
+@task
+def chat_task(session: ChatSession, input_text: str):
+    """
+    Answer one message on a worker thread, so the UI stays responsive
+    and the typing indicator renders while the LLM is working. Cancelling
+    the task (Stop button, new session) ends the stream at the next chunk;
+    a stale task never writes to the chat.
+    """
+    with sessions.working(session):
+        answer(session, input_text, chat_task.is_current)
+
+def answer(session: ChatSession, input_text: str, is_current):
+    user_id = session.session_id
+    try:
+        if USE_INTERNAL_BACKEND == "1":
+            engine = TherapyEngine(user_id, core=get_engine_core())
+            if UI_STREAMING:
+                render_stream(engine.process_stream(input_text), session, is_current)
+            else:
+                reply = engine.process(input_text)
+                if is_current():
+                    add_message(session, "assistant", reply)
+        elif UI_STREAMING:
+            with backend_client.stream_chat(user_id, input_text) as response:
+                detail = busy_detail(response)
+                if detail:
+                    add_message(session, "system", f"⚠️ {detail}")
+                    return
+                response.raise_for_status()
+                render_stream(iter_sse(response.iter_lines()), session, is_current)
+        else:
+            response = backend_client.chat(user_id, input_text)
+            detail = busy_detail(response)
+            if not detail:
+                response.raise_for_status()
+            if not is_current():
+                return
+            if detail:
+                add_message(session, "system", f"⚠️ {detail}")
+            else:
+                add_message(session, "assistant", response.json()["response"])
+    except AdmissionRejected as e:
+        # Rate limited or shed under load (internal backend)
+        if is_current():
+            add_message(session, "system", f"⚠️ {e}")
+    except httpx.HTTPError as e:
+        if is_current():
+            add_message(session, "system", f"⚠️ Connection error: {str(e)}")
+    except Exception as e:
+        if is_current():
+            add_message(session, "system", f"⚠️ Error: {e}")
+
 def process_message():
     input_text = state.user_input.value.strip()
-    if not input_text or state.loading.value:
+    if not input_text or chat_task.pending:
         return
 
-    state.messages.value = state.messages.value + [{"role": "user", "content": input_text}]
+    session = current_session()
+    add_message(session, "user", input_text)
     state.user_input.value = ""
-    state.loading.value = True
+    chat_task(session, input_text)
 
+def load_earlier_messages():
+    """Page older messages of this conversation back in from storage."""
+    session = current_session()
+    transcript = session.transcript
+    if transcript.cursor is None:
+        return
+    # Read in-process even with an external backend: history is not served
+    # over HTTP, since the API has no authentication to scope it to a user
     try:
-        if USE_INTERNAL_BACKEND == "1":
-            engine = TherapyEngine(state.session_id.value)
-            ai_response = engine.process(input_text)
-            state.messages.value = state.messages.value + [{"role": "assistant", "content": ai_response}]
-        else:
-            payload = {"user_id": state.session_id.value, "message": input_text}
-            response = requests.post(FASTAPI_CHAT_URL, json=payload, timeout=20)
-            response.raise_for_status()
-            ai_response = response.json().get("response", "Error: Received empty response from the AI.")
-            state.messages.value = state.messages.value + [{"role": "assistant", "content": ai_response}]
-    except requests.exceptions.RequestException as e:
-        error_msg = f"⚠️ Connection error: {str(e)}"
-        state.messages.value = state.messages.value + [{"role": "system", "content": error_msg}]
+        rows, cursor = load_conversation_page(session.session_id, UI_RENDER_WINDOW, transcript.cursor)
     except Exception as e:
-        state.messages.value = state.messages.value + [{"role": "system", "content": f"⚠️ Error: {e}"}]
-    finally:
-        state.loading.value = False
+        add_message(session, "system", f"⚠️ Could not load earlier messages: {e}")
+        return
+    transcript.prepend(rows, cursor)
+    state.visible.value += len(rows)
+    refresh()
+
+def stop_message():
+    """Cancel the reply in progress; any partial text stays in the chat."""
+    if chat_task.pending:
+        chat_task.cancel()
+        add_message(current_session(), "system", "⏹️ Stopped.")
 
 # --- UI COMPONENTS ---
 @solara.component
@@ -207,6 +402,13 @@ def ChatInterface():
     
     # Auto-scroll effect
     scroll_ref = solara.use_ref(None)
+    loading = chat_task.pending
+    state.revision.value  # re-render when the transcript changes
+    transcript = current_session().transcript
+    # Only the newest messages are rendered; each bubble is keyed by its
+    # index, so unchanged bubbles are skipped when a message is added
+    window = transcript.window(state.visible.value)
+    earlier = len(transcript.messages) - len(window)
     
     # Chat Display Area
     with solara.Card(
@@ -222,10 +424,17 @@ def ChatInterface():
         }
     ):
         with solara.Column(align="stretch", gap="8px"):
-            for idx, msg in enumerate(state.messages.value):
-                ChatBubble(msg, idx)
+            if earlier:
+                solara.Button(f"Show {min(earlier, UI_RENDER_WINDOW)} earlier messages", text=True,
+                              on_click=lambda: state.visible.set(state.visible.value + UI_RENDER_WINDOW))
+            elif transcript.cursor is not None:
+                # Older messages are only in storage; fetch them a page at a time
+                solara.Button("Load earlier messages", text=True, on_click=load_earlier_messages)
+            for idx, msg in window:
+                ChatBubble(msg, idx).key(f"message-{idx}")
             
-            if state.loading.value:
+            # Until the first streamed text arrives
+            if loading and transcript.last["role"] == "user":
                 TypingIndicator()
     
     # Input Area with Enter key support
@@ -239,6 +448,8 @@ def ChatInterface():
             "border": "1px solid #E2E8F0",
         }
     ):
+        # Indeterminate progress while a reply is being generated
+        solara.ProgressLinear(loading)
         with solara.Row(style={"align-items": "center", "gap": "12px"}):
             # Input Field
             with solara.Column(style={"flex": "1"}):
@@ -247,7 +458,6 @@ def ChatInterface():
                     value=state.user_input,
                     on_value=state.user_input.set,
                     placeholder="Type your message here... (Click Send button)",
-                    disabled=state.loading.value,
                     continuous_update=True,
                     style={
                         "width": "100%",
@@ -259,20 +469,19 @@ def ChatInterface():
                     }
                 )
             
-            # Send Button
+            # Send Button, or Stop while a reply is in progress
             solara.Button(
-                label="Send ➤" if not state.loading.value else "Sending...",
-                on_click=process_message,
-                disabled=state.loading.value,
+                label="Stop ■" if loading else "Send ➤",
+                on_click=stop_message if loading else process_message,
                 style={
-                    "background": "linear-gradient(135deg, #4FD1C5 0%, #38B2AC 100%)" if not state.loading.value else "#CBD5E0",
+                    "background": "#E53E3E" if loading else "linear-gradient(135deg, #4FD1C5 0%, #38B2AC 100%)",
                     "color": "white",
                     "border": "none",
                     "border-radius": "12px",
                     "padding": "12px 28px",
                     "font-weight": "600",
-                    "cursor": "pointer" if not state.loading.value else "not-allowed",
-                    "box-shadow": "0 4px 12px rgba(79, 209, 197, 0.3)" if not state.loading.value else "none",
+                    "cursor": "pointer",
+                    "box-shadow": "none" if loading else "0 4px 12px rgba(79, 209, 197, 0.3)",
                     "transition": "all 0.2s",
                     "min-width": "120px",
                 }
@@ -359,6 +568,10 @@ def LoginModal():
 # --- MAIN APP LAYOUT ---
 @solara.component
 def Page():
+    # Free this connection's chat session when the page goes away
+    key = connection_key()
+    solara.use_effect(lambda: lambda: sessions.drop(key), [])
+
     # Global CSS for animations
     solara.HTML(unsafe_innerHTML="""
         <style>
@@ -407,6 +620,8 @@ def Page():
                 LoginModal()
         return
 
+    state.conversation.value  # re-render the session badge on a new conversation
+
     # Sidebar
     with solara.Sidebar():
         with solara.Column(gap="16px"):
@@ -414,7 +629,7 @@ def Page():
                 <div style="padding: 20px; background: linear-gradient(135deg, #1A202C 0%, #2D3748 100%); border-radius: 16px; color: white; text-align: center;">
                     <div style="font-size: 2rem; margin-bottom: 8px;">👤</div>
                     <div style="font-size: 1.1rem; font-weight: 600;">{state.username.value}</div>
-                    <div style="font-size: 0.75rem; color: #A0AEC0; margin-top: 4px;">Session: {state.session_id.value[:8]}...</div>
+                    <div style="font-size: 0.75rem; color: #A0AEC0; margin-top: 4px;">Session: {current_session().session_id[:8]}...</div>
                 </div>
             """)
             
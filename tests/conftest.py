@@ -0,0 +1,53 @@
+"""
+Shared test setup: the repo root on sys.path, placeholder Supabase settings
+and fixtures that keep tests off the real audit log and conversation store.
+Test modules rely on it, so run one directly from the repo root as a
+module: python -m tests.test_turns
+"""
+import sys
+import os
+import functools
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-placeholder-key")
+
+import pytest
+
+import core.therapy_engine_groq as engine_module
+from ethical_modules.ethics_logger import EthicsLogger, get_audit_sink
+
+
+@pytest.fixture(autouse=True)
+def audit_log(tmp_path, monkeypatch):
+    """
+    Engine cores built during a test log to tmp_path, not logs/ethics_audit.log.
+    The shared core is rebuilt too: one made while importing a test module
+    (solara_app builds it at import) would still use the real log.
+    """
+    log_file = str(tmp_path / "ethics_audit.log")
+    monkeypatch.setattr(engine_module, "EthicsLogger", functools.partial(EthicsLogger, log_file=log_file))
+    monkeypatch.setattr(engine_module, "_engine_core", None)
+    yield log_file
+    get_audit_sink(log_file).close()
+
+
+def fake_conversation_store(monkeypatch):
+    """
+    Point the engine's history reads and writes at a list instead of the
+    conversation store. Returns the list; rows hold user_id, role, content.
+    """
+    rows = []
+
+    def load(uid, limit=None):
+        history = [r for r in rows if r["user_id"] == uid]
+        return history[-limit:] if limit else history
+
+    monkeypatch.setattr(engine_module, "append_to_conversation",
+                        lambda uid, role, content, session_id=None: rows.append({"user_id": uid, "role": role, "content": content}))
+    monkeypatch.setattr(engine_module, "load_user_conversation", load)
+    return rows
+
+
+@pytest.fixture
+def conversation_rows(monkeypatch):
+    return fake_conversation_store(monkeypatch)
@@ -0,0 +1,169 @@
+import asyncio
+import gc
+import threading
+import time
+
+import pytest
+
+from core.admission import (
+    AdmissionController, ConcurrencyLimit, Overloaded, RateLimited, TokenBucketLimiter,
+)
+from core.llm_backends import StubBackend
+from core.therapy_engine_groq import EngineCore, TherapyEngine
+
+
+def test_token_bucket_allows_burst_then_refills():
+    limiter = TokenBucketLimiter(rate_per_minute=600, burst=3)
+    assert [limiter.try_acquire("u1") for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = limiter.try_acquire("u1")
+    assert 0 < wait <= 0.1
+    assert limiter.try_acquire("u2") == 0.0
+    time.sleep(wait + 0.01)
+    assert limiter.try_acquire("u1") == 0.0
+    print("✅ Token bucket allows a burst, then refills at the configured rate")
+
+
+def test_concurrency_limit_caps_async_and_threads():
+    limit = ConcurrencyLimit(2)
+    peak = []
+
+    async def call():
+        await limit.acquire_async()
+        try:
+            peak.append(limit.active)
+            await asyncio.sleep(0.02)
+        finally:
+            limit.release()
+
+    async def scenario():
+        await asyncio.gather(*(call() for _ in range(8)))
+
+    def thread_call():
+        limit.acquire()
+        try:
+            peak.append(limit.active)
+            time.sleep(0.02)
+        finally:
+            limit.release()
+
+    threads = [threading.Thread(target=thread_call) for _ in range(4)]
+    for t in threads:
+        t.start()
+    asyncio.run(scenario())
+    for t in threads:
+        t.join()
+    assert max(peak) == 2 and len(peak) == 12
+    assert limit.active == 0 and limit.waiting == 0
+    print("✅ One cap is shared by event-loop and thread callers")
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    limit = ConcurrencyLimit(1)
+
+    async def scenario():
+        await limit.acquire_async()
+        waiter = asyncio.create_task(limit.acquire_async())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        limit.release()
+        await asyncio.wait_for(limit.acquire_async(), timeout=1)
+        limit.release()
+
+    asyncio.run(scenario())
+    assert limit.active == 0
+    print("✅ Cancelled waiters give their slot back")
+
+
+def test_admit_sheds_when_queue_is_full():
+    controller = AdmissionController(max_concurrency=2, max_queue=1)
+    tickets = [controller.admit() for _ in range(3)]
+    with pytest.raises(Overloaded) as exc:
+        controller.admit()
+    assert exc.value.status_code == 503 and exc.value.retry_after >= 1
+    tickets[0].close()
+    controller.admit().close()
+    assert controller.snapshot()["shed"] == 1
+    print("✅ Turns beyond concurrency + queue are shed with a retry hint")
+
+
+def make_core(admission, latency="fixed:0"):
+    core = EngineCore(llm=StubBackend(latency=latency))
+    core.admission = admission
+    return core
+
+
+def test_rate_limited_user_is_rejected_before_storage(conversation_rows):
+    rows = conversation_rows
+    admission = AdmissionController(limiter=TokenBucketLimiter(rate_per_minute=1, burst=1))
+    core = make_core(admission)
+    engine = TherapyEngine("limited", core=core)
+    engine.process("I had a rough week at work")
+    stored = len(rows)
+    with pytest.raises(RateLimited) as exc:
+        engine.process("My sister and I argued again")
+    assert exc.value.status_code == 429 and exc.value.retry_after > 1
+    assert engine.last_outcome == "rate_limited"
+    assert len(rows) == stored
+    # Crisis replies are never rate limited
+    assert "crisis" in engine.process("I want to kill myself")
+    print("✅ Rate limits reject before any write and never block crisis replies")
+
+
+def test_overload_sheds_fast_and_admitted_latency_stays_bounded(conversation_rows):
+    admission = AdmissionController(max_concurrency=4, max_queue=4,
+                                    limiter=TokenBucketLimiter(rate_per_minute=0))
+    core = make_core(admission, latency="fixed:0.1")
+
+    async def one(i):
+        start = time.perf_counter()
+        try:
+            await TherapyEngine(f"load-{i}", core=core).process_async("I keep procrastinating on my thesis")
+            return "ok", time.perf_counter() - start
+        except Overloaded:
+            return "shed", time.perf_counter() - start
+
+    async def scenario():
+        return await asyncio.gather(*(one(i) for i in range(40)))
+
+    # A full collection of the test session's heap takes most of the 100 ms
+    # shed budget on a slow box; keep it out of the timing
+    gc.collect()
+    results = asyncio.run(scenario())
+    ok = [t for status, t in results if status == "ok"]
+    shed = [t for status, t in results if status == "shed"]
+    assert len(ok) == 8 and len(shed) == 32
+    # 8 admitted turns through 4 slots: about two LLM calls of waiting at most
+    assert max(ok) < 0.6
+    assert max(shed) < 0.1
+    print(f"✅ Overload shed {len(shed)} requests; admitted max latency {max(ok) * 1000:.0f} ms")
+
+
+def test_api_maps_rejections_to_status_and_retry_after(conversation_rows, monkeypatch):
+    from fastapi.testclient import TestClient
+    import fastapi_app
+
+    admission = AdmissionController(limiter=TokenBucketLimiter(rate_per_minute=1, burst=1))
+    core = make_core(admission)
+    monkeypatch.setattr(fastapi_app, "get_engine_core", lambda: core)
+    client = TestClient(fastapi_app.app)
+    payload = {"user_id": "api_user", "message": "I had a rough week at work"}
+    assert client.post("/chat", json=payload).status_code == 200
+    limited = client.post("/chat", json=payload)
+    assert limited.status_code == 429 and int(limited.headers["Retry-After"]) > 1
+    streamed = client.post("/chat/stream", json=payload)
+    assert streamed.status_code == 429 and "Retry-After" in streamed.headers
+    print("✅ /chat and /chat/stream answer 429 with Retry-After")
+
+
+if __name__ == "__main__":
+    from tests.conftest import fake_conversation_store
+
+    test_token_bucket_allows_burst_then_refills()
+    test_concurrency_limit_caps_async_and_threads()
+    test_cancelled_waiter_does_not_leak_a_slot()
+    test_admit_sheds_when_queue_is_full()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_rate_limited_user_is_rejected_before_storage(fake_conversation_store(monkeypatch))
+        test_overload_sheds_fast_and_admitted_latency_stays_bounded(fake_conversation_store(monkeypatch))
+        test_api_maps_rejections_to_status_and_retry_after(fake_conversation_store(monkeypatch), monkeypatch)
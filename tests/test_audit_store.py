@@ -0,0 +1,148 @@
+import sys
+import os
+import io
+import json
+import multiprocessing
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ethical_modules.audit_store import AuditStore, main, seal_segment, segment_dir_for
+from ethical_modules.ethics_logger import AuditSink, EthicsLogger, get_audit_sink
+
+
+def write_log(path, records):
+    with open(path, "w") as fh:
+        for record in records:
+            fh.write(json.dumps(record) + "\n")
+
+
+def make_records(days=10, per_day=300, start="2024-05-01T00:00:00"):
+    base = time.mktime(time.strptime(start, "%Y-%m-%dT%H:%M:%S"))
+    records = []
+    for day in range(days):
+        for i in range(per_day):
+            ts = base + day * 86400 + i * (86400 / per_day)
+            records.append({
+                "message": "crisis_detected" if i % 50 == 0 else "data_access",
+                "user_id": f"user{(i // 60) % 5}",
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ts)),
+            })
+    return records
+
+
+def test_seal_and_query_reads_only_matching_blocks(tmp_path):
+    log = str(tmp_path / "ethics_audit.log")
+    records = make_records()
+    segment_dir = segment_dir_for(log)
+    for day in range(10):
+        write_log(log, records[day * 300:(day + 1) * 300])
+        assert seal_segment(log, segment_dir, block_records=50)
+    assert not os.path.exists(log)
+    assert len([n for n in os.listdir(segment_dir) if n.endswith(".idx.json")]) == 10
+
+    store = AuditStore(log)
+    found = list(store.query(user_id="user0", event="crisis_detected",
+                             since="2024-05-03T00:00:00", until="2024-05-06T00:00:00"))
+    expected = [r for r in records if r["user_id"] == "user0" and r["message"] == "crisis_detected"
+                and "2024-05-03" <= r["timestamp"] < "2024-05-06"]
+    assert found == expected and len(found) == 3 * 2
+    # 3 of 10 segments, and only the 2 of 6 blocks per segment where user0 is active
+    assert store.stats["segments_scanned"] == 3
+    assert store.stats["blocks_read"] == 3 * 2
+    assert list(store.query(user_id="nobody")) == []
+    print("✅ Queries prune segments and blocks through the side index")
+
+
+def test_query_includes_live_file_and_cli(tmp_path):
+    log = str(tmp_path / "ethics_audit.log")
+    write_log(log, make_records(days=1, per_day=100))
+    seal_segment(log, segment_dir_for(log))
+    write_log(log, make_records(days=1, per_day=100, start="2024-05-02T00:00:00"))
+    store = AuditStore(log)
+    assert len(list(store.query(event="crisis_detected"))) == 4
+    out = io.StringIO()
+    with redirect_stdout(out):
+        main(["query", "--log", log, "--event", "crisis_detected", "--since", "2024-05-02", "--count"])
+    assert out.getvalue().strip() == "2"
+    print("✅ Live file and CLI queries agree with sealed segments")
+
+
+def test_sink_rotates_when_bucket_ends(tmp_path):
+    log = str(tmp_path / "rotating_audit.log")
+    sink = get_audit_sink(log)
+    logger = EthicsLogger(log_file=log)
+    logger.log_crisis_detection(user_id="u1", crisis_type="suicide", user_text_length=10)
+    assert sink.flush()
+    # Pretend the file belongs to an earlier bucket: the next batch seals it
+    sink._bucket -= 1
+    logger.log_data_access(user_id="u1", action="read")
+    assert sink.close()
+    assert sink.stats["segments"] == 1
+
+    store = AuditStore(log)
+    events = [r["message"] for r in store.query(user_id="u1")]
+    assert events == ["crisis_detected", "data_access"]
+    assert store.stats["segments_scanned"] == 1
+    print("✅ AuditSink seals the live log into a segment when its bucket ends")
+
+
+def test_sink_recovers_interrupted_seal(tmp_path):
+    log = str(tmp_path / "recover_audit.log")
+    write_log(log + ".sealing", make_records(days=1, per_day=10))
+    sink = AuditSink(log, "ethics_audit.recover_test")
+    sink.logger.info("data_access", extra={"user_id": "late", "timestamp": "2030-01-01T00:00:00"})
+    assert sink.close()
+    assert not os.path.exists(log + ".sealing")
+    assert len(list(AuditStore(log).query())) == 11
+    print("✅ A half-finished rotation is sealed on restart")
+
+
+def write_from_worker(log, worker, count):
+    sink = AuditSink(log, f"ethics_audit.worker{worker}")
+    for i in range(count):
+        sink.logger.info("data_access", extra={"user_id": f"worker{worker}", "seq": i,
+                                               "timestamp": datetime.now().isoformat()})
+        if i % 50 == 49:
+            sink.flush()
+            sink.rotate()
+    sink.close()
+
+
+def test_processes_sharing_a_log_lose_nothing_on_rotate(tmp_path):
+    from ethical_modules import ethics_logger
+    if ethics_logger.fcntl is None or "fork" not in multiprocessing.get_all_start_methods():
+        print("⏭️  Needs fcntl and fork")
+        return
+    log = str(tmp_path / "shared_audit.log")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=write_from_worker, args=(log, n, 200)) for n in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(60)
+    assert [w.exitcode for w in workers] == [0] * 4
+
+    records = list(AuditStore(log).query())
+    assert len(records) == 800
+    for n in range(4):
+        assert sorted(r["seq"] for r in records if r["user_id"] == f"worker{n}") == list(range(200))
+    assert not os.path.exists(log + ".sealing")
+    print("✅ Four processes rotating one audit log lose no records")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    with tempfile.TemporaryDirectory() as directory:
+        test_seal_and_query_reads_only_matching_blocks(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_query_includes_live_file_and_cli(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_sink_rotates_when_bucket_ends(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_sink_recovers_interrupted_seal(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_processes_sharing_a_log_lose_nothing_on_rotate(Path(directory))
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import pytest
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from core.backend_client import BackendClient
+
+
+@pytest.fixture
+def server():
+    with FakeLLMServer() as fake:
+        yield fake
+
+
+def test_messages_share_one_keepalive_connection(server):
+    client = BackendClient(server.url, server.url)
+    try:
+        for _ in range(5):
+            assert client.chat("u1", "hello").status_code == 200
+        for _ in range(5):
+            with client.stream_chat("u1", "hello") as response:
+                response.read()
+                assert response.status_code == 200
+    finally:
+        client.close()
+    assert server.requests == 10 and len(server.connections) == 1
+    print("✅ Ten messages reused a single pooled connection")
+
+
+def test_connect_and_read_timeouts_are_separate(server):
+    client = BackendClient(server.url, connect_timeout=2, read_timeout=0.2)
+    assert client.timeout.connect == 2 and client.timeout.read == 0.2
+    server.script.append((200, 1.0))
+    try:
+        with pytest.raises(httpx.ReadTimeout):
+            client.chat("u1", "hello")
+        # A timed-out connection is dropped, the next message still works
+        assert client.chat("u1", "hello").status_code == 200
+    finally:
+        client.close()
+    print("✅ A slow reply trips the read timeout, not the connect timeout")
+
+
+if __name__ == "__main__":
+    with FakeLLMServer() as fake:
+        test_messages_share_one_keepalive_connection(fake)
+    with FakeLLMServer() as fake:
+        test_connect_and_read_timeouts_are_separate(fake)
@@ -0,0 +1,95 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.chat_sessions import ChatTranscript, SessionRegistry
+
+
+def test_transcript_trims_old_messages_and_keeps_indexes():
+    transcript = ChatTranscript(max_messages=8)
+    for i in range(25):
+        assert transcript.append("user", f"message {i}") == i
+    assert len(transcript) == 25
+    assert 8 <= len(transcript.messages) <= 10
+    assert [(i, m["content"]) for i, m in transcript.window(3)] == [
+        (22, "message 22"), (23, "message 23"), (24, "message 24")]
+    assert transcript.offset == 25 - len(transcript.messages)
+    # Dropped messages can be paged back in from storage
+    assert transcript.cursor == transcript.messages[0]["timestamp"]
+    first = transcript.offset
+    transcript.prepend([{"role": "user", "content": "stored", "timestamp": "2024-01-01T00:00:00"}], None)
+    assert transcript.window(len(transcript.messages))[0] == (first - 1, transcript.messages[0])
+    assert transcript.cursor is None and len(transcript) == 25
+    print("✅ Transcript keeps the newest messages with stable indexes")
+
+
+def test_replace_last_swaps_in_a_new_dict():
+    transcript = ChatTranscript()
+    transcript.append("assistant", "Hel")
+    first = transcript.last
+    size = transcript.size
+    transcript.replace_last("Hello there")
+    assert first["content"] == "Hel"
+    assert transcript.last["content"] == "Hello there"
+    assert transcript.last is not first and transcript.last["timestamp"] == first["timestamp"]
+    assert transcript.size == size + len("lo there")
+    print("✅ Streaming updates never mutate a rendered message")
+
+
+def test_registry_evicts_idle_and_least_recently_used():
+    registry = SessionRegistry(max_sessions=3, idle_seconds=0.2, grace_seconds=0,
+                               on_create=lambda s: s.transcript.append("assistant", "hi"))
+    a = registry.get("a")
+    assert a.transcript.messages[0]["content"] == "hi"
+    registry.get("b")
+    registry.get("c")
+    registry.get("a")
+    registry.get("d")
+    # b was least recently used
+    assert registry.snapshot()["sessions"] == 3 and registry.get("a") is a
+    assert registry.stats["evicted_memory"] == 1
+
+    time.sleep(0.25)
+    registry.get("a")
+    assert registry.snapshot()["sessions"] == 1
+    assert registry.stats["evicted_idle"] == 2
+    assert registry.reset("a") is not a
+    print("✅ Idle and least recently used sessions are evicted")
+
+
+def test_registry_enforces_byte_budget():
+    registry = SessionRegistry(max_bytes=20_000, grace_seconds=0)
+    for key in "abcde":
+        transcript = registry.get(key).transcript
+        for _ in range(10):
+            transcript.append("user", "x" * 1000)
+    assert registry.evict() == 4
+    assert registry.snapshot()["sessions"] == 1 and registry.snapshot()["bytes"] <= 20_000
+    print("✅ Sessions over the memory budget are evicted oldest first")
+
+
+def test_registry_keeps_busy_and_recent_sessions():
+    registry = SessionRegistry(max_sessions=1, idle_seconds=0.1, grace_seconds=0.3)
+    busy = registry.get("busy")
+    with registry.working(busy):
+        recent = registry.get("recent")
+        registry.get("new")
+        # Over max_sessions, but one is replying and the other was just used
+        assert registry.snapshot()["sessions"] == 3 and registry.stats["evicted_memory"] == 0
+        time.sleep(0.35)
+        # Past both the grace period and the idle timeout
+        registry.get("new")
+        assert registry.get("busy") is busy
+        assert registry.stats["evicted_idle"] == 1
+    assert busy.in_flight == 0
+    assert registry.get("recent") is not recent
+    print("✅ Sessions with a reply in flight or used moments ago are not evicted")
+
+
+if __name__ == "__main__":
+    test_transcript_trims_old_messages_and_keeps_indexes()
+    test_replace_last_swaps_in_a_new_dict()
+    test_registry_evicts_idle_and_least_recently_used()
+    test_registry_enforces_byte_budget()
+    test_registry_keeps_busy_and_recent_sessions()
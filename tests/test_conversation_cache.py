@@ -0,0 +1,84 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.conversation_cache import ConversationCache
+
+
+def rows(n, start=0):
+    return [{"role": "user", "content": f"message {i}"} for i in range(start, start + n)]
+
+
+def test_hit_after_put_and_write_through_append():
+    cache = ConversationCache()
+    assert cache.get("u1", limit=10) is None
+    cache.put("u1", rows(3), complete=True)
+    cache.append("u1", {"role": "assistant", "content": "reply"})
+    history = cache.get("u1", limit=10)
+    assert [r["content"] for r in history][-1] == "reply"
+    assert len(history) == 4
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    print("✅ Cache serves reads and applies appends")
+
+
+def test_partial_entry_only_serves_smaller_limits():
+    cache = ConversationCache()
+    cache.put("u1", rows(5), complete=False)
+    assert len(cache.get("u1", limit=5)) == 5
+    assert cache.get("u1", limit=6) is None
+    assert cache.get("u1") is None
+    print("✅ Partial entries only serve reads they can satisfy")
+
+
+def test_ttl_expiry():
+    cache = ConversationCache(ttl=0.01)
+    cache.put("u1", rows(2), complete=True)
+    time.sleep(0.02)
+    assert cache.get("u1") is None
+    print("✅ Entries expire after the TTL")
+
+
+def test_ttl_slides_while_the_conversation_is_active():
+    cache = ConversationCache(ttl=0.15)
+    cache.put("u1", rows(2), complete=True)
+    # Reads and write-through appends keep the entry alive past one TTL
+    for i in range(4):
+        time.sleep(0.06)
+        assert cache.get("u1") is not None
+        cache.append("u1", {"role": "user", "content": f"more {i}", "timestamp": f"t{i}"})
+    assert len(cache.get("u1")) == 6
+    time.sleep(0.2)
+    assert cache.get("u1") is None
+    print("✅ Active conversations stay cached; idle ones expire")
+
+
+def test_memory_eviction_is_lru():
+    cache = ConversationCache(max_bytes=3000)
+    cache.put("old", rows(4), complete=True)
+    cache.put("recent", rows(4), complete=True)
+    cache.get("old")
+    cache.put("new", rows(4), complete=True)
+    assert cache.get("recent") is None
+    assert cache.get("old") is not None
+    assert cache.stats()["evictions"] == 1
+    print("✅ Least recently used users are evicted past the memory cap")
+
+
+def test_rows_per_user_are_capped():
+    cache = ConversationCache(max_rows_per_user=3)
+    cache.put("u1", rows(2), complete=True)
+    cache.append("u1", {"role": "user", "content": "a"})
+    cache.append("u1", {"role": "user", "content": "b"})
+    assert cache.get("u1") is None
+    assert [r["content"] for r in cache.get("u1", limit=3)] == ["message 1", "a", "b"]
+    print("✅ Per-user row cap keeps the newest rows")
+
+
+if __name__ == "__main__":
+    test_hit_after_put_and_write_through_append()
+    test_partial_entry_only_serves_smaller_limits()
+    test_ttl_expiry()
+    test_ttl_slides_while_the_conversation_is_active()
+    test_memory_eviction_is_lru()
+    test_rows_per_user_are_capped()
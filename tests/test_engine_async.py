@@ -0,0 +1,131 @@
+import asyncio
+
+import core.therapy_engine_groq as engine_module
+from core.therapy_engine_groq import TherapyEngine
+from core.llm_backends import GeminiSDKBackend
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeAsyncModels:
+    def __init__(self, text):
+        self.text = text
+        self.prompts = []
+
+    async def generate_content(self, model, contents):
+        self.prompts.append(contents)
+        await asyncio.sleep(0.05)
+        return FakeResponse(self.text)
+
+
+    async def generate_content_stream(self, model, contents):
+        async def chunks():
+            for word in self.text.split(" "):
+                await asyncio.sleep(0)
+                yield FakeResponse(word + " ")
+        return chunks()
+
+
+class FakeGenaiClient:
+    def __init__(self, text):
+        self.aio = type("Aio", (), {})()
+        self.aio.models = FakeAsyncModels(text)
+
+
+def make_engine(user_id, text="That sounds hard. What feels heaviest right now?"):
+    engine = TherapyEngine(user_id)
+    engine.llm = GeminiSDKBackend(FakeGenaiClient(text))
+    return engine
+
+
+def test_process_async_persists_turn(conversation_rows):
+    rows = conversation_rows
+    engine = make_engine("async_user")
+    reply = asyncio.run(engine.process_async("I had a rough day at work"))
+    assert reply.startswith("That sounds hard")
+    assert [r["role"] for r in rows] == ["user", "assistant"]
+    print("✅ Async pipeline persisted both turns")
+
+
+def test_process_async_runs_concurrently(conversation_rows):
+    engine = make_engine("async_user")
+
+    async def run_many():
+        engines = [TherapyEngine(f"user-{i}") for i in range(50)]
+        for e in engines:
+            e.llm = engine.llm
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(e.process_async("I had a rough day at work") for e in engines))
+        return loop.time() - start
+
+    # 50 calls that each wait 50 ms on the LLM should overlap, not queue up
+    assert asyncio.run(run_many()) < 1.0
+    print("✅ Async pipeline overlaps LLM waits")
+
+
+def collect_stream(engine, message):
+    async def run():
+        return [event async for event in engine.process_stream_async(message)]
+    return asyncio.run(run())
+
+
+def test_stream_delivers_deltas_then_done(conversation_rows):
+    rows = conversation_rows
+    engine = make_engine("stream_user")
+    events = collect_stream(engine, "I had a rough day at work")
+    deltas = [e for e in events if e["type"] == "delta"]
+    assert len(deltas) > 1
+    assert events[-1]["type"] == "done" and not events[-1]["blocked"]
+    assert rows[-1]["role"] == "assistant"
+    print("✅ Stream yields deltas and a final reply")
+
+
+def test_stream_cut_off_when_rule_trips(conversation_rows):
+    rows = conversation_rows
+    engine = make_engine("stream_user", text="Try to relax. Just think positive and it will pass.")
+    events = collect_stream(engine, "I had a rough day at work")
+    assert events[-1]["blocked"]
+    assert events[-1]["response"] == engine_module.UNSAFE_RESPONSE_REPLY
+    streamed = "".join(e["text"] for e in events if e["type"] == "delta")
+    assert "positive" not in streamed
+    assert rows[-1]["role"] == "user"
+    print("✅ Stream is cut off before the offending phrase")
+
+
+def test_crisis_answered_before_any_io(conversation_rows, monkeypatch):
+    rows = conversation_rows
+    engine = make_engine("crisis_user")
+    loads = []
+    monkeypatch.setattr(engine_module, "load_user_conversation", lambda uid, limit=None: loads.append(uid) or [])
+
+    async def run():
+        reply = await engine.process_async("I'm so stressed I want to kill myself")
+        # Persistence runs in the background; give the executor a moment
+        for _ in range(100):
+            if len(rows) == 2:
+                break
+            await asyncio.sleep(0.01)
+        return reply
+
+    reply = asyncio.run(run())
+    assert "crisis" in reply
+    assert loads == []
+    assert engine.llm.client.aio.models.prompts == []
+    assert [r["role"] for r in rows] == ["user", "assistant"]
+    print("✅ Crisis turns skip storage reads and the LLM")
+
+
+if __name__ == "__main__":
+    import pytest
+    from tests.conftest import fake_conversation_store
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_process_async_persists_turn(fake_conversation_store(monkeypatch))
+        test_process_async_runs_concurrently(fake_conversation_store(monkeypatch))
+        test_stream_delivers_deltas_then_done(fake_conversation_store(monkeypatch))
+        test_stream_cut_off_when_rule_trips(fake_conversation_store(monkeypatch))
+        test_crisis_answered_before_any_io(fake_conversation_store(monkeypatch), monkeypatch)
@@ -1,9 +1,12 @@
 import sys
 import os
+import json
+import threading
+import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # ...your imports here...
 
-from ethical_modules.ethics_logger import EthicsLogger
+from ethical_modules.ethics_logger import EthicsLogger, get_audit_sink
 
 def test_logging():
     logger = EthicsLogger(log_file='logs/test_ethics_audit.log')
@@ -13,5 +16,82 @@ def test_logging():
     logger.log_bias_detection(bias_type="gender_stereotype", severity="medium")
     print("✅ Ethics Logger ran without errors (check logs/test_ethics_audit.log for output)")
 
+
+def open_fds(directory):
+    """Open file descriptors under `directory` (pytest's own capture files come and go)."""
+    if not os.path.isdir('/proc/self/fd'):
+        return None
+    count = 0
+    for fd in os.listdir('/proc/self/fd'):
+        try:
+            count += os.readlink(f'/proc/self/fd/{fd}').startswith(directory)
+        except OSError:
+            pass
+    return count
+
+
+def test_loggers_share_one_handler(tmp_path):
+    log_file = str(tmp_path / "shared_audit.log")
+    fds_before = open_fds(str(tmp_path))
+    loggers = [EthicsLogger(log_file=log_file) for _ in range(500)]
+    loggers[0].log_data_access(user_id="user1", action="read")
+    assert len({id(l.sink) for l in loggers}) == 1
+    assert len(loggers[0].logger.handlers) == 1
+    assert get_audit_sink(log_file).flush()
+    if fds_before is not None:
+        # Only the log file and its lock file are opened, however many loggers exist
+        assert open_fds(str(tmp_path)) - fds_before <= 2
+    with open(log_file) as fh:
+        assert json.loads(fh.readline())["action"] == "read"
+    print("✅ 500 EthicsLoggers share one file handle")
+
+
+def test_stress_latency_stays_flat_and_nothing_is_dropped(tmp_path):
+    log_file = str(tmp_path / "stress_audit.log")
+    sink = get_audit_sink(log_file)
+    fds_before = open_fds(str(tmp_path))
+    threads, per_thread = 4, 2500
+    latencies = [[] for _ in range(threads)]
+
+    def produce(n):
+        logger = EthicsLogger(log_file=log_file)
+        for i in range(per_thread):
+            start = time.perf_counter()
+            logger.log_ethical_violation(user_id=f"user{n}", violation_type="unsafe_response", details=f"event {i}")
+            latencies[n].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=produce, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    produce_seconds = time.perf_counter() - start
+    assert sink.close()
+
+    total = threads * per_thread
+    with open(log_file) as fh:
+        lines = fh.read().splitlines()
+    assert len(lines) == total
+    assert sink.stats["batches"] < total and sink.stats["fsyncs"] < sink.stats["batches"] + 2
+
+    samples = sorted(l for per in latencies for l in per)
+    p99 = samples[int(len(samples) * 0.99)]
+    first = sum(latencies[0][:500]) / 500
+    last = sum(latencies[0][-500:]) / 500
+    assert p99 < 0.01, p99
+    assert last < first * 5 + 0.0005, (first, last)
+    if fds_before is not None:
+        assert open_fds(str(tmp_path)) == fds_before
+    print(f"✅ {total} events at {total / produce_seconds:.0f}/s, p99 {p99 * 1e6:.0f}µs, "
+          f"{sink.stats['batches']} batches, {sink.stats['fsyncs']} fsyncs")
+
+
 if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
     test_logging()
+    with tempfile.TemporaryDirectory() as directory:
+        test_loggers_share_one_handler(Path(directory))
+        test_stress_latency_stays_flat_and_nothing_is_dropped(Path(directory))
@@ -0,0 +1,168 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import core.chat_memory as chat_memory
+import core.therapy_engine_groq as engine_module
+from core.health import HealthMonitor
+from benchmarks.fake_llm_server import FakeLLMServer
+from core.llm_backends import GeminiRESTBackend, LLMHTTPError, StubBackend
+from core.resilience import ResilientBackend
+from core.storage import MemoryStore
+from core.therapy_engine_groq import EngineCore, TherapyEngine
+
+
+class Switch:
+    """Probe that fails while `broken` is set."""
+
+    def __init__(self):
+        self.broken = False
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.broken:
+            raise ConnectionError("connection refused")
+
+
+def test_dependency_goes_down_and_recovers():
+    monitor = HealthMonitor(timeout=1)
+    probe = Switch()
+    monitor.register("llm", probe, failure_threshold=2)
+    assert not monitor.is_down("llm") and not monitor.is_down("never-registered")
+    assert monitor.snapshot()["dependencies"]["llm"]["status"] == "unknown"
+
+    monitor.probe_once()
+    assert monitor.snapshot()["status"] == "ok"
+    probe.broken = True
+    monitor.probe_once()
+    assert monitor.snapshot()["dependencies"]["llm"]["status"] == "degraded" and not monitor.is_down("llm")
+    monitor.probe_once()
+    assert monitor.is_down("llm") and monitor.status() == "down"
+    details = monitor.snapshot()["dependencies"]["llm"]
+    assert details["consecutive_failures"] == 2 and "connection refused" in details["last_error"]
+    assert details["error_rate"] == round(2 / 3, 3) and details["latency_p95_seconds"] is not None
+
+    probe.broken = False
+    monitor.probe_once()
+    assert not monitor.is_down("llm") and monitor.metrics()["llm_up"] == 1
+    print("✅ Consecutive failed probes mark a dependency down until one succeeds")
+
+
+def test_hung_probe_counts_as_failure():
+    monitor = HealthMonitor(timeout=0.1)
+    release = threading.Event()
+    monitor.register("storage", release.wait, failure_threshold=2)
+    start = time.monotonic()
+    monitor.probe_once()
+    monitor.probe_once()
+    assert time.monotonic() - start < 1
+    assert monitor.is_down("storage")
+    # The hung probe was not started a second time
+    assert "still running" in monitor.snapshot()["dependencies"]["storage"]["last_error"]
+    release.set()
+    print("✅ A probe that hangs past the timeout counts as a failure")
+
+
+def test_background_thread_probes_periodically():
+    monitor = HealthMonitor(interval=0.02, timeout=1)
+    probe = Switch()
+    monitor.register("llm", probe)
+    monitor.start()
+    deadline = time.monotonic() + 5
+    while probe.calls < 3:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    monitor.stop()
+    assert monitor.snapshot()["dependencies"]["llm"]["status"] == "healthy"
+    print("✅ The prober keeps running in the background until stopped")
+
+
+def test_llm_probe_fails_on_server_errors_and_throttling():
+    with FakeLLMServer() as server:
+        backend = ResilientBackend(GeminiRESTBackend("fake-key", url=server.url))
+        monitor = HealthMonitor(timeout=5)
+        monitor.register("llm", backend.probe, failure_threshold=1)
+        # 405 for a GET: the endpoint is up
+        monitor.probe_once()
+        assert not monitor.is_down("llm")
+        for status in (503, 429):
+            server.get_status = status
+            # Warm-up is satisfied by any answer; the probe is not
+            backend.warm()
+            with pytest.raises(LLMHTTPError):
+                backend.probe()
+            monitor.probe_once()
+            assert monitor.is_down("llm") and str(status) in monitor.snapshot()["dependencies"]["llm"]["last_error"]
+        server.get_status = 405
+        monitor.probe_once()
+        assert not monitor.is_down("llm")
+        backend.close()
+    print("✅ The LLM probe marks 5xx and 429 answers as failures")
+
+
+def test_engine_skips_llm_marked_down(conversation_rows, monkeypatch):
+    monitor = HealthMonitor()
+    monitor.register("llm", Switch(), failure_threshold=1)
+    monitor.dependencies["llm"].record(False, 5.0, "timed out")
+    monkeypatch.setattr(engine_module, "HEALTH", monitor)
+    llm = StubBackend(latency="fixed:5")
+    engine = TherapyEngine("down_user", core=EngineCore(llm=llm))
+
+    start = time.monotonic()
+    assert engine.process("I had a rough week at work") == engine_module.LLM_FAILURE_REPLY
+    assert engine.last_outcome == "llm_unavailable"
+    assert asyncio.run(engine.process_async("I had a rough week at work")) == engine_module.LLM_FAILURE_REPLY
+    events = list(engine.process_stream("I had a rough week at work"))
+    assert events == [{"type": "done", "response": engine_module.LLM_FAILURE_REPLY, "blocked": True}]
+    assert time.monotonic() - start < 1 and llm.calls == 0
+    print("✅ Engine fails fast without calling an LLM the probes marked down")
+
+
+def test_history_skips_storage_marked_down(monkeypatch):
+    monitor = HealthMonitor()
+    monitor.register("storage", Switch(), failure_threshold=1)
+    monitor.dependencies["storage"].record(False, 5.0, "timed out")
+    monkeypatch.setattr(chat_memory, "HEALTH", monitor)
+    original = chat_memory.get_conversation_store()
+    store = MemoryStore()
+    chat_memory.set_conversation_store(store)
+    try:
+        chat_memory.conversation_cache.clear()
+        assert chat_memory.load_user_conversation("down-store-user", limit=5) == []
+        assert chat_memory.load_conversation_page("down-store-user", 5, before="2024-01-01") == ([], "2024-01-01")
+        assert store.fetches == 0
+    finally:
+        chat_memory.set_conversation_store(original)
+    print("✅ History loads skip a store the probes marked down")
+
+
+def test_details_endpoint(monkeypatch):
+    from fastapi.testclient import TestClient
+    import fastapi_app
+
+    monitor = HealthMonitor()
+    monitor.register("storage", Switch())
+    monitor.probe_once()
+    monkeypatch.setattr(fastapi_app, "start_dependency_probes", lambda core: monitor)
+    with TestClient(fastapi_app.app) as client:
+        response = client.get("/healthz/details")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "ok" and body["dependencies"]["storage"]["probes"] == 1
+    print("✅ /healthz/details reports cached probe results")
+
+
+if __name__ == "__main__":
+    from tests.conftest import fake_conversation_store
+
+    test_dependency_goes_down_and_recovers()
+    test_hung_probe_counts_as_failure()
+    test_background_thread_probes_periodically()
+    test_llm_probe_fails_on_server_errors_and_throttling()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_engine_skips_llm_marked_down(fake_conversation_store(monkeypatch), monkeypatch)
+        test_history_skips_storage_marked_down(monkeypatch)
+        test_details_endpoint(monkeypatch)
@@ -0,0 +1,95 @@
+import sys
+import os
+import asyncio
+import subprocess
+import time
+
+import pytest
+
+from core.llm_backends import StubBackend, StubBackendError, parse_latency, create_backend
+from core.therapy_engine_groq import EngineCore, TherapyEngine
+import core.therapy_engine_groq as engine_module
+
+MESSAGES = [{"role": "system", "content": "System."}, {"role": "user", "content": "I feel lost lately"}]
+
+
+def test_stub_is_deterministic():
+    first = StubBackend().generate(MESSAGES)
+    assert first == StubBackend(seed=7).generate(MESSAGES)
+    assert "".join(StubBackend().stream(MESSAGES)) == first
+    print("✅ Stub replies are deterministic")
+
+
+def test_stub_latency_and_streaming():
+    backend = StubBackend(latency="fixed:0.05", token_delay=0.01)
+
+    async def run():
+        start = time.perf_counter()
+        chunks = [c async for c in backend.astream(MESSAGES)]
+        return chunks, time.perf_counter() - start
+
+    chunks, elapsed = asyncio.run(run())
+    assert len(chunks) > 2
+    assert elapsed >= 0.05 + 0.01 * (len(chunks) - 1)
+    print("✅ Stub honours latency and streams in chunks")
+
+
+def test_stub_failure_injection():
+    with pytest.raises(StubBackendError):
+        StubBackend(failure_rate=1.0).generate(MESSAGES)
+    stream = StubBackend(stream_failure_rate=1.0).stream(MESSAGES)
+    assert next(stream)
+    with pytest.raises(StubBackendError):
+        next(stream)
+    print("✅ Stub injects failures")
+
+
+def test_latency_specs():
+    import random
+    rng = random.Random(1)
+    assert parse_latency("fixed:0.3")(rng) == 0.3
+    assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+    assert parse_latency("lognormal:0.5,0.3")(rng) > 0
+    with pytest.raises(ValueError):
+        parse_latency("pareto:1")
+    print("✅ Latency distribution specs parse")
+
+
+def test_engine_runs_offline_on_stub(conversation_rows):
+    core = EngineCore(llm=create_backend("stub"))
+    reply = TherapyEngine("stub_user", core=core).process("I had a rough week at work")
+    assert reply == core.llm.generate([{"role": "user", "content": "I had a rough week at work"}])
+    failing = EngineCore(llm=StubBackend(failure_rate=1.0))
+    assert TherapyEngine("stub_user", core=failing).process("I had a rough week at work") == engine_module.LLM_FAILURE_REPLY
+    print("✅ Engine runs end to end on the stub backend")
+
+
+def test_sdk_and_storage_clients_load_on_first_use(monkeypatch):
+    # A fresh interpreter configured like production: API key set, Supabase store
+    env = dict(os.environ, GEMINI_API_KEY="test-placeholder-key", REFLECTAI_LLM_BACKEND="auto",
+               REFLECTAI_STORAGE="supabase")
+    code = ("import sys, fastapi_app\n"
+            "core = fastapi_app.get_engine_core()\n"
+            "print(core.llm.inner.name, 'google.genai' in sys.modules, 'supabase' in sys.modules)")
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=root, env=env)
+    assert result.stdout.split() == ["gemini", "False", "False"], result.stderr
+
+    from core.llm_backends import GeminiSDKBackend
+    monkeypatch.setenv("GEMINI_API_KEY", "test-placeholder-key")
+    backend = GeminiSDKBackend(timeout=12)
+    assert backend._client is None
+    assert backend.client is backend.client and backend._client is not None
+    print("✅ google.genai and supabase are imported on first use, not at startup")
+
+
+if __name__ == "__main__":
+    from tests.conftest import fake_conversation_store
+
+    test_stub_is_deterministic()
+    test_stub_latency_and_streaming()
+    test_stub_failure_injection()
+    test_latency_specs()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_engine_runs_offline_on_stub(fake_conversation_store(monkeypatch))
+        test_sdk_and_storage_clients_load_on_first_use(monkeypatch)
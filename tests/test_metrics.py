@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+from core.llm_backends import StubBackend
+from core.metrics import CHAT_OUTCOMES, CHAT_STAGE_SECONDS, ChatTimer, MetricsRegistry, render_metrics
+from core.therapy_engine_groq import TherapyEngine
+
+
+def outcome_count(outcome):
+    return CHAT_OUTCOMES.labels(outcome).value
+
+
+def stage_count(stage):
+    return sum(CHAT_STAGE_SECONDS.labels(stage).counts)
+
+
+def make_engine(user_id, **stub_options):
+    engine = TherapyEngine(user_id)
+    engine.llm = StubBackend(**stub_options)
+    return engine
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_seconds", "Demo latency.", ("stage",), buckets=(0.1, 1.0))
+    counter = registry.counter("demo_total", "Demo count.", ("outcome",))
+    histogram.labels("llm").observe(0.05)
+    histogram.labels("llm").observe(0.5)
+    histogram.labels("llm").observe(2.0)
+    counter.labels("success").inc()
+    registry.register_collector("demo_cache", lambda: {"hits": 3, "name": "ignored"})
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="llm",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="llm",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{stage="llm",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="llm"} 3' in text
+    assert 'demo_total{outcome="success"} 1.0' in text
+    assert 'demo_cache_hits 3' in text and 'ignored' not in text
+    print("✅ Registry renders histograms, counters and collected gauges")
+
+
+def test_engine_records_stages_and_outcomes(conversation_rows):
+    before = {o: outcome_count(o) for o in ("success", "crisis", "llm_failure", "out_of_scope")}
+    llm_before = stage_count("llm")
+
+    engine = make_engine("metrics_user")
+    engine.process("I had a rough week at work")
+    assert engine.last_outcome == "success"
+    engine.process("I want to kill myself")
+    assert engine.last_outcome == "crisis"
+    engine.process("what is the capital of France")
+    assert engine.last_outcome == "out_of_scope"
+
+    failing = make_engine("metrics_user_2", failure_rate=1.0)
+    asyncio.run(failing.process_async("I keep arguing with my sister"))
+    assert failing.last_outcome == "llm_failure"
+
+    assert outcome_count("success") == before["success"] + 1
+    assert outcome_count("crisis") == before["crisis"] + 1
+    assert outcome_count("out_of_scope") == before["out_of_scope"] + 1
+    assert outcome_count("llm_failure") == before["llm_failure"] + 1
+    assert stage_count("llm") == llm_before + 2
+    print("✅ Engine records per-stage timings and turn outcomes")
+
+
+def test_stream_outcome_and_metrics_endpoint(conversation_rows):
+    engine = make_engine("metrics_stream_user")
+    events = list(engine.process_stream("My sister and I argued again"))
+    assert events[-1]["type"] == "done" and engine.last_outcome == "success"
+
+    text = render_metrics()
+    assert 'reflectai_chat_stage_seconds_bucket{stage="load_history",le="+Inf"}' in text
+    assert 'reflectai_chat_outcomes_total{outcome="success"}' in text
+    assert 'reflectai_prompt_window_prompts' in text
+    print("✅ Streaming turns are recorded and exposed on /metrics")
+
+
+def test_recording_overhead_is_small():
+    timer = ChatTimer()
+    laps = 20000
+    start = time.perf_counter()
+    for _ in range(laps):
+        timer.lap("review")
+    per_lap = (time.perf_counter() - start) / laps
+    assert per_lap < 20e-6, per_lap
+    print(f"✅ Recording a stage costs {per_lap * 1e6:.2f}µs")
+
+
+if __name__ == "__main__":
+    import pytest
+    from tests.conftest import fake_conversation_store
+
+    test_registry_renders_prometheus_text()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_engine_records_stages_and_outcomes(fake_conversation_store(monkeypatch))
+        test_stream_outcome_and_metrics_endpoint(fake_conversation_store(monkeypatch))
+    test_recording_overhead_is_small()
@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.prompt_window import build_prompt_window, estimate_tokens, PromptWindowStats
+
+
+def make_history(turns):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "word " * 20}
+            for i in range(turns)]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("I feel okay.") == 4
+    assert estimate_tokens("overwhelmed") == 3
+    print("✅ Local token estimate works")
+
+
+def test_window_keeps_recent_turns_within_budget():
+    history = make_history(100)
+    window = build_prompt_window("You are a helpful companion.", history, budget=300)
+    assert window.prompt_tokens <= 300
+    assert window.kept_turns + window.dropped_turns == 100
+    assert window.dropped_tokens > 0
+    # System prompt first, then the newest turns in chronological order
+    assert window.messages[0]["role"] == "system"
+    assert window.messages[-1]["content"] == history[-1]["content"]
+    assert window.messages[1]["content"] == history[100 - window.kept_turns]["content"]
+    print("✅ Window keeps the most recent turns that fit")
+
+
+def test_newest_turn_always_kept():
+    history = [{"role": "user", "content": "long " * 1000}]
+    window = build_prompt_window("System.", history, budget=50)
+    assert window.kept_turns == 1 and window.dropped_turns == 0
+    print("✅ Newest turn is kept even when over budget")
+
+
+def test_stats_accumulate():
+    stats = PromptWindowStats()
+    stats.record(build_prompt_window("System.", make_history(50), budget=200))
+    stats.record(build_prompt_window("System.", make_history(2), budget=200))
+    # 40 rows loaded with a limit of 40: older rows may exist and went uncounted
+    stats.record(build_prompt_window("System.", make_history(40), budget=200, history_limit=40))
+    snapshot = stats.snapshot()
+    assert snapshot["prompts"] == 3
+    assert snapshot["kept_turns"] + snapshot["dropped_turns"] == 92
+    assert snapshot["capped_prompts"] == 1
+    print("✅ Window stats accumulate")
+
+
+if __name__ == "__main__":
+    test_estimate_tokens()
+    test_window_keeps_recent_turns_within_budget()
+    test_newest_turn_always_kept()
+    test_stats_accumulate()
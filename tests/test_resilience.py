@@ -0,0 +1,232 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import core.therapy_engine_groq as engine_module
+from benchmarks.fake_llm_server import REPLY, FakeLLMServer
+from core.llm_backends import GeminiRESTBackend, LLMHTTPError, StubBackend, StubBackendError
+from core.resilience import CircuitBreaker, LLMTimeout, LLMUnavailable, ResilientBackend, is_retryable
+from core.therapy_engine_groq import EngineCore, TherapyEngine
+
+MESSAGES = [{"role": "system", "content": "System."}, {"role": "user", "content": "I feel lost lately"}]
+
+
+@pytest.fixture
+def server():
+    with FakeLLMServer() as fake:
+        yield fake
+
+
+def resilient(server, **options):
+    options.setdefault("backoff_base", 0.01)
+    options.setdefault("seed", 1)
+    rest = GeminiRESTBackend("fake-key", url=server.url, timeout=options.pop("http_timeout", 5))
+    return ResilientBackend(rest, **options)
+
+
+def test_transient_errors_are_retried_with_backoff(server):
+    server.script.extend([(503, 0), (429, 0)])
+    backend = resilient(server, max_attempts=3)
+    assert backend.generate(MESSAGES) == REPLY
+    assert server.requests == 3
+    assert backend.stats["retries"] == 2 and backend.stats["failures"] == 0
+    # Full jitter: never longer than the capped exponential
+    assert all(0 <= backend.backoff(n) <= min(backend.backoff_max, 0.01 * 2 ** n) for n in range(8))
+    print("✅ 503/429 responses are retried until one succeeds")
+
+
+def test_client_errors_and_exhausted_retries_surface(server):
+    server.script.append((400, 0))
+    backend = resilient(server, max_attempts=3)
+    with pytest.raises(LLMHTTPError) as exc:
+        backend.generate(MESSAGES)
+    assert exc.value.status_code == 400 and server.requests == 1
+
+    server.script.extend([(500, 0)] * 3)
+    with pytest.raises(LLMHTTPError):
+        backend.generate(MESSAGES)
+    assert server.requests == 4 and backend.stats["failures"] == 2
+    print("✅ 4xx is not retried and retries stop after max_attempts")
+
+
+def test_retryable_errors_are_matched_by_type():
+    request = httpx.Request("POST", "http://llm.invalid")
+    for exc in (httpx.ReadTimeout("slow", request=request), httpx.ConnectError("refused", request=request),
+                httpx.RemoteProtocolError("dropped", request=request), LLMTimeout(), ConnectionResetError(),
+                StubBackendError("injected"), LLMHTTPError(503, "busy"), LLMHTTPError(429, "slow down")):
+        assert is_retryable(exc), exc
+
+    class ConnectTimeout(Exception):
+        """Named like a transient error, but not one"""
+
+    for exc in (ConnectTimeout(), httpx.UnsupportedProtocol("ftp://", request=request), LLMHTTPError(400, "bad"),
+                LLMUnavailable(1.0), ValueError("bad prompt")):
+        assert not is_retryable(exc), exc
+    print("✅ Retries are decided by exception type, not class name")
+
+
+def test_breaker_fails_fast_then_recovers(server):
+    server.script.extend([(503, 0)] * 3)
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.2)
+    backend = resilient(server, max_attempts=1, breaker=breaker)
+    for _ in range(3):
+        with pytest.raises(LLMHTTPError):
+            backend.generate(MESSAGES)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    start = time.perf_counter()
+    with pytest.raises(LLMUnavailable):
+        backend.generate(MESSAGES)
+    assert time.perf_counter() - start < 0.05
+    assert server.requests == 3
+
+    time.sleep(0.25)
+    # Half-open: the trial call succeeds and closes the circuit
+    assert backend.generate(MESSAGES) == REPLY
+    assert breaker.state == CircuitBreaker.CLOSED and server.requests == 4
+    print("✅ Open circuit fails fast without calling the provider, then recovers")
+
+
+def test_abandoned_half_open_trial_frees_the_slot():
+    stub = StubBackend(failure_rate=1.0, seed=1)
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    backend = ResilientBackend(stub, max_attempts=1, breaker=breaker)
+
+    def trip():
+        stub.failure_rate = 1.0
+        with pytest.raises(Exception):
+            backend.generate(MESSAGES)
+        assert breaker.state == CircuitBreaker.OPEN
+        stub.failure_rate = 0.0
+
+    # A trial stream closed after its first chunk (guard block, client left)
+    trip()
+    stream = backend.stream(MESSAGES)
+    next(stream)
+    stream.close()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # A trial call cancelled before the provider answered
+    trip()
+    stub.sample_latency = lambda rng: 5.0
+
+    async def cancelled_trial():
+        task = asyncio.ensure_future(backend.agenerate(MESSAGES))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancelled_trial())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    stub.sample_latency = lambda rng: 0.0
+    assert backend.generate(MESSAGES)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # Same for an async stream cancelled while waiting for its first chunk
+    trip()
+    stub.sample_latency = lambda rng: 5.0
+
+    async def cancelled_stream():
+        async def consume():
+            async for _ in backend.astream(MESSAGES):
+                pass
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancelled_stream())
+    stub.sample_latency = lambda rng: 0.0
+    assert backend.generate(MESSAGES) and breaker.state == CircuitBreaker.CLOSED
+    print("✅ A closed or cancelled half-open trial does not leave the circuit stuck")
+
+
+def test_per_attempt_timeout(server):
+    server.script.append((200, 1.0))
+    backend = resilient(server, max_attempts=2, http_timeout=0.2, timeout=0.2)
+    start = time.perf_counter()
+    assert backend.generate(MESSAGES) == REPLY
+    assert time.perf_counter() - start < 0.9
+    assert backend.stats["timeouts"] == 1
+
+    server.script.append((200, 1.0))
+    start = time.perf_counter()
+    assert asyncio.run(backend.agenerate(MESSAGES)) == REPLY
+    assert time.perf_counter() - start < 0.9
+    assert backend.stats["timeouts"] == 2
+    print("✅ A hung attempt is abandoned after its deadline and retried")
+
+
+def test_hedged_request_beats_slow_primary(server):
+    backend = resilient(server, hedge=True, hedge_max_ratio=0.5)
+
+    async def scenario():
+        for _ in range(20):
+            await backend.agenerate(MESSAGES)
+        assert backend.hedge_delay() is not None
+        server.script.append((200, 1.0))
+        start = time.perf_counter()
+        reply = await backend.agenerate(MESSAGES)
+        return reply, time.perf_counter() - start
+
+    reply, elapsed = asyncio.run(scenario())
+    assert reply == REPLY and elapsed < 0.5
+    assert backend.stats["hedges"] == 1 and backend.stats["hedge_wins"] == 1
+
+    server.script.append((200, 1.0))
+    start = time.perf_counter()
+    assert backend.generate(MESSAGES) == REPLY
+    assert time.perf_counter() - start < 0.5
+    assert backend.stats["hedge_wins"] == 2
+    print(f"✅ Hedged request answered in {elapsed * 1000:.0f} ms instead of waiting 1 s")
+
+
+def test_rest_backend_reuses_connections(server):
+    rest = GeminiRESTBackend("fake-key", url=server.url)
+    for _ in range(10):
+        assert rest.generate(MESSAGES) == REPLY
+
+    async def burst():
+        for _ in range(10):
+            assert await rest.agenerate(MESSAGES) == REPLY
+        await rest.aclose()
+
+    asyncio.run(burst())
+    assert server.requests == 20 and len(server.connections) == 2
+    print("✅ REST backend keeps one pooled connection per client")
+
+
+def test_engine_reports_open_circuit(conversation_rows):
+    llm = ResilientBackend(StubBackend(failure_rate=1.0), max_attempts=1,
+                           breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    engine = TherapyEngine("breaker_user", core=EngineCore(llm=llm))
+    for outcome in ("llm_failure", "llm_failure", "llm_unavailable"):
+        assert engine.process("I had a rough week at work") == engine_module.LLM_FAILURE_REPLY
+        assert engine.last_outcome == outcome
+    assert llm.inner.calls == 2
+    print("✅ Engine answers instantly while the circuit is open")
+
+
+if __name__ == "__main__":
+    from tests.conftest import fake_conversation_store
+
+    with FakeLLMServer() as fake:
+        test_transient_errors_are_retried_with_backoff(fake)
+    with FakeLLMServer() as fake:
+        test_client_errors_and_exhausted_retries_surface(fake)
+    test_retryable_errors_are_matched_by_type()
+    with FakeLLMServer() as fake:
+        test_breaker_fails_fast_then_recovers(fake)
+    test_abandoned_half_open_trial_frees_the_slot()
+    with FakeLLMServer() as fake:
+        test_per_attempt_timeout(fake)
+    with FakeLLMServer() as fake:
+        test_hedged_request_beats_slow_primary(fake)
+    with FakeLLMServer() as fake:
+        test_rest_backend_reuses_connections(fake)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_engine_reports_open_circuit(fake_conversation_store(monkeypatch))
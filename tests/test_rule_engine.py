@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ethical_modules.rule_engine import RuleEngine, RULES
+import ethical_modules.safety_checker  # noqa: F401  (registers crisis/response rules)
+import ethical_modules.bias_detector  # noqa: F401  (registers bias rules)
+
+
+def test_single_pass_reports_every_category():
+    engine = RuleEngine()
+    engine.register("greeting", ["hello", "good morning"])
+    engine.register("feeling", ["tired", "sad"], whole_word=False)
+    hits = engine.scan("Good morning! I'm so TIRED and sad.")
+    assert hits.phrases("greeting") == ["good morning"]
+    assert hits.phrases("feeling") == ["tired", "sad"]
+    print("✅ One scan returns every category hit")
+
+
+def test_word_boundaries():
+    hits = RULES.scan("Many humans are brave")
+    assert "bias.masculine" not in hits
+    assert "bias.strength" in hits
+    assert "bias.masculine" in RULES.scan("The man was brave")
+    # Prefix rules still catch inflections but not matches inside words
+    assert RULES.scan("I feel so stressed").any("humor")
+    assert not RULES.scan("I'm in distress").any("humor")
+    assert "crisis.abuse" in RULES.scan("I was abused as a kid")
+    print("✅ Word-boundary matching works")
+
+
+def test_overlapping_phrases_and_typographic_quotes():
+    hits = RULES.scan("It’s not that bad, you have depression")
+    assert hits.phrases("response.dismissive") == ["it's not that bad"]
+    assert hits.phrases("response.diagnostic") == ["you have depression", "depression"]
+    print("✅ Overlapping phrases and curly quotes are matched")
+
+
+def test_large_rule_lists():
+    engine = RuleEngine()
+    engine.register("generated", [f"phrase number {i}" for i in range(5000)])
+    engine.register("target", ["needle"])
+    hits = engine.scan("there is a needle and phrase number 4321 here, not phrase number 43210")
+    assert hits.phrases("target") == ["needle"]
+    assert hits.phrases("generated") == ["phrase number 4321"]
+    print("✅ Thousands of rules compile into one automaton")
+
+
+if __name__ == "__main__":
+    test_single_pass_reports_every_category()
+    test_word_boundaries()
+    test_overlapping_phrases_and_typographic_quotes()
+    test_large_rule_lists()
@@ -0,0 +1,158 @@
+import os
+import gc
+import time
+from contextlib import contextmanager
+# No background warm-up or health probes against real endpoints when solara_app is imported
+os.environ.setdefault("REFLECTAI_WARMUP", "0")
+os.environ.setdefault("REFLECTAI_HEALTH_PROBES", "0")
+
+import pytest
+import solara
+from solara.server import kernel, kernel_context
+
+import solara_app as app
+from core import chat_memory
+from core.llm_backends import StubBackend
+from core.storage import MemoryStore
+from core.therapy_engine_groq import EngineCore
+
+
+@contextmanager
+def chat_interface(monkeypatch, rows):
+    """The chat UI rendered in a virtual kernel, on a stub LLM whose turns land in `rows`."""
+    core = EngineCore(llm=StubBackend(latency="fixed:0.2", token_delay=0.05))
+    core.admission.limiter.rate = 0
+    core.rows = rows
+    monkeypatch.setattr(app, "get_engine_core", lambda: core)
+    monkeypatch.setattr(app, "USE_INTERNAL_BACKEND", "1")
+    context = kernel_context.VirtualKernelContext(id="test-chat", kernel=kernel.Kernel(), session_id="test-session")
+    with context:
+        _, rc = solara.render(app.ChatInterface(), handle_error=False)
+        yield app
+        rc.close()
+        app.sessions.drop(context.id)
+    context.close()
+
+
+@pytest.fixture
+def chat(monkeypatch, conversation_rows):
+    with chat_interface(monkeypatch, conversation_rows) as chat_app:
+        yield chat_app
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def messages(chat):
+    return chat.current_session().transcript.messages
+
+
+def send(chat, text):
+    chat.state.user_input.value = text
+    # Keep a full collection of the large solara heap out of the timing
+    gc.collect()
+    start = time.perf_counter()
+    chat.process_message()
+    return time.perf_counter() - start
+
+
+def test_reply_streams_in_the_background(chat):
+    assert send(chat, "I had a rough week at work") < 0.1
+    assert chat.chat_task.pending
+    # Partial text shows up in the last bubble before the reply is done
+    wait_until(lambda: messages(chat)[-1]["role"] == "assistant")
+    partial = messages(chat)[-1]["content"]
+    wait_until(lambda: not chat.chat_task.pending)
+    final = messages(chat)[-1]["content"]
+    assert final.startswith(partial) and len(final) > len(partial)
+    assert [m["role"] for m in messages(chat)] == ["assistant", "user", "assistant"]
+    assert chat.current_session().session_id in {r["user_id"] for r in chat.get_engine_core().rows}
+    print("✅ Handler returns at once and the reply streams into the last bubble")
+
+
+def test_stop_cancels_the_reply(chat):
+    send(chat, "My sister and I argued again")
+    wait_until(lambda: messages(chat)[-1]["role"] == "assistant")
+    chat.stop_message()
+    wait_until(lambda: not chat.chat_task.pending)
+    time.sleep(0.3)
+    roles = [m["role"] for m in messages(chat)]
+    assert roles == ["assistant", "user", "assistant", "system"]
+    # The partial reply stays, and nothing is written after the stop
+    assert "Stopped" in messages(chat)[-1]["content"]
+    print("✅ Stop ends the stream and leaves the partial reply")
+
+
+def test_sessions_are_per_connection_with_their_own_id(chat):
+    mine = chat.current_session()
+    other = kernel_context.VirtualKernelContext(id="other-chat", kernel=kernel.Kernel(), session_id="other-session")
+    with other:
+        theirs = chat.current_session()
+    other.close()
+    assert theirs is not mine and theirs.session_id != mine.session_id
+    assert [m["role"] for m in theirs.transcript.messages] == ["assistant"]
+    chat.start_new_session()
+    assert chat.current_session().session_id != mine.session_id
+    print("✅ Each connection gets its own session and conversation id")
+
+
+def test_new_message_renders_constant_bubbles(chat, monkeypatch):
+    renders = []
+    original = chat.ChatBubble.f
+
+    @solara.component
+    def CountingBubble(message, index):
+        renders.append(index)
+        return original(message, index)
+
+    monkeypatch.setattr(chat, "ChatBubble", CountingBubble)
+    session = chat.current_session()
+    for i in range(120):
+        chat.add_message(session, "user" if i % 2 else "assistant", f"message {i}")
+    renders.clear()
+    chat.add_message(session, "user", "one more")
+    # Only the new bubble renders, and at most UI_RENDER_WINDOW exist at all
+    assert renders == [len(session.transcript) - 1]
+    print("✅ Adding a message to a long chat renders one bubble")
+
+
+def test_dropped_messages_load_back_from_storage(chat):
+    session = chat.current_session()
+    session.transcript.max_messages = 8
+    store = MemoryStore()
+    store.insert([{"user_id": session.session_id, "role": "user", "content": f"stored {i}",
+                   "timestamp": f"2024-01-01T00:{i:02d}:00"} for i in range(80)])
+    original = chat_memory.get_conversation_store()
+    chat_memory.set_conversation_store(store)
+    try:
+        for i in range(12):
+            chat.add_message(session, "user", f"message {i}")
+        assert session.transcript.cursor is not None
+        chat.load_earlier_messages()
+        # One page of UI_RENDER_WINDOW rows, all of them rendered
+        assert [m["content"] for m in messages(chat)[:2]] == ["stored 30", "stored 31"]
+        assert chat.state.visible.value >= len(messages(chat))
+        while session.transcript.cursor is not None:
+            chat.load_earlier_messages()
+        assert messages(chat)[0]["content"] == "stored 0"
+        assert store.fetches == 2
+    finally:
+        chat_memory.set_conversation_store(original)
+    print("✅ Older messages page back in from storage on demand")
+
+
+if __name__ == "__main__":
+    from tests.conftest import fake_conversation_store
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        for test in (test_reply_streams_in_the_background, test_stop_cancels_the_reply,
+                     test_sessions_are_per_connection_with_their_own_id, test_dropped_messages_load_back_from_storage):
+            with chat_interface(monkeypatch, fake_conversation_store(monkeypatch)) as chat_app:
+                test(chat_app)
+        # Last: it swaps out ChatBubble for the rest of the run
+        with chat_interface(monkeypatch, fake_conversation_store(monkeypatch)) as chat_app:
+            test_new_message_renders_constant_bubbles(chat_app, monkeypatch)
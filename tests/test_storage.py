@@ -0,0 +1,173 @@
+import threading
+
+from core import chat_memory
+from core.storage import MemoryStore, SqliteStore, create_store
+
+
+def test_memory_store_fetch_order_and_limit():
+    store = MemoryStore()
+    store.insert([{"user_id": "u1", "role": "user", "content": f"m{i}", "timestamp": f"2024-01-01T00:00:0{i}"}
+                  for i in range(5)])
+    assert [r["content"] for r in store.fetch("u1")] == ["m0", "m1", "m2", "m3", "m4"]
+    assert [r["content"] for r in store.fetch("u1", limit=2)] == ["m3", "m4"]
+    assert store.fetch("nobody", limit=3) == []
+    print("✅ MemoryStore returns the newest rows oldest-first")
+
+
+def test_history_pages_backwards_by_timestamp():
+    store = MemoryStore()
+    store.insert([{"user_id": "u1", "role": "user", "content": f"m{i:02d}", "session_id": "s1",
+                   "timestamp": f"2024-01-01T00:00:{i:02d}"} for i in range(25)])
+    # Only the requested columns come back
+    assert set(store.fetch("u1", limit=1)[0]) == {"role", "content", "timestamp"}
+    assert store.fetch("u1", limit=2, before="2024-01-01T00:00:10") == [
+        {"role": "user", "content": "m08", "timestamp": "2024-01-01T00:00:08"},
+        {"role": "user", "content": "m09", "timestamp": "2024-01-01T00:00:09"}]
+
+    original = chat_memory.get_conversation_store()
+    chat_memory.set_conversation_store(store)
+    try:
+        pages, cursor = [], None
+        while True:
+            rows, cursor = chat_memory.load_conversation_page("u1", 10, cursor)
+            pages.append([r["content"] for r in rows])
+            if cursor is None:
+                break
+        assert pages == [[f"m{i:02d}" for i in range(15, 25)], [f"m{i:02d}" for i in range(5, 15)],
+                         [f"m{i:02d}" for i in range(5)]]
+    finally:
+        chat_memory.set_conversation_store(original)
+    print("✅ History loads a page at a time until the first message")
+
+
+def test_pages_split_rows_sharing_a_timestamp(tmp_path):
+    # Four rows per timestamp, pages of three: every boundary falls inside a tie
+    rows = [{"user_id": "ties", "role": "user", "content": f"m{i:02d}", "session_id": "s1",
+             "timestamp": f"2024-01-01T00:00:{i // 4:02d}"} for i in range(22)]
+    original = chat_memory.get_conversation_store()
+    for store in (MemoryStore(), SqliteStore(str(tmp_path / "ties.db"))):
+        store.insert(rows)
+        chat_memory.set_conversation_store(store)
+        try:
+            seen, cursor = [], None
+            while True:
+                page, cursor = chat_memory.load_conversation_page("ties", 3, cursor)
+                seen[:0] = [r["content"] for r in page]
+                if cursor is None:
+                    break
+                # Cursors come from the store: timestamp and row id
+                assert "|" in cursor
+            assert seen == [r["content"] for r in rows], store.name
+        finally:
+            chat_memory.set_conversation_store(original)
+    print("✅ Page cursors neither repeat nor skip rows with equal timestamps")
+
+
+def test_history_is_not_served_over_http():
+    from fastapi.testclient import TestClient
+    import fastapi_app
+
+    store = MemoryStore()
+    store.insert([{"user_id": "api-user", "role": "user", "content": "private", "session_id": "s1",
+                   "timestamp": "2024-01-01T00:00:00"}])
+    original = chat_memory.get_conversation_store()
+    chat_memory.set_conversation_store(store)
+    try:
+        # No authentication: anyone knowing a user id could read the conversation
+        response = TestClient(fastapi_app.app).get("/history/api-user")
+        assert response.status_code in (404, 405) and "private" not in response.text
+    finally:
+        chat_memory.set_conversation_store(original)
+    print("✅ /history is not exposed by the API")
+
+
+def test_chat_memory_uses_swapped_store():
+    original = chat_memory.get_conversation_store()
+    store = MemoryStore()
+    chat_memory.set_conversation_store(store)
+    try:
+        chat_memory.append_to_conversation("store-user", "user", "hello")
+        chat_memory.flush_conversation_writes()
+        assert [r["content"] for r in store.fetch("store-user")] == ["hello"]
+        chat_memory.conversation_cache.clear()
+        assert [r["content"] for r in chat_memory.load_user_conversation("store-user", limit=5)] == ["hello"]
+        assert store.fetches == 2
+    finally:
+        chat_memory.set_conversation_store(original)
+    print("✅ chat_memory reads and writes through the configured store")
+
+
+def test_sqlite_store_pages_with_index(tmp_path):
+    store = SqliteStore(str(tmp_path / "history.db"))
+    store.insert([{"user_id": f"u{i % 2}", "role": "user", "content": f"m{i:02d}", "session_id": "s1",
+                   "timestamp": f"2024-01-01T00:00:{i:02d}"} for i in range(20)])
+    assert [r["content"] for r in store.fetch("u0")] == [f"m{i:02d}" for i in range(0, 20, 2)]
+    assert store.fetch("u1", limit=2, before="2024-01-01T00:00:10") == [
+        {"role": "user", "content": "m07", "timestamp": "2024-01-01T00:00:07"},
+        {"role": "user", "content": "m09", "timestamp": "2024-01-01T00:00:09"}]
+    assert store.fetch("u1", limit=1, columns=("session_id",)) == [{"session_id": "s1"}]
+    connection = store._connection()
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    plan = " ".join(str(tuple(r)) for r in connection.execute(
+        "EXPLAIN QUERY PLAN SELECT role FROM conversations WHERE user_id = ? AND timestamp < ? "
+        "ORDER BY timestamp DESC, id DESC LIMIT 5", ("u1", "z")))
+    assert "conversations_user_timestamp" in plan
+    store.close()
+    # Data outlives the process
+    assert len(SqliteStore(str(tmp_path / "history.db")).fetch("u0")) == 10
+    print("✅ SQLite store pages by (user_id, timestamp) in WAL mode")
+
+
+def test_sqlite_store_reads_while_another_thread_writes(tmp_path):
+    store = SqliteStore(str(tmp_path / "history.db"))
+    errors = []
+
+    def writer():
+        try:
+            for i in range(200):
+                store.insert([{"user_id": "u1", "role": "user", "content": f"m{i}",
+                               "timestamp": f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}"}])
+        except Exception as exc:
+            errors.append(exc)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    seen = 0
+    while thread.is_alive():
+        rows = store.fetch("u1", limit=10)
+        assert len(rows) >= min(seen, 10)
+        seen = max(seen, len(rows))
+    thread.join()
+    assert not errors and len(store.fetch("u1")) == 200
+    store.close()
+    print("✅ Readers are not blocked by the writer thread")
+
+
+def test_create_store_follows_configuration(tmp_path, monkeypatch):
+    monkeypatch.setenv("REFLECTAI_STORAGE", "sqlite")
+    monkeypatch.setenv("REFLECTAI_SQLITE_PATH", str(tmp_path / "nested" / "reflectai.db"))
+    store = create_store()
+    assert isinstance(store, SqliteStore) and (tmp_path / "nested" / "reflectai.db").exists()
+    store.close()
+    assert isinstance(create_store("memory"), MemoryStore)
+    print("✅ REFLECTAI_STORAGE selects the conversation store")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    import pytest
+
+    test_memory_store_fetch_order_and_limit()
+    test_history_pages_backwards_by_timestamp()
+    with tempfile.TemporaryDirectory() as directory:
+        test_pages_split_rows_sharing_a_timestamp(Path(directory))
+    test_history_is_not_served_over_http()
+    test_chat_memory_uses_swapped_store()
+    with tempfile.TemporaryDirectory() as directory:
+        test_sqlite_store_pages_with_index(Path(directory))
+    with tempfile.TemporaryDirectory() as directory:
+        test_sqlite_store_reads_while_another_thread_writes(Path(directory))
+    with tempfile.TemporaryDirectory() as directory, pytest.MonkeyPatch.context() as monkeypatch:
+        test_create_store_follows_configuration(Path(directory), monkeypatch)
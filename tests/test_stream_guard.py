@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ethical_modules.safety_checker import EthicalSafetyChecker
+from ethical_modules.bias_detector import BiasDetector
+from ethical_modules.stream_guard import StreamGuard
+
+
+def make_guard():
+    return StreamGuard(EthicalSafetyChecker(), BiasDetector())
+
+
+def test_clean_stream_passes():
+    guard = make_guard()
+    for chunk in ["It makes sense ", "that you feel tired. ", "What has been weighing on you?"]:
+        assert guard.feed(chunk) is None
+    assert guard.text.endswith("weighing on you?")
+    print("✅ Clean stream passes the guard")
+
+
+def test_phrase_split_across_chunks_trips():
+    guard = make_guard()
+    assert guard.feed("Honestly, just think ") is None
+    tripped = guard.feed("positive and move on.")
+    assert tripped == ('ethics', "ETHICAL_VIOLATION: Dismissive response detected")
+    print("✅ Phrase split across chunks is caught")
+
+
+def test_bias_terms_in_separate_chunks_trip():
+    guard = make_guard()
+    assert guard.feed("Many men feel pressure. ") is None
+    tripped = guard.feed("They are expected to be tough.")
+    assert tripped is not None and tripped[0] == 'bias'
+    print("✅ Co-occurring bias terms across chunks are caught")
+
+
+def test_word_split_across_chunks_is_not_a_term():
+    guard = make_guard()
+    # "man" is a bias term only as a whole word, so "man" + "ager" must not count
+    assert guard.feed("Talk to your man") is None
+    assert guard.feed("ager about it. You are strong.") is None
+    assert guard.finish() is None
+    assert guard.groups == {'strength'}
+    print("✅ A word split across chunks is not matched as a bias term")
+
+
+def test_finish_checks_the_held_back_word():
+    guard = make_guard()
+    assert guard.feed("Honestly, just think") is None
+    assert guard.feed(" positive") is None
+    assert guard.finish() == ('ethics', "ETHICAL_VIOLATION: Dismissive response detected")
+    print("✅ The last word of the stream is checked by finish()")
+
+
+if __name__ == "__main__":
+    test_clean_stream_passes()
+    test_phrase_split_across_chunks_trips()
+    test_bias_terms_in_separate_chunks_trip()
+    test_word_split_across_chunks_is_not_a_term()
+    test_finish_checks_the_held_back_word()
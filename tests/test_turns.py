@@ -0,0 +1,263 @@
+import asyncio
+import threading
+import time
+
+from core.llm_backends import LLMBackend
+from core.therapy_engine_groq import EngineCore, TherapyEngine
+from core.turns import TurnCoordinator
+
+
+def recording_run(calls, delay=0.05):
+    async def run(text):
+        calls.append(text)
+        await asyncio.sleep(delay)
+        return f"reply to {text!r}"
+    return run
+
+
+def test_messages_during_a_turn_are_coalesced():
+    turns = TurnCoordinator()
+    calls = []
+
+    async def scenario():
+        run = recording_run(calls)
+        first = asyncio.create_task(turns.submit("u1", "first", run))
+        await asyncio.sleep(0.01)
+        rest = [asyncio.create_task(turns.submit("u1", m, run)) for m in ("second", "third")]
+        return await first, await asyncio.gather(*rest)
+
+    first, rest = asyncio.run(scenario())
+    assert calls == ["first", "second\nthird"]
+    assert first == "reply to 'first'"
+    assert rest == ["reply to 'second\\nthird'"] * 2
+    assert turns.in_flight() == 0
+    print("✅ Messages sent mid-turn share the next LLM call")
+
+
+def test_double_submit_shares_one_turn():
+    turns = TurnCoordinator()
+    calls = []
+
+    async def scenario():
+        run = recording_run(calls)
+        return await asyncio.gather(*(turns.submit("u1", "same message", run) for _ in range(3)))
+
+    replies = asyncio.run(scenario())
+    assert calls == ["same message"]
+    assert len(set(replies)) == 1
+    assert turns.stats["duplicates"] == 2
+    print("✅ A repeated message is answered once")
+
+
+def test_users_do_not_wait_on_each_other():
+    turns = TurnCoordinator()
+
+    async def scenario():
+        slow = asyncio.create_task(turns.submit("slow", "hi", recording_run([], delay=0.5)))
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        await turns.submit("fast", "hi", recording_run([], delay=0.01))
+        elapsed = time.perf_counter() - start
+        await slow
+        return elapsed
+
+    assert asyncio.run(scenario()) < 0.2
+    print("✅ One user's slow turn doesn't delay another user")
+
+
+def test_failed_turn_reaches_every_sender():
+    turns = TurnCoordinator()
+
+    async def boom(text):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend down")
+
+    async def scenario():
+        return await asyncio.gather(turns.submit("u1", "a", boom), turns.submit("u1", "a", boom),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert turns.in_flight() == 0
+    print("✅ Errors propagate to coalesced senders and the mailbox is cleaned up")
+
+
+def test_repeat_after_the_window_is_a_new_message():
+    turns = TurnCoordinator(duplicate_window=0.05)
+    calls = []
+
+    async def scenario():
+        run = recording_run(calls, delay=0.2)
+        first = asyncio.create_task(turns.submit("u1", "yes", run))
+        await asyncio.sleep(0.1)
+        # Deliberate "yes" again while the first is still running
+        second = asyncio.create_task(turns.submit("u1", "yes", run))
+        return await first, await second
+
+    first, second = asyncio.run(scenario())
+    assert calls == ["yes", "yes"] and turns.stats["duplicates"] == 0
+    print("✅ A message repeated after the double-submit window gets its own turn")
+
+
+def test_thread_and_async_turns_share_one_lock():
+    turns = TurnCoordinator()
+    active, overlaps = [0], [0]
+    lock = threading.Lock()
+
+    def enter():
+        with lock:
+            active[0] += 1
+            overlaps[0] = max(overlaps[0], active[0])
+
+    def leave():
+        with lock:
+            active[0] -= 1
+
+    def sync_turn():
+        with turns.hold("mixed"):
+            enter()
+            time.sleep(0.05)
+            leave()
+
+    async def async_turn(text):
+        enter()
+        await asyncio.sleep(0.05)
+        leave()
+        return text
+
+    async def streamed_turn():
+        async with turns.exclusive("mixed"):
+            enter()
+            await asyncio.sleep(0.05)
+            leave()
+
+    async def scenario():
+        threads = [threading.Thread(target=sync_turn) for _ in range(3)]
+        for t in threads:
+            t.start()
+        await asyncio.gather(turns.submit("mixed", "hello", async_turn), streamed_turn(), streamed_turn())
+        for t in threads:
+            await asyncio.to_thread(t.join)
+
+    asyncio.run(scenario())
+    assert overlaps[0] == 1 and turns.in_flight() == 0
+    print("✅ Threaded and async turns for one user never overlap")
+
+
+def test_cancelled_waiter_does_not_keep_the_lock():
+    turns = TurnCoordinator()
+
+    async def scenario():
+        async def hold_for(seconds):
+            async with turns.exclusive("u1"):
+                await asyncio.sleep(seconds)
+
+        holder = asyncio.create_task(hold_for(0.05))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(hold_for(0))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await holder
+        await asyncio.wait_for(hold_for(0), 1)
+
+    asyncio.run(scenario())
+    assert turns.in_flight() == 0
+    print("✅ A waiter that goes away leaves the lock free")
+
+
+class CountingBackend(LLMBackend):
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def _enter(self, messages):
+        with self.lock:
+            self.prompts.append(messages[-1]["content"])
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def _exit(self):
+        with self.lock:
+            self.active -= 1
+
+    def generate(self, messages):
+        self._enter(messages)
+        time.sleep(self.delay)
+        self._exit()
+        return "That sounds hard. What feels heaviest right now?"
+
+    async def agenerate(self, messages):
+        self._enter(messages)
+        await asyncio.sleep(self.delay)
+        self._exit()
+        return "That sounds hard. What feels heaviest right now?"
+
+
+def test_engine_coalesces_and_keeps_history_ordered(conversation_rows):
+    rows = conversation_rows
+    backend = CountingBackend()
+    core = EngineCore(llm=backend)
+
+    async def scenario():
+        engines = [TherapyEngine("tabs_user", core=core) for _ in range(3)]
+        first = asyncio.create_task(engines[0].process_async("I had a rough day at work"))
+        # Wait until the first turn is in its LLM call
+        while not backend.prompts:
+            await asyncio.sleep(0.005)
+        crisis = await TherapyEngine("tabs_user", core=core).process_async("I want to kill myself")
+        rest = await asyncio.gather(engines[1].process_async("My boss shouted at me"),
+                                    engines[2].process_async("And I skipped lunch"))
+        return engines, await first, crisis, rest
+
+    engines, first, crisis, rest = asyncio.run(scenario())
+    # Crisis replies never wait for the running turn
+    assert "crisis" in crisis
+    assert backend.prompts == ["I had a rough day at work", "My boss shouted at me\nAnd I skipped lunch"]
+    assert backend.max_active == 1
+    assert rest[0] == rest[1]
+    assert [e.last_outcome for e in engines] == ["success", "success", "coalesced"]
+    llm_rows = [(r["role"], r["content"]) for r in rows if "kill" not in r["content"] and "crisis" not in r["content"]]
+    assert [role for role, _ in llm_rows] == ["user", "assistant", "user", "assistant"]
+    print("✅ Concurrent messages from one user become ordered, coalesced turns")
+
+
+def test_sync_turns_for_one_user_are_serialized(conversation_rows):
+    backend = CountingBackend(delay=0.05)
+    core = EngineCore(llm=backend)
+    threads = [threading.Thread(target=TherapyEngine("sync_user", core=core).process, args=(f"I feel tense {i}",))
+               for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(backend.prompts) == 3 and backend.max_active == 1
+
+    other = CountingBackend(delay=0.05)
+    core = EngineCore(llm=other)
+    threads = [threading.Thread(target=TherapyEngine(f"sync_user_{i}", core=core).process, args=("I feel tense",))
+               for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert other.max_active > 1
+    print("✅ Threaded turns serialize per user and overlap across users")
+
+
+if __name__ == "__main__":
+    import pytest
+    from tests.conftest import fake_conversation_store
+
+    test_messages_during_a_turn_are_coalesced()
+    test_double_submit_shares_one_turn()
+    test_users_do_not_wait_on_each_other()
+    test_failed_turn_reaches_every_sender()
+    test_repeat_after_the_window_is_a_new_message()
+    test_thread_and_async_turns_share_one_lock()
+    test_cancelled_waiter_does_not_keep_the_lock()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_engine_coalesces_and_keeps_history_ordered(fake_conversation_store(monkeypatch))
+        test_sync_turns_for_one_user_are_serialized(fake_conversation_store(monkeypatch))
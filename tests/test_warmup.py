@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from benchmarks.fake_llm_server import REPLY, FakeLLMServer
+from core.llm_backends import GeminiRESTBackend
+from core.health import HealthMonitor
+from core.warmup import Warmup
+
+MESSAGES = [{"role": "user", "content": "I feel lost lately"}]
+
+
+def test_steps_run_in_order_and_failures_do_not_block_readiness():
+    order = []
+
+    def broken():
+        raise ConnectionError("store unreachable")
+
+    async def async_step():
+        order.append("async")
+
+    warmup = Warmup([("first", lambda: order.append("first")), ("broken", broken), ("async", async_step)])
+    assert warmup.status == "pending" and not warmup.ready
+    warmup.run()
+    assert order == ["first", "async"] and warmup.ready
+    snapshot = warmup.snapshot()
+    assert snapshot["status"] == "ready"
+    assert snapshot["steps"]["broken"]["ok"] is False and "store unreachable" in snapshot["steps"]["broken"]["error"]
+    assert warmup.metrics()["failed_steps"] == 1
+
+    asyncio.run(Warmup([("async", async_step)]).arun())
+    assert order[-1] == "async"
+    print("✅ Warm-up records failing steps and still finishes")
+
+
+def test_stuck_step_times_out():
+    release = threading.Event()
+    warmup = Warmup([("stuck", release.wait)], timeout=0.2)
+    warmup.start()
+    time.sleep(0.05)
+    assert warmup.status == "warming" and not warmup.ready
+    time.sleep(0.2)
+    assert warmup.status == "timeout" and warmup.ready
+    release.set()
+    warmup.start().join(1)
+    assert warmup.status == "ready"
+    print("✅ A stuck step keeps the instance unready only until the timeout")
+
+
+def test_readyz_turns_green_after_warmup(monkeypatch):
+    from fastapi.testclient import TestClient
+    import fastapi_app
+
+    release = threading.Event()
+    monkeypatch.setattr(fastapi_app, "engine_warmup", lambda core: Warmup([("slow", release.wait)]))
+    monkeypatch.setattr(fastapi_app, "start_dependency_probes", lambda core: HealthMonitor())
+    with TestClient(fastapi_app.app) as client:
+        assert client.get("/healthz").status_code == 200
+        pending = client.get("/readyz")
+        assert pending.status_code == 503 and pending.json()["status"] == "warming"
+        release.set()
+        deadline = time.monotonic() + 5
+        while client.get("/readyz").status_code != 200:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert client.get("/readyz").json()["steps"]["slow"]["ok"] is True
+    print("✅ /readyz answers 503 while warming and 200 afterwards")
+
+
+def test_warm_opens_the_pooled_connection():
+    with FakeLLMServer() as server:
+        rest = GeminiRESTBackend("fake-key", url=server.url)
+        rest.warm()
+        assert len(server.connections) == 1 and server.requests == 0
+        assert rest.generate(MESSAGES) == REPLY
+        # The first turn reuses the warmed connection
+        assert len(server.connections) == 1
+        rest.close()
+    print("✅ Warm-up leaves a connection in the LLM client's pool")
+
+
+if __name__ == "__main__":
+    test_steps_run_in_order_and_failures_do_not_block_readiness()
+    test_stuck_step_times_out()
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_readyz_turns_green_after_warmup(monkeypatch)
+    test_warm_opens_the_pooled_connection()
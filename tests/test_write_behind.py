@@ -0,0 +1,101 @@
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.write_behind import WriteBehindQueue
+
+
+class RecordingStore:
+    def __init__(self, fail_times=0, delay=0.0):
+        self.batches = []
+        self.fail_times = fail_times
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def write(self, rows):
+        time.sleep(self.delay)
+        with self.lock:
+            if self.fail_times:
+                self.fail_times -= 1
+                raise RuntimeError("transient failure")
+            self.batches.append(list(rows))
+
+    @property
+    def rows(self):
+        return [r for b in self.batches for r in b]
+
+
+def row(i, user="u1"):
+    return {"user_id": user, "role": "user", "content": f"message {i}"}
+
+
+def test_rows_are_written_in_bulk():
+    store = RecordingStore()
+    writer = WriteBehindQueue(store.write, max_batch=10, flush_interval=0.2)
+    for i in range(25):
+        writer.submit(row(i))
+    assert writer.flush(5)
+    assert len(store.rows) == 25
+    assert len(store.batches) <= 5
+    writer.stop()
+    print("✅ Rows are flushed as bulk inserts")
+
+
+def test_pending_rows_visible_until_written():
+    store = RecordingStore(delay=0.2)
+    writer = WriteBehindQueue(store.write, max_batch=1, flush_interval=0.01)
+    writer.submit(row(1))
+    writer.submit(row(2, user="u2"))
+    assert [r["content"] for r in writer.pending_rows("u1")] == ["message 1"]
+    writer.stop()
+    assert writer.pending_rows("u1") == [] and writer.pending_rows("u2") == []
+    print("✅ Pending rows are visible until persisted")
+
+
+def test_retries_transient_failures():
+    store = RecordingStore(fail_times=2)
+    writer = WriteBehindQueue(store.write, max_batch=5, flush_interval=0.01, retry_backoff=0.01)
+    writer.submit(row(1))
+    writer.stop()
+    assert len(store.rows) == 1
+    assert writer.stats["retries"] == 2
+    print("✅ Transient write failures are retried")
+
+
+def test_backpressure_when_full():
+    store = RecordingStore(delay=0.05)
+    writer = WriteBehindQueue(store.write, max_batch=1, flush_interval=0.01,
+                              max_pending=2, enqueue_timeout=0.01)
+    for i in range(10):
+        writer.submit(row(i))
+    writer.stop()
+    assert len(store.rows) == 10
+    assert writer.stats["sync_writes"] > 0
+    print("✅ A full buffer applies backpressure without dropping rows")
+
+
+def test_stats_add_up_under_concurrent_sync_writes():
+    store = RecordingStore()
+    writer = WriteBehindQueue(store.write, max_batch=1, flush_interval=0.001,
+                              max_pending=1, enqueue_timeout=0)
+    threads = [threading.Thread(target=lambda n=n: [writer.submit(row(n * 1000 + i)) for i in range(200)])
+               for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.stop()
+    stats = writer.snapshot()
+    assert len(store.rows) == stats["submitted"] == stats["written"] == 1600
+    assert stats["batches"] == 1600 and stats["sync_writes"] > 0
+    print("✅ Writer stats stay exact with callers writing synchronously")
+
+
+if __name__ == "__main__":
+    test_rows_are_written_in_bulk()
+    test_pending_rows_visible_until_written()
+    test_retries_transient_failures()
+    test_backpressure_when_full()
+    test_stats_add_up_under_concurrent_sync_writes()